@@ -9,10 +9,14 @@ from visascraper.bot.handler import bot_router
 from visascraper.bot.notification import start_notification_service, stop_notification_service
 from visascraper.config import settings
 from visascraper.database.db import init_db
+from visascraper.database.executor import db_executor
+from visascraper.database.writer import db_writer
+from visascraper.infrasctructure.google_sheets import google_client
 from visascraper.jobs import JobScheduler
 from visascraper.services.scraper import DataParser
 from visascraper.services.sheets import GoogleSheetsManager
 from visascraper.services.storage import PDFManager, SessionManager, YandexDiskUploader
+from visascraper.services.upload_worker import upload_worker
 from visascraper.utils.logger import logger
 from visascraper.utils.scheduler import start_scheduler
 
@@ -34,7 +38,11 @@ class BotRunner:
 class Application:
     def __init__(self):
         session_manager = SessionManager(settings.proxy)
-        pdf_manager = PDFManager(session_manager, YandexDiskUploader(settings.yandex_token))
+        pdf_manager = PDFManager(
+            session_manager,
+            YandexDiskUploader(settings.yandex_token),
+            upload_worker=upload_worker,
+        )
 
         self.gs_manager = GoogleSheetsManager()
         self.data_parser = DataParser(session_manager=session_manager, pdf_manager=pdf_manager)
@@ -48,12 +56,17 @@ class Application:
         self.job_scheduler.start_scheduler()
         self.async_scheduler = start_scheduler()
         await start_notification_service()
+        await upload_worker.start(settings.yandex_token)
 
         try:
             await self.bot_runner.run()
         finally:
+            await upload_worker.stop()
             await stop_notification_service()
             if self.async_scheduler and self.async_scheduler.running:
                 self.async_scheduler.shutdown(wait=False)
             self.job_scheduler.stop_scheduler()
+            google_client.close()
+            db_executor.shutdown(wait=True)
+            db_writer.close()
             await self.bot_runner.bot.session.close()
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import asyncio
 import logging
+from collections.abc import Callable
 from contextlib import suppress
+from typing import Any
 
 from aiogram import Bot, F, Router
 from aiogram.fsm.context import FSMContext
@@ -12,9 +14,13 @@ from sqlalchemy.orm import Session
 
 from visascraper.bot.keyboards import admin_menu, main_menu
 from visascraper.config import settings
-from visascraper.database.crud import search_by_passport, search_by_stay_permit
-from visascraper.database.db import SessionLocal
+from visascraper.database.crud import SEARCH_RESULT_LIMIT, search_by_passport, search_by_stay_permit
+from visascraper.database.db import ReadSessionLocal
+from visascraper.database.executor import run_db
+from visascraper.database.retention import record_archiver
 from visascraper.database.models import User
+from visascraper.database.writer import db_writer
+from visascraper.services.pdf_store import PDF_KIND_BATCH, PDF_KIND_STAY, StoredPdf, pdf_store
 
 if not settings.telegram_bot_token or not settings.telegram_bot_password:
     raise ValueError("Не заданы TELEGRAM_BOT_TOKEN или TELEGRAM_BOT_PASSWORD")
@@ -54,7 +60,8 @@ def is_authorized(db: Session, telegram_id: str) -> bool:
     return user is not None and user.password == settings.telegram_bot_password
 
 
-def authorize_user(db: Session, telegram_id: str):
+def authorize_user(db: Session, telegram_id: str) -> None:
+    """Задание писателя: создаёт пользователя или снова открывает ему доступ."""
     user = get_user_by_telegram_id(db, telegram_id)
     if not user:
         user = User(telegram_id=telegram_id, is_authorized=True)
@@ -65,8 +72,6 @@ def authorize_user(db: Session, telegram_id: str):
 
     user.password = None
     user.is_authorized = True
-    db.commit()
-    return user
 
 
 def is_authorized(db: Session, telegram_id: str) -> bool:
@@ -74,14 +79,38 @@ def is_authorized(db: Session, telegram_id: str) -> bool:
     return user is not None and bool(user.is_authorized)
 
 
+def user_is_authorized(telegram_id: str) -> bool:
+    with ReadSessionLocal() as db:
+        return is_authorized(db, telegram_id)
+
+
+def grant_access(telegram_id: str) -> None:
+    db_writer.run(authorize_user, telegram_id)
+
+
+def find_with_documents(
+    search: Callable[[Session, str], list[Any]],
+    kind: str,
+    key_attr: str,
+    search_input: str,
+) -> tuple[list[tuple[Any, StoredPdf | None]], bool]:
+    """Первые ``SEARCH_RESULT_LIMIT`` найденных записей с PDF и признак того, что нашлось больше."""
+    with ReadSessionLocal() as db:
+        results = search(db, search_input)
+    if not results:
+        results = record_archiver.search(search, search_input)
+    truncated = len(results) > SEARCH_RESULT_LIMIT
+    shown = results[:SEARCH_RESULT_LIMIT]
+    return [(result, pdf_store.lookup(kind, getattr(result, key_attr))) for result in shown], truncated
+
+
 @bot_router.message(F.text == "/start")
 async def cmd_start(message: Message, state: FSMContext):
     user_id = str(message.from_user.id)
-    with SessionLocal() as db:
-        if is_authorized(db, user_id):
-            await message.answer("✅ Вы уже авторизованы!", reply_markup=main_menu(user_id))
-        else:
-            await message.answer("🔐 Введите пароль:")
+    if await run_db(user_is_authorized, user_id):
+        await message.answer("✅ Вы уже авторизованы!", reply_markup=main_menu(user_id))
+    else:
+        await message.answer("🔐 Введите пароль:")
     await state.clear()
 
 
@@ -157,11 +186,10 @@ async def start_parsing_others(callback: CallbackQuery, bot: Bot, app):
 @bot_router.callback_query(F.data == "search_passport")
 async def start_search(callback: CallbackQuery, state: FSMContext):
     user_id = str(callback.from_user.id)
-    with SessionLocal() as db:
-        if not is_authorized(db, user_id):
-            await callback.message.answer("⚠️ Вы не авторизованы!")
-            await callback.answer()
-            return
+    if not await run_db(user_is_authorized, user_id):
+        await callback.message.answer("⚠️ Вы не авторизованы!")
+        await callback.answer()
+        return
 
     await state.set_state(PassportSearch.waiting_for_passport)
     await callback.message.answer(
@@ -176,12 +204,13 @@ async def process_passport_input(message: Message, state: FSMContext):
     user_id = str(message.from_user.id)
     search_input = message.text.strip().upper()
 
-    with SessionLocal() as db:
-        if not is_authorized(db, user_id):
-            await message.answer("⚠️ Вы не авторизованы!")
-            await state.clear()
-            return
-        results = search_by_passport(db, search_input)
+    if not await run_db(user_is_authorized, user_id):
+        await message.answer("⚠️ Вы не авторизованы!")
+        await state.clear()
+        return
+    results, truncated = await run_db(
+        find_with_documents, search_by_passport, PDF_KIND_BATCH, "register_number", search_input
+    )
 
     if not results:
         await message.answer("❌ Ничего не найдено.")
@@ -189,7 +218,7 @@ async def process_passport_input(message: Message, state: FSMContext):
         await state.clear()
         return
 
-    for result in results:
+    for result, stored_pdf in results:
         info = (
             f"Батч номер: {result.batch_no}\n"
             f"Рег. номер: {result.register_number}\n"
@@ -202,12 +231,16 @@ async def process_passport_input(message: Message, state: FSMContext):
             f"Статус: {result.status}\n"
             f"Аккаунт: {result.account}"
         )
-        file_path = settings.temp_dir / f"{result.register_number}_batch_application.pdf"
-        if file_path.exists():
-            await message.answer_document(document=FSInputFile(file_path), caption=f"Результат:\n\n{info}")
+        if stored_pdf:
+            await message.answer_document(
+                document=FSInputFile(stored_pdf.path, filename=stored_pdf.filename),
+                caption=f"Результат:\n\n{info}",
+            )
         else:
             await message.answer(f"{info}\n\n⚠️ PDF-файл отсутствует")
 
+    if truncated:
+        await message.answer(f"🔎 Показаны первые {SEARCH_RESULT_LIMIT} записей, уточните запрос, чтобы найти остальные.")
     await message.answer("Выберите действие:", reply_markup=main_menu(user_id))
     await state.clear()
 
@@ -215,11 +248,10 @@ async def process_passport_input(message: Message, state: FSMContext):
 @bot_router.callback_query(F.data == "search_stay_permit")
 async def start_search_stay(callback: CallbackQuery, state: FSMContext):
     user_id = str(callback.from_user.id)
-    with SessionLocal() as db:
-        if not is_authorized(db, user_id):
-            await callback.message.answer("⚠️ Вы не авторизованы!")
-            await callback.answer()
-            return
+    if not await run_db(user_is_authorized, user_id):
+        await callback.message.answer("⚠️ Вы не авторизованы!")
+        await callback.answer()
+        return
 
     await state.set_state(StayPermitSearch.waiting_for_stay_permit)
     await callback.message.answer("Введите номер паспорта\nПример: 4729312290")
@@ -231,12 +263,13 @@ async def process_stay_permit_input(message: Message, state: FSMContext):
     user_id = str(message.from_user.id)
     search_input = message.text.strip().upper()
 
-    with SessionLocal() as db:
-        if not is_authorized(db, user_id):
-            await message.answer("⚠️ Вы не авторизованы!")
-            await state.clear()
-            return
-        results = search_by_stay_permit(db, search_input)
+    if not await run_db(user_is_authorized, user_id):
+        await message.answer("⚠️ Вы не авторизованы!")
+        await state.clear()
+        return
+    results, truncated = await run_db(
+        find_with_documents, search_by_stay_permit, PDF_KIND_STAY, "reg_number", search_input
+    )
 
     if not results:
         await message.answer("❌ Ничего не найдено.")
@@ -244,7 +277,7 @@ async def process_stay_permit_input(message: Message, state: FSMContext):
         await state.clear()
         return
 
-    for result in results:
+    for result, stored_pdf in results:
         info = (
             f"Рег. номер: {result.reg_number}\n"
             f"Полное имя: {result.name}\n"
@@ -257,12 +290,16 @@ async def process_stay_permit_input(message: Message, state: FSMContext):
             f"Статус: {result.status}\n"
             f"Аккаунт: {result.account}"
         )
-        file_path = settings.temp_dir / f"{result.reg_number}_stay_permit.pdf"
-        if file_path.exists():
-            await message.answer_document(document=FSInputFile(file_path), caption=f"🏠 Результат:\n\n{info}")
+        if stored_pdf:
+            await message.answer_document(
+                document=FSInputFile(stored_pdf.path, filename=stored_pdf.filename),
+                caption=f"🏠 Результат:\n\n{info}",
+            )
         else:
             await message.answer(f"🏠 Результат:\n\n{info}\n\n⚠️ PDF-файл отсутствует")
 
+    if truncated:
+        await message.answer(f"🔎 Показаны первые {SEARCH_RESULT_LIMIT} записей, уточните запрос, чтобы найти остальные.")
     await message.answer("Выберите действие:", reply_markup=main_menu(user_id))
     await state.clear()
 
@@ -273,20 +310,17 @@ async def check_password_or_other_text(message: Message, state: FSMContext):
     entered_password = message.text.strip()
 
     if user_id in settings.admin_user_ids:
-        with SessionLocal() as db:
-            authorize_user(db, user_id)
+        await run_db(grant_access, user_id)
         await message.answer("✅ Автоматическая авторизация админа!", reply_markup=main_menu(user_id))
         return
 
-    with SessionLocal() as db:
-        if is_authorized(db, user_id):
-            await message.answer("Вы уже авторизованы!", reply_markup=main_menu(user_id))
-            return
+    if await run_db(user_is_authorized, user_id):
+        await message.answer("Вы уже авторизованы!", reply_markup=main_menu(user_id))
+        return
 
     if entered_password != settings.telegram_bot_password:
         await message.answer("❌ Неверный пароль.")
         return
 
-    with SessionLocal() as db:
-        authorize_user(db, user_id)
+    await run_db(grant_access, user_id)
     await message.answer("✅ Авторизация успешна!", reply_markup=main_menu(user_id))
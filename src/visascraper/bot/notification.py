@@ -1,20 +1,35 @@
 from __future__ import annotations
 
 import asyncio
+from collections.abc import Callable
 from dataclasses import dataclass
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
+from typing import Any
 
 from aiogram import Bot
 from aiogram.exceptions import TelegramRetryAfter
 from aiogram.types import FSInputFile
+from sqlalchemy import update
+from sqlalchemy.orm import Session
 
 from visascraper.config import settings
-from visascraper.database.db import SessionLocal
-from visascraper.database.models import BatchApplication, StayPermit
+from visascraper.database.db import ReadSessionLocal
+from visascraper.database.executor import run_db
+from visascraper.database.lookups import filter_in_chunks
+from visascraper.database.models import (
+    STATUS_EVENT_KIND_BATCH,
+    STATUS_EVENT_KIND_STAY,
+    BatchApplication,
+    StatusEvent,
+    StayPermit,
+)
+from visascraper.database.writer import db_writer
+from visascraper.services.pdf_store import PDF_KIND_BATCH, PDF_KIND_STAY, StoredPdf, pdf_store
 from visascraper.utils.logger import logger
 
 DELAY_BETWEEN_MESSAGES = 1
+APPROVED_STATUS = "Approved"
 
 
 @dataclass(slots=True)
@@ -22,6 +37,7 @@ class NotificationJob:
     text: str
     chat_id: str
     document_path: Path | None = None
+    document_name: str | None = None
 
 
 class NotificationService:
@@ -63,6 +79,7 @@ class NotificationService:
         text: str,
         document_path: Path | None = None,
         chat_id: str | None = None,
+        document_name: str | None = None,
     ) -> None:
         recipient = chat_id or settings.telegram_channel_id
         if not recipient:
@@ -81,6 +98,7 @@ class NotificationService:
                 text=text,
                 chat_id=recipient,
                 document_path=document_path,
+                document_name=document_name,
             )
         )
 
@@ -105,7 +123,7 @@ class NotificationService:
             try:
                 document = None
                 if job.document_path and job.document_path.exists():
-                    document = FSInputFile(job.document_path)
+                    document = FSInputFile(job.document_path, filename=job.document_name)
 
                 if document:
                     await self._bot.send_document(
@@ -141,65 +159,96 @@ async def send_telegram_message(
     text: str,
     document_path: Path | None = None,
     chat_id: str | None = None,
+    document: StoredPdf | None = None,
 ) -> None:
+    if document is not None:
+        await notification_service.enqueue(
+            text=text,
+            document_path=document.path,
+            chat_id=chat_id,
+            document_name=document.filename,
+        )
+        return
     await notification_service.enqueue(text=text, document_path=document_path, chat_id=chat_id)
 
 
-async def notify_approved_users() -> None:
-    outgoing_messages: list[tuple[str, Path | None]] = []
-    with SessionLocal() as db:
-        users = db.query(BatchApplication).all()
-        for user in users:
-            if user.status == "Approved" and user.last_status not in {"Approved", None}:
-                file_path = settings.temp_dir / f"{user.register_number}_batch_application.pdf"
-                text = (
-                    "Виза одобрена!\n"
-                    f"Имя: {user.full_name}\n"
-                    f"Статус: {user.status}\n"
-                    f"Номер паспорта: {user.passport_number}"
-                )
-                outgoing_messages.append((text, file_path if file_path.exists() else None))
-                user.last_status = "Approved"
-            elif user.status != "Approved" and user.last_status == "Approved":
-                user.last_status = user.status
-        db.commit()
+def _claim_status_events(db: Session, kind: str, require_previous_status: bool) -> set[str]:
+    """Забирает необработанные события смены статуса и возвращает ключи записей, ставших ``Approved``.
+
+    Читаются только новые строки ``status_events`` по частичному индексу, поэтому
+    стоимость проверки не зависит от размера таблиц заявок.
+    """
+    events = db.execute(
+        update(StatusEvent)
+        .where(StatusEvent.kind == kind, StatusEvent.processed_at.is_(None))
+        .values(processed_at=datetime.now())
+        .returning(StatusEvent.register_number, StatusEvent.old_status, StatusEvent.new_status)
+    ).all()
+    return {
+        register_number
+        for register_number, old_status, new_status in events
+        if new_status == APPROVED_STATUS and (old_status is not None or not require_previous_status)
+    }
+
+
+def _approved_messages(
+    model: type[BatchApplication] | type[StayPermit],
+    kind: str,
+    key: str,
+    require_previous_status: bool,
+    render: Callable[[Any], tuple[str, StoredPdf | None]],
+) -> list[tuple[str, StoredPdf | None]]:
+    approved_keys = db_writer.run(_claim_status_events, kind, require_previous_status)
+    with ReadSessionLocal() as db:
+        query = db.query(model).filter(model.status == APPROVED_STATUS)
+        return [
+            render(record)
+            for chunk_query in filter_in_chunks(query, getattr(model, key), approved_keys)
+            for record in chunk_query
+        ]
+
+
+def _render_approved_batch(user: BatchApplication) -> tuple[str, StoredPdf | None]:
+    text = (
+        "Виза одобрена!\n"
+        f"Имя: {user.full_name}\n"
+        f"Статус: {user.status}\n"
+        f"Номер паспорта: {user.passport_number}"
+    )
+    return text, pdf_store.lookup(PDF_KIND_BATCH, user.register_number)
+
+
+def _render_approved_stay(permit: StayPermit) -> tuple[str, StoredPdf | None]:
+    text = (
+        "ITK (Stay Permit) одобрен!\n"
+        f"Имя: {permit.name}\n"
+        f"Статус: {permit.status}\n"
+        f"Номер паспорта: {permit.passport_number}\n"
+        f"Тип разрешения: {permit.type_of_staypermit}"
+    )
+    return text, pdf_store.lookup(PDF_KIND_STAY, permit.reg_number)
 
-    for text, document_path in outgoing_messages:
-        await send_telegram_message(text, document_path=document_path)
 
+async def notify_approved_users() -> None:
+    outgoing_messages = await run_db(
+        _approved_messages, BatchApplication, STATUS_EVENT_KIND_BATCH, "register_number", True, _render_approved_batch
+    )
+    for text, document in outgoing_messages:
+        await send_telegram_message(text, document=document)
 
-async def notify_approved_stay_permits() -> None:
-    outgoing_messages: list[tuple[str, Path | None]] = []
-    with SessionLocal() as db:
-        permits = db.query(StayPermit).all()
-        for permit in permits:
-            if permit.status == "Approved" and permit.last_status != "Approved":
-                file_path = settings.temp_dir / f"{permit.reg_number}_stay_permit.pdf"
-                text = (
-                    "ITK (Stay Permit) одобрен!\n"
-                    f"Имя: {permit.name}\n"
-                    f"Статус: {permit.status}\n"
-                    f"Номер паспорта: {permit.passport_number}\n"
-                    f"Тип разрешения: {permit.type_of_staypermit}"
-                )
-                outgoing_messages.append((text, file_path if file_path.exists() else None))
-                permit.last_status = "Approved"
-            elif permit.status != "Approved" and permit.last_status == "Approved":
-                permit.last_status = permit.status
-        db.commit()
 
-    for text, document_path in outgoing_messages:
-        await send_telegram_message(text, document_path=document_path)
+async def notify_approved_stay_permits() -> None:
+    outgoing_messages = await run_db(
+        _approved_messages, StayPermit, STATUS_EVENT_KIND_STAY, "reg_number", False, _render_approved_stay
+    )
+    for text, document in outgoing_messages:
+        await send_telegram_message(text, document=document)
 
 
-async def check_birthdays() -> None:
-    today = date.today()
+def _birthday_messages(today: date) -> list[str]:
     outgoing_messages: list[str] = []
-    with SessionLocal() as db:
-        users = db.query(BatchApplication).filter(
-            BatchApplication.birth_date.is_not(None),
-            BatchApplication.birth_date.like(f"{today.strftime('%d/%m')}/%"),
-        ).all()
+    with ReadSessionLocal() as db:
+        users = db.query(BatchApplication).filter(BatchApplication.birth_month_day == today.strftime("%m-%d")).all()
         for user in users:
             outgoing_messages.append(
                 (
@@ -208,30 +257,38 @@ async def check_birthdays() -> None:
                     f"Дата рождения: {user.birth_date}"
                 )
             )
+    return outgoing_messages
 
+
+async def check_birthdays() -> None:
+    outgoing_messages = await run_db(_birthday_messages, date.today())
     for text in outgoing_messages:
         await send_telegram_message(text)
 
 
-async def check_visa_expirations() -> None:
-    today = date.today()
-    windows = [40, 5]
-    outgoing_messages: list[tuple[str, Path | None]] = []
-    with SessionLocal() as db:
-        for days_before in windows:
-            target_date = (today + timedelta(days=days_before)).strftime("%Y-%m-%d")
-            users = db.query(StayPermit).filter(
-                StayPermit.expired_date.is_not(None),
-                StayPermit.expired_date == target_date,
-            ).all()
-            for user in users:
-                file_path = settings.temp_dir / f"{user.reg_number}_stay_permit.pdf"
-                text = (
-                    f"ВНИМАНИЕ: у пользователя с паспортом {user.passport_number} виза заканчивается через {days_before} дней!\n"
-                    f"Дата окончания: {user.expired_date}\n"
-                    f"Тип визы: {user.type_of_staypermit}"
-                )
-                outgoing_messages.append((text, file_path if file_path.exists() else None))
+def _visa_expiration_messages(today: date, windows: list[int]) -> list[tuple[str, StoredPdf | None]]:
+    """Одним запросом по индексу ``expires_on`` находит ITK, истекающие через любой из ``windows`` дней."""
+    target_dates = {today + timedelta(days=days_before) for days_before in windows}
+    outgoing_messages: list[tuple[str, StoredPdf | None]] = []
+    with ReadSessionLocal() as db:
+        permits = (
+            db.query(StayPermit)
+            .filter(StayPermit.expires_on.in_(target_dates))
+            .order_by(StayPermit.expires_on.desc(), StayPermit.id)
+            .all()
+        )
+        for user in permits:
+            days_before = (user.expires_on - today).days
+            text = (
+                f"ВНИМАНИЕ: у пользователя с паспортом {user.passport_number} виза заканчивается через {days_before} дней!\n"
+                f"Дата окончания: {user.expired_date}\n"
+                f"Тип визы: {user.type_of_staypermit}"
+            )
+            outgoing_messages.append((text, pdf_store.lookup(PDF_KIND_STAY, user.reg_number)))
+    return outgoing_messages
 
-    for text, document_path in outgoing_messages:
-        await send_telegram_message(text, document_path=document_path)
+
+async def check_visa_expirations() -> None:
+    outgoing_messages = await run_db(_visa_expiration_messages, date.today(), [40, 5])
+    for text, document in outgoing_messages:
+        await send_telegram_message(text, document=document)
@@ -11,6 +11,8 @@ load_dotenv()
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 SRC_ROOT = PROJECT_ROOT / "src"
 PACKAGE_ROOT = Path(__file__).resolve().parent
+DATA_DIR = Path(os.getenv("DATA_DIR") or PACKAGE_ROOT / "data")
+LOGS_DIR = Path(os.getenv("LOGS_DIR") or PROJECT_ROOT / "logs")
 
 
 @dataclass(slots=True, frozen=True)
@@ -29,10 +31,31 @@ class Settings:
     google_service_account_json: str | None
     batch_parse_interval_minutes: int
     app_timezone: str
+    pdf_refresh_hours: int
+    pdf_cache_max_mb: int
+    pdf_cache_max_age_days: int
+    pdf_cache_pin_hours: int
+    yandex_upload_concurrency: int
+    yandex_upload_wait_seconds: int
+    sheets_flush_interval_seconds: int
+    sheets_flush_max_rows: int
+    sheets_active_cache_ttl_seconds: int
+    sheets_archive_after_days: int
+    sheets_archive_interval_hours: int
+    sheets_read_requests_per_minute: int
+    sheets_write_requests_per_minute: int
+    accounts_refresh_minutes: int
+    database_archive_after_days: int
+    database_vacuum_pages_per_run: int
+    database_convert_auto_vacuum: bool
+    status_events_retention_days: int
     temp_dir: Path
     logs_dir: Path
     database_path: Path
+    database_archive_path: Path
     session_store_path: Path
+    accounts_cache_path: Path
+    accounts_cache_key: str | None
 
 
 settings = Settings(
@@ -52,10 +75,31 @@ settings = Settings(
     google_service_account_json=os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON") or None,
     batch_parse_interval_minutes=int(os.getenv("BATCH_PARSE_INTERVAL_MINUTES", "10")),
     app_timezone=os.getenv("APP_TIMEZONE", "Europe/Moscow"),
+    pdf_refresh_hours=int(os.getenv("PDF_REFRESH_HOURS", "24")),
+    pdf_cache_max_mb=int(os.getenv("PDF_CACHE_MAX_MB", "2048")),
+    pdf_cache_max_age_days=int(os.getenv("PDF_CACHE_MAX_AGE_DAYS", "90")),
+    pdf_cache_pin_hours=int(os.getenv("PDF_CACHE_PIN_HOURS", "72")),
+    yandex_upload_concurrency=int(os.getenv("YANDEX_UPLOAD_CONCURRENCY", "4")),
+    yandex_upload_wait_seconds=int(os.getenv("YANDEX_UPLOAD_WAIT_SECONDS", "120")),
+    sheets_flush_interval_seconds=int(os.getenv("SHEETS_FLUSH_INTERVAL_SECONDS", "60")),
+    sheets_flush_max_rows=int(os.getenv("SHEETS_FLUSH_MAX_ROWS", "5000")),
+    sheets_active_cache_ttl_seconds=int(os.getenv("SHEETS_ACTIVE_CACHE_TTL_SECONDS", "900")),
+    sheets_archive_after_days=int(os.getenv("SHEETS_ARCHIVE_AFTER_DAYS", "90")),
+    sheets_archive_interval_hours=int(os.getenv("SHEETS_ARCHIVE_INTERVAL_HOURS", "24")),
+    sheets_read_requests_per_minute=int(os.getenv("SHEETS_READ_REQUESTS_PER_MINUTE", "50")),
+    sheets_write_requests_per_minute=int(os.getenv("SHEETS_WRITE_REQUESTS_PER_MINUTE", "50")),
+    accounts_refresh_minutes=int(os.getenv("ACCOUNTS_REFRESH_MINUTES", "30")),
+    database_archive_after_days=int(os.getenv("DATABASE_ARCHIVE_AFTER_DAYS", "365")),
+    database_vacuum_pages_per_run=int(os.getenv("DATABASE_VACUUM_PAGES_PER_RUN", "5000")),
+    database_convert_auto_vacuum=os.getenv("DATABASE_CONVERT_AUTO_VACUUM", "0") == "1",
+    status_events_retention_days=int(os.getenv("STATUS_EVENTS_RETENTION_DAYS", "30")),
     temp_dir=PACKAGE_ROOT / "temp",
-    logs_dir=PROJECT_ROOT / "logs",
-    database_path=PACKAGE_ROOT / "data" / "visascraper.db",
+    logs_dir=LOGS_DIR,
+    database_path=DATA_DIR / "visascraper.db",
+    database_archive_path=DATA_DIR / "visascraper_archive.db",
     session_store_path=SRC_ROOT / "data.json",
+    accounts_cache_path=Path(os.getenv("ACCOUNTS_CACHE_PATH") or SRC_ROOT / "accounts_cache.bin"),
+    accounts_cache_key=os.getenv("ACCOUNTS_CACHE_KEY") or None,
 )
 
 
@@ -1,116 +1,175 @@
 from __future__ import annotations
 
 import re
-from pathlib import Path
+import threading
+import weakref
+from concurrent.futures import Future
 
-from sqlalchemy import or_
+from sqlalchemy import case, column, func, or_, update
+from sqlalchemy import text as sql_text
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
 from visascraper.bot.notification import send_telegram_message
-from visascraper.config import settings
-from visascraper.database.db import SessionLocal
-from visascraper.database.models import BatchApplication, StayPermit, User
+from visascraper.database.executor import run_db
+from visascraper.database.lookups import chunked, filter_in_chunks
+from visascraper.database.models import (
+    FULLTEXT_INDEXES,
+    STATUS_EVENT_KIND_BATCH,
+    STATUS_EVENT_KIND_STAY,
+    ArchivedRecord,
+    BatchApplication,
+    StayPermit,
+    User,
+)
+from visascraper.database.writer import db_writer
+from visascraper.services.pdf_store import PDF_KIND_BATCH, PDF_KIND_STAY, StoredPdf, pdf_store
 from visascraper.utils.logger import logger
 
 
-def _batch_pdf_path(register_number: str) -> Path:
-    return settings.temp_dir / f"{register_number}_batch_application.pdf"
-
-
-def _stay_pdf_path(reg_number: str) -> Path:
-    return settings.temp_dir / f"{reg_number}_stay_permit.pdf"
+def _claim_unnotified(
+    db: Session,
+    model: type[BatchApplication] | type[StayPermit],
+    key: str,
+    keys: list[str],
+) -> set[str]:
+    """Помечает ещё не уведомлённые записи среди ``keys`` и возвращает их ключи.
+
+    Выборка и отметка выполняются одним ``UPDATE ... RETURNING`` на пачку ключей,
+    поэтому одна и та же запись не попадёт в уведомления дважды.
+    """
+    key_column = model.__table__.c[key]
+    claimed: set[str] = set()
+    for chunk in chunked(sorted({value for value in keys if value})):
+        claimed.update(
+            db.scalars(
+                update(model)
+                .where(key_column.in_(chunk), model.notified_as_new.is_(False))
+                .values(notified_as_new=True)
+                .returning(key_column)
+            )
+        )
+    return claimed
+
+
+def _new_batch_messages(data_list: list[dict]) -> list[tuple[str, StoredPdf | None]]:
+    claimed = db_writer.run(
+        _claim_unnotified,
+        BatchApplication,
+        "register_number",
+        [item.get("register_number") for item in data_list],
+    )
+    outgoing_messages: list[tuple[str, StoredPdf | None]] = []
+    for item in data_list:
+        reg_number = item.get("register_number")
+        if reg_number not in claimed:
+            continue
+        claimed.discard(reg_number)
+
+        text = (
+            "Новое заявление Batch Application!\n\n"
+            f"ФИО: {item.get('full_name', '—')}\n"
+            f"Паспорт: {item.get('passport_number', '—')}\n"
+            f"Рег. номер: {reg_number}\n"
+            f"Статус: {item.get('status', 'не указан')}"
+        )
+        outgoing_messages.append((text, pdf_store.lookup(PDF_KIND_BATCH, reg_number)))
+    return outgoing_messages
 
 
 async def notify_new_batch_applications(data_list: list[dict]) -> None:
     try:
-        outgoing_messages: list[tuple[str, Path | None]] = []
-        with SessionLocal() as db:
-            for item in data_list:
-                reg_number = item.get("register_number")
-                if not reg_number:
-                    continue
-
-                app = db.query(BatchApplication).filter(BatchApplication.register_number == reg_number).first()
-                if not app or app.notified_as_new:
-                    continue
-
-                text = (
-                    "Новое заявление Batch Application!\n\n"
-                    f"ФИО: {item.get('full_name', '—')}\n"
-                    f"Паспорт: {item.get('passport_number', '—')}\n"
-                    f"Рег. номер: {reg_number}\n"
-                    f"Статус: {item.get('status', 'не указан')}"
-                )
-                file_path = _batch_pdf_path(reg_number)
-                outgoing_messages.append((text, file_path if file_path.exists() else None))
-                app.notified_as_new = True
-
-            db.commit()
-            logger.info("Уведомления по новым Batch Application подготовлены: %s", len(outgoing_messages))
-
-        for text, document_path in outgoing_messages:
-            await send_telegram_message(text, document_path=document_path)
+        outgoing_messages = await run_db(_new_batch_messages, data_list)
+        logger.info("Уведомления по новым Batch Application подготовлены: %s", len(outgoing_messages))
+
+        for text, document in outgoing_messages:
+            await send_telegram_message(text, document=document)
     except Exception as exc:
         logger.error("Ошибка отправки уведомлений Batch Application: %s", exc)
 
 
-def save_or_update_batch_data(db: Session, data_list: list[dict]) -> None:
-    if not data_list:
+UPSERT_SKIPPED_COLUMNS = {"id", "notified_as_new", "last_status"}
+
+
+def _bulk_upsert(
+    db: Session,
+    model: type[BatchApplication] | type[StayPermit],
+    key: str,
+    kind: str,
+    data_list: list[dict],
+) -> None:
+    """Вставляет или обновляет записи одним ``INSERT ... ON CONFLICT DO UPDATE`` на весь пакет.
+
+    Переход ``last_status`` считается в SQL: в ``SET`` SQLite видит старые значения
+    строки, поэтому прежний статус сохраняется, только если он действительно изменился.
+    Пустой ``action_link`` не затирает уже сохранённую ссылку. Заявки, уже
+    перенесённые в архивную БД, пропускаются.
+    """
+    unique_map = {item[key]: item for item in data_list if item.get(key)}
+    archived_query = db.query(ArchivedRecord.register_number).filter(ArchivedRecord.kind == kind)
+    for chunk_query in filter_in_chunks(archived_query, ArchivedRecord.register_number, unique_map):
+        for (register_number,) in chunk_query:
+            unique_map.pop(register_number, None)
+    if not unique_map:
         return
 
-    unique_map = {item["register_number"]: item for item in data_list if item.get("register_number")}
-    existing_records = db.query(BatchApplication).filter(BatchApplication.register_number.in_(unique_map.keys())).all()
-    existing_map = {item.register_number: item for item in existing_records}
-
-    for reg_number, payload in unique_map.items():
-        existing = existing_map.get(reg_number)
-        if existing:
-            new_status = payload.get("status")
-            if existing.status != new_status:
-                existing.last_status = existing.status
-                existing.status = new_status
-            for key, value in payload.items():
-                if key in {"id", "notified_as_new", "last_status"}:
-                    continue
-                if hasattr(existing, key):
-                    setattr(existing, key, value)
-        else:
-            record = BatchApplication(**payload)
-            record.last_status = payload.get("status")
-            db.add(record)
-
-    db.commit()
-
-
-def save_or_update_stay_permit_data(db: Session, data_list: list[dict]) -> None:
-    if not data_list:
-        return
+    table = model.__table__
+    fields = [
+        name
+        for name in dict.fromkeys(name for payload in unique_map.values() for name in payload)
+        if name in table.c and name not in UPSERT_SKIPPED_COLUMNS
+    ]
+    rows = [
+        {**{name: payload.get(name) for name in fields}, "last_status": payload.get("status")}
+        for payload in unique_map.values()
+    ]
+
+    statement = insert(table)
+    excluded = statement.excluded
+    updates = {name: excluded[name] for name in fields if name != key}
+    if "status" in updates:
+        updates["last_status"] = case(
+            (table.c.status.is_not(excluded.status), table.c.status),
+            else_=table.c.last_status,
+        )
+    if "action_link" in updates:
+        updates["action_link"] = case(
+            (func.coalesce(excluded.action_link, "") == "", table.c.action_link),
+            else_=excluded.action_link,
+        )
+
+    db.execute(statement.on_conflict_do_update(index_elements=[table.c[key]], set_=updates), rows)
+
+
+def upsert_batch_applications(db: Session, data_list: list[dict]) -> None:
+    _bulk_upsert(db, BatchApplication, "register_number", STATUS_EVENT_KIND_BATCH, data_list)
 
-    unique_map = {item["reg_number"]: item for item in data_list if item.get("reg_number")}
-    if not unique_map:
-        return
 
-    existing_records = db.query(StayPermit).filter(StayPermit.reg_number.in_(unique_map.keys())).all()
-    existing_map = {record.reg_number: record for record in existing_records}
-
-    for reg_number, payload in unique_map.items():
-        existing = existing_map.get(reg_number)
-        if existing:
-            new_status = payload.get("status")
-            if existing.status != new_status:
-                existing.last_status = existing.status
-                existing.status = new_status
-            for key, value in payload.items():
-                if key in {"id", "notified_as_new", "last_status"}:
-                    continue
-                if hasattr(existing, key):
-                    setattr(existing, key, value)
-        else:
-            record = StayPermit(**payload)
-            record.last_status = payload.get("status")
-            db.add(record)
-
-    db.commit()
+def upsert_stay_permits(db: Session, data_list: list[dict]) -> None:
+    _bulk_upsert(db, StayPermit, "reg_number", STATUS_EVENT_KIND_STAY, data_list)
+
+
+def _new_stay_permit_messages(data_list: list[dict]) -> list[tuple[str, StoredPdf | None]]:
+    claimed = db_writer.run(_claim_unnotified, StayPermit, "reg_number", [item.get("reg_number") for item in data_list])
+    outgoing_messages: list[tuple[str, StoredPdf | None]] = []
+    for item in data_list:
+        reg_number = item.get("reg_number")
+        if reg_number not in claimed:
+            continue
+        claimed.discard(reg_number)
+
+        text = (
+            "Новый ITK добавлен в систему!\n\n"
+            f"ФИО: {item.get('name', '—')}\n"
+            f"Паспорт: {item.get('passport_number', '—')}\n"
+            f"Тип разрешения: {item.get('type_of_staypermit', '—')}\n"
+            f"Дата выдачи: {item.get('issue_date', '—')}\n"
+            f"Действует до: {item.get('expired_date', '—')}\n"
+            f"Рег. номер: {reg_number}\n"
+            f"Статус: {item.get('status', 'не указан')}"
+        )
+        outgoing_messages.append((text, pdf_store.lookup(PDF_KIND_STAY, reg_number)))
+    return outgoing_messages
 
 
 async def save_or_update_stay_permit_data_async(data_list: list[dict]) -> None:
@@ -118,43 +177,80 @@ async def save_or_update_stay_permit_data_async(data_list: list[dict]) -> None:
         return
 
     try:
-        outgoing_messages: list[tuple[str, Path | None]] = []
-        with SessionLocal() as db:
-            for item in data_list:
-                reg_number = item.get("reg_number")
-                if not reg_number:
-                    continue
-
-                permit = db.query(StayPermit).filter(StayPermit.reg_number == reg_number).first()
-                if not permit or permit.notified_as_new:
-                    continue
-
-                text = (
-                    "Новый ITK добавлен в систему!\n\n"
-                    f"ФИО: {item.get('name', '—')}\n"
-                    f"Паспорт: {item.get('passport_number', '—')}\n"
-                    f"Тип разрешения: {item.get('type_of_staypermit', '—')}\n"
-                    f"Дата выдачи: {item.get('issue_date', '—')}\n"
-                    f"Действует до: {item.get('expired_date', '—')}\n"
-                    f"Рег. номер: {reg_number}\n"
-                    f"Статус: {item.get('status', 'не указан')}"
-                )
-                file_path = _stay_pdf_path(reg_number)
-                outgoing_messages.append((text, file_path if file_path.exists() else None))
-                permit.notified_as_new = True
-
-            db.commit()
-
-        for text, document_path in outgoing_messages:
-            await send_telegram_message(text, document_path=document_path)
+        outgoing_messages = await run_db(_new_stay_permit_messages, data_list)
+
+        for text, document in outgoing_messages:
+            await send_telegram_message(text, document=document)
     except Exception as exc:
         logger.error("Ошибка отправки уведомлений о новых ITK: %s", exc)
 
 
+def set_action_link(db: Session, kind: str, reg_number: str, action_link: str) -> None:
+    model, key_column = (
+        (BatchApplication, BatchApplication.register_number)
+        if kind == PDF_KIND_BATCH
+        else (StayPermit, StayPermit.reg_number)
+    )
+    db.query(model).filter(key_column == reg_number).update(
+        {model.action_link: action_link},
+        synchronize_session=False,
+    )
+
+
+def _log_write_error(future: Future[None]) -> None:
+    if future.exception():
+        logger.error("Не удалось сохранить ссылку на PDF в БД: %s", future.exception())
+
+
+def update_action_link(kind: str, reg_number: str, action_link: str) -> None:
+    """Ставит запись ссылки в очередь писателя БД, не дожидаясь фиксации."""
+    db_writer.submit(set_action_link, kind, reg_number, action_link).add_done_callback(_log_write_error)
+
+
 def get_user_by_telegram_id(db: Session, telegram_id: str):
     return db.query(User).filter(User.telegram_id == telegram_id).first()
 
 
+FTS_MIN_TERM_LENGTH = 3
+# Поиск возвращает на одну запись больше лимита, чтобы бот знал, что показал не все найденные записи.
+SEARCH_RESULT_LIMIT = 10
+
+_fulltext_tables: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_fulltext_tables_lock = threading.Lock()
+
+
+def _fts_term(column: str, term: str) -> str:
+    return column + ' : "' + term.replace('"', '""') + '"'
+
+
+def _has_fulltext_table(db: Session, fts_table: str) -> bool:
+    """Есть ли FTS-таблица в БД сессии; ответ кэшируется на движок, чтобы не читать sqlite_master при каждом поиске."""
+    bind = db.get_bind()
+    with _fulltext_tables_lock:
+        known = _fulltext_tables.setdefault(bind, {})
+        if fts_table in known:
+            return known[fts_table]
+    exists = db.execute(
+        sql_text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": fts_table},
+    ).first() is not None
+    with _fulltext_tables_lock:
+        known[fts_table] = exists
+    return exists
+
+
+def _fulltext_ids(db: Session, model: type[BatchApplication] | type[StayPermit], fts_query: str):
+    """Подзапрос ``id`` записей, найденных триграммным FTS5-индексом, или ``None``, если индекса нет."""
+    fts_table = FULLTEXT_INDEXES[model.__tablename__][0]
+    if not _has_fulltext_table(db, fts_table):
+        return None
+    return (
+        sql_text(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH :fts_query")
+        .bindparams(fts_query=fts_query)
+        .columns(column("rowid"))
+    )
+
+
 def search_by_passport(db: Session, search_input: str):
     search_input = search_input.strip().upper()
     passport_match = re.search(r"\b(?=\w*\d)[A-Z0-9-]{5,}\b", search_input)
@@ -162,29 +258,47 @@ def search_by_passport(db: Session, search_input: str):
     name_query = re.sub(rf"\b{re.escape(passport_number)}\b\s*", "", search_input).strip() if passport_number else search_input
     name_parts = list(dict.fromkeys(filter(None, re.split(r"\s+", name_query))))
 
-    query = db.query(BatchApplication)
-    if passport_number:
-        query = query.filter(
-            or_(
-                BatchApplication.passport_number == passport_number,
-                BatchApplication.passport_number.ilike(f"%{passport_number}%"),
-            )
-        )
-    if name_parts:
-        query = query.filter(or_(*[BatchApplication.full_name.ilike(f"%{part}%") for part in name_parts]))
-
     if not passport_number and not name_parts:
         return []
 
-    results = query.all()
+    query = db.query(BatchApplication)
+    terms = [passport_number] if passport_number else []
+    fulltext_ids = None
+    if all(len(term) >= FTS_MIN_TERM_LENGTH for term in terms + name_parts):
+        clauses = [_fts_term("passport_number", passport_number)] if passport_number else []
+        if name_parts:
+            clauses.append("(" + " OR ".join(_fts_term("full_name", part) for part in name_parts) + ")")
+        fulltext_ids = _fulltext_ids(db, BatchApplication, " AND ".join(clauses))
+
+    if fulltext_ids is not None:
+        query = query.filter(BatchApplication.id.in_(fulltext_ids))
+    else:
+        if passport_number:
+            query = query.filter(BatchApplication.passport_number.ilike(f"%{passport_number}%"))
+        if name_parts:
+            query = query.filter(or_(*[BatchApplication.full_name.ilike(f"%{part}%") for part in name_parts]))
+
+    results = query.order_by(BatchApplication.id).limit(SEARCH_RESULT_LIMIT + 1).all()
     logger.info("Найдено записей BatchApplication: %s", len(results))
     return results
 
 
 def search_by_stay_permit(db: Session, passport_number_input: str):
+    """Точное совпадение номера паспорта, а если его нет — поиск по части номера."""
     passport_number = passport_number_input.strip().upper()
     if not passport_number:
         return []
+
     results = db.query(StayPermit).filter(StayPermit.passport_number == passport_number).all()
+    if not results and len(passport_number) >= FTS_MIN_TERM_LENGTH:
+        fulltext_ids = _fulltext_ids(db, StayPermit, _fts_term("passport_number", passport_number))
+        if fulltext_ids is not None:
+            results = (
+                db.query(StayPermit)
+                .filter(StayPermit.id.in_(fulltext_ids))
+                .order_by(StayPermit.id)
+                .limit(SEARCH_RESULT_LIMIT + 1)
+                .all()
+            )
     logger.info("Найдено StayPermit: %s", len(results))
     return results
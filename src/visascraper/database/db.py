@@ -1,22 +1,74 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Connection
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.orm import sessionmaker
 
 from visascraper.config import ensure_runtime_dirs, settings
 from visascraper.database.models import Base
+from visascraper.utils.logger import logger
 
 ensure_runtime_dirs()
 DATABASE_URL = f"sqlite:///{settings.database_path.as_posix()}"
+READ_ONLY_DATABASE_URL = f"sqlite:///file:{settings.database_path.as_posix()}?mode=ro&uri=true"
+SQLITE_BUSY_TIMEOUT_MS = 10_000
+READ_POOL_SIZE = 5
+
+
+def _configure_connection(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.close()
+
+
+def configure_writer_engine(target: Engine) -> None:
+    """Транзакции писателя начинаются с ``BEGIN IMMEDIATE`` и поддерживают SAVEPOINT.
+
+    pysqlite сам открывает транзакцию только перед DML, из-за чего SAVEPOINT
+    ломается, а блокировка на запись берётся посреди транзакции. Поэтому драйвер
+    переводится в autocommit, а ``BEGIN`` выдаёт SQLAlchemy.
+    """
+
+    @event.listens_for(target, "connect")
+    def _disable_driver_transactions(dbapi_connection, connection_record) -> None:
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(target, "begin")
+    def _begin_immediate(conn: Connection) -> None:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
 
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False},
     echo=False,
 )
+event.listen(engine, "connect", _configure_connection)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Единственное соединение, через которое пишет DatabaseWriter.
+writer_engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=1,
+    max_overflow=0,
+    echo=False,
+)
+event.listen(writer_engine, "connect", _configure_connection)
+configure_writer_engine(writer_engine)
+WriterSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=writer_engine)
+
+# Соединения только для чтения: в режиме WAL они не ждут писателя.
+read_engine = create_engine(
+    READ_ONLY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=READ_POOL_SIZE,
+    echo=False,
+)
+event.listen(read_engine, "connect", _configure_connection)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 
 def _table_columns(conn: Connection, table_name: str) -> set[str]:
     rows = conn.exec_driver_sql(f"PRAGMA table_info({table_name})").fetchall()
@@ -44,21 +96,99 @@ def _migrate_users(conn: Connection) -> None:
         )
 
 
+def _migrate_pdf_documents(conn: Connection) -> None:
+    _ensure_column(conn, "pdf_documents", "last_accessed_at", "DATETIME")
+    _ensure_column(conn, "pdf_documents", "is_cached", "INTEGER NOT NULL DEFAULT 1")
+    if "uploaded_hash" not in _table_columns(conn, "pdf_documents"):
+        _ensure_column(conn, "pdf_documents", "uploaded_hash", "VARCHAR")
+        conn.exec_driver_sql(
+            "UPDATE pdf_documents SET uploaded_hash = content_hash WHERE remote_url IS NOT NULL AND remote_url != ''"
+        )
+
+
+def _migrate_batch_register_number_unique(conn: Connection) -> None:
+    """Делает индекс по ``register_number`` уникальным, удаляя накопившиеся дубли."""
+    indexes = {row[1]: row[2] for row in conn.exec_driver_sql("PRAGMA index_list(batch_applications)")}
+    if indexes.get("ix_batch_applications_register_number"):
+        return
+
+    conn.exec_driver_sql(
+        """
+        UPDATE batch_applications
+        SET notified_as_new = 1
+        WHERE id IN (
+            SELECT MAX(id) FROM batch_applications
+            WHERE register_number IS NOT NULL
+            GROUP BY register_number
+            HAVING MAX(notified_as_new) = 1
+        )
+        """
+    )
+    removed = conn.exec_driver_sql(
+        """
+        DELETE FROM batch_applications
+        WHERE register_number IS NOT NULL
+          AND id NOT IN (
+            SELECT MAX(id) FROM batch_applications
+            WHERE register_number IS NOT NULL
+            GROUP BY register_number
+          )
+        """
+    ).rowcount
+    if removed:
+        logger.info("Удалено дублей batch_applications по register_number: %s", removed)
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_batch_applications_register_number")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX ix_batch_applications_register_number ON batch_applications (register_number)"
+    )
+
+
+def _migrate_typed_dates(conn: Connection) -> None:
+    """Добавляет нормализованные колонки дат и заполняет их для записей в основных форматах портала."""
+    _ensure_column(conn, "batch_applications", "birth_month_day", "VARCHAR")
+    _ensure_column(conn, "stay_permits", "expires_on", "DATE")
+    conn.exec_driver_sql(
+        """
+        UPDATE batch_applications
+        SET birth_month_day = substr(birth_date, 4, 2) || '-' || substr(birth_date, 1, 2)
+        WHERE birth_month_day IS NULL
+          AND birth_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]'
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        UPDATE stay_permits
+        SET expires_on = expired_date
+        WHERE expires_on IS NULL
+          AND expired_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+        """
+    )
+
+
 def _create_runtime_indexes(conn: Connection) -> None:
     statements = (
-        "CREATE INDEX IF NOT EXISTS ix_batch_applications_register_number ON batch_applications (register_number)",
         "CREATE INDEX IF NOT EXISTS ix_batch_applications_passport_number ON batch_applications (passport_number)",
         "CREATE INDEX IF NOT EXISTS ix_batch_applications_full_name ON batch_applications (full_name)",
         "CREATE INDEX IF NOT EXISTS ix_batch_applications_account ON batch_applications (account)",
+        "CREATE INDEX IF NOT EXISTS ix_batch_applications_birth_month_day ON batch_applications (birth_month_day)",
         "CREATE INDEX IF NOT EXISTS ix_stay_permits_passport_number ON stay_permits (passport_number)",
         "CREATE INDEX IF NOT EXISTS ix_stay_permits_account ON stay_permits (account)",
+        "CREATE INDEX IF NOT EXISTS ix_stay_permits_expires_on ON stay_permits (expires_on)",
+        "CREATE INDEX IF NOT EXISTS ix_pdf_documents_last_accessed_at ON pdf_documents (last_accessed_at)",
     )
     for statement in statements:
         conn.exec_driver_sql(statement)
 
 
 def init_db() -> None:
+    with engine.connect() as conn:
+        # Действует только для нового файла; старые переводит DatabaseMaintenance.
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.exec_driver_sql("PRAGMA journal_mode = WAL")
     Base.metadata.create_all(bind=engine)
     with engine.begin() as conn:
         _migrate_users(conn)
+        _migrate_pdf_documents(conn)
+        _migrate_batch_register_number_unique(conn)
+        _migrate_typed_dates(conn)
         _create_runtime_indexes(conn)
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, TypeVar
+
+from visascraper.database.db import READ_POOL_SIZE
+
+T = TypeVar("T")
+
+# Отдельный пул для запросов из бота и уведомлений: стандартный executor asyncio
+# занят долгими задачами вроде ручного парсинга, и запросы к БД не должны ждать их.
+db_executor = ThreadPoolExecutor(max_workers=READ_POOL_SIZE, thread_name_prefix="db")
+
+
+async def run_db(func: Callable[..., T], *args: Any) -> T:
+    """Выполняет синхронную работу с БД в ``db_executor``, не блокируя цикл событий."""
+    return await asyncio.get_running_loop().run_in_executor(db_executor, partial(func, *args))
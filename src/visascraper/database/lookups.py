@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from collections.abc import Hashable, Iterable, Iterator
+from itertools import islice
+from typing import TypeVar
+
+from sqlalchemy.orm import Query
+from sqlalchemy.sql import ColumnElement
+
+T = TypeVar("T")
+K = TypeVar("K", bound=Hashable)
+
+# Старые сборки SQLite ограничивают запрос 999 параметрами; 500 ключей оставляют
+# запас под остальные условия и держат план запроса на поиске по индексу.
+IN_CHUNK_SIZE = 500
+
+
+def chunked(items: Iterable[T], size: int = IN_CHUNK_SIZE) -> Iterator[list[T]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def filter_in_chunks(
+    query: Query[T],
+    column: ColumnElement,
+    keys: Iterable[K],
+    size: int = IN_CHUNK_SIZE,
+) -> Iterator[Query[T]]:
+    """Разбивает условие ``column IN (keys)`` на запросы не больше чем по ``size`` ключей.
+
+    Ключи сортируются и очищаются от дублей и пустых значений, поэтому соседние
+    пачки читают соседние участки индекса, а число запросов растёт линейно.
+    """
+    for chunk in chunked(sorted({key for key in keys if key}), size):
+        yield query.filter(column.in_(chunk))
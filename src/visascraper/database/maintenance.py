@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from visascraper.config import settings
+from visascraper.database.db import engine
+from visascraper.database.models import StatusEvent
+from visascraper.database.writer import DatabaseWriter, db_writer
+from visascraper.utils.logger import logger
+
+AUTO_VACUUM_INCREMENTAL = 2
+ANALYSIS_LIMIT = 1000
+# Грубая оценка скорости полного VACUUM: файл переписывается дважды (во временный и обратно).
+VACUUM_BYTES_PER_SECOND = 25 * 1024 * 1024
+
+# Запросы, которые выполняются постоянно: если какой-то из них перестал
+# использовать индекс, это видно в отчёте раньше, чем по времени ответа бота.
+HOT_QUERIES = {
+    "batch_applications по register_number": "SELECT id FROM batch_applications WHERE register_number = ?",
+    "batch_applications по дню рождения": "SELECT id FROM batch_applications WHERE birth_month_day = ?",
+    "stay_permits по дате окончания": "SELECT id FROM stay_permits WHERE expires_on IN (?, ?)",
+    "stay_permits по reg_number": "SELECT id FROM stay_permits WHERE reg_number = ?",
+    "необработанные status_events": "SELECT id FROM status_events WHERE kind = ? AND processed_at IS NULL",
+}
+
+
+@dataclass(slots=True)
+class MaintenanceReport:
+    """Результат обслуживания БД для журнала."""
+
+    durations: dict[str, float] = field(default_factory=dict)
+    table_sizes: dict[str, int] = field(default_factory=dict)
+    index_usage: dict[str, str] = field(default_factory=dict)
+    file_size: int = 0
+    freed_pages: int = 0
+    purged_events: int = 0
+    checkpoint: tuple[int, int, int] | None = None
+
+    @property
+    def full_scans(self) -> list[str]:
+        return [name for name, plan in self.index_usage.items() if plan.startswith("SCAN") and "USING" not in plan]
+
+
+def _purge_status_events(db: Session, cutoff: datetime) -> int:
+    """Задание писателя: удаляет события смены статуса, обработанные раньше ``cutoff``."""
+    return db.execute(
+        delete(StatusEvent).where(StatusEvent.processed_at.is_not(None), StatusEvent.processed_at < cutoff)
+    ).rowcount
+
+
+class DatabaseMaintenance:
+    """Чистит обработанные события статусов, обновляет статистику планировщика, возвращает свободные страницы и сбрасывает WAL.
+
+    Каждая операция ограничена по объёму: ``ANALYZE`` читает выборку строк
+    (``analysis_limit``), ``incremental_vacuum`` освобождает не больше
+    ``vacuum_pages`` страниц за запуск, поэтому задача не держит блокировку на
+    запись дольше нескольких секунд. Файл, созданный до включения
+    ``auto_vacuum = INCREMENTAL``, переводится в этот режим только полным ``VACUUM``,
+    который держит блокировку на запись всё время работы, поэтому он выполняется лишь
+    при явном ``convert_auto_vacuum`` (DATABASE_CONVERT_AUTO_VACUUM=1).
+    """
+
+    def __init__(
+        self,
+        main_engine: Engine = engine,
+        vacuum_pages: int = settings.database_vacuum_pages_per_run,
+        convert_auto_vacuum: bool = settings.database_convert_auto_vacuum,
+        status_events_days: int = settings.status_events_retention_days,
+        writer: DatabaseWriter = db_writer,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.main_engine = main_engine
+        self.vacuum_pages = vacuum_pages
+        self.convert_auto_vacuum = convert_auto_vacuum
+        self.status_events_days = status_events_days
+        self.writer = writer
+        self.clock = clock
+
+    @contextmanager
+    def _step(self, report: MaintenanceReport, name: str) -> Iterator[None]:
+        started = self.clock()
+        try:
+            yield
+        finally:
+            report.durations[name] = self.clock() - started
+
+    def run(self) -> MaintenanceReport:
+        report = MaintenanceReport()
+        if self.status_events_days > 0:
+            # До vacuum, чтобы освободившиеся страницы вернулись в этом же запуске.
+            with self._step(report, "status_events"):
+                cutoff = datetime.now() - timedelta(days=self.status_events_days)
+                report.purged_events = self.writer.run(_purge_status_events, cutoff)
+        with self.main_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            with self._step(report, "optimize"):
+                conn.exec_driver_sql(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+                conn.exec_driver_sql("PRAGMA optimize")
+            with self._step(report, "vacuum"):
+                report.freed_pages = self._vacuum(conn)
+            with self._step(report, "checkpoint"):
+                report.checkpoint = tuple(conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").one())
+            with self._step(report, "stats"):
+                report.file_size = self._pragma(conn, "page_count") * self._pragma(conn, "page_size")
+                report.table_sizes = self._table_sizes(conn)
+                report.index_usage = self._index_usage(conn)
+        self._log(report)
+        return report
+
+    @staticmethod
+    def _pragma(conn: Connection, name: str) -> int:
+        return int(conn.exec_driver_sql(f"PRAGMA {name}").scalar() or 0)
+
+    def _vacuum(self, conn: Connection) -> int:
+        freelist = self._pragma(conn, "freelist_count")
+        if self._pragma(conn, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+            self._convert_to_incremental(conn)
+        elif freelist and self.vacuum_pages > 0:
+            # Каждый шаг запроса освобождает одну страницу; execute() делает только первый шаг.
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({self.vacuum_pages});")
+        return freelist - self._pragma(conn, "freelist_count")
+
+    def _convert_to_incremental(self, conn: Connection) -> None:
+        size = self._pragma(conn, "page_count") * self._pragma(conn, "page_size")
+        expected = size / VACUUM_BYTES_PER_SECOND
+        if not self.convert_auto_vacuum:
+            logger.warning(
+                "Обслуживание БД: файл %.1f МБ не в режиме auto_vacuum = INCREMENTAL, свободные страницы не "
+                "возвращаются. Перевод — полный VACUUM примерно на %.0f сек с блокировкой записи; "
+                "включите его в тихое время через DATABASE_CONVERT_AUTO_VACUUM=1",
+                size / 1024 / 1024,
+                expected,
+            )
+            return
+        logger.info(
+            "Обслуживание БД: перевод файла %.1f МБ в auto_vacuum = INCREMENTAL (полный VACUUM, ожидается ~%.0f сек)",
+            size / 1024 / 1024,
+            expected,
+        )
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+    def _table_sizes(self, conn: Connection) -> dict[str, int]:
+        """Размер таблиц вместе с их индексами, в байтах (по ``dbstat``, если он есть в сборке SQLite)."""
+        try:
+            rows = conn.exec_driver_sql(
+                """
+                SELECT coalesce(m.tbl_name, s.name) AS table_name, SUM(s.pgsize)
+                FROM dbstat AS s
+                LEFT JOIN sqlite_master AS m ON m.name = s.name
+                GROUP BY table_name
+                ORDER BY 2 DESC
+                """
+            ).fetchall()
+        except OperationalError:
+            return {}
+        return {name: int(size) for name, size in rows}
+
+    @staticmethod
+    def _index_usage(conn: Connection) -> dict[str, str]:
+        usage = {}
+        for name, query in HOT_QUERIES.items():
+            params = (None,) * query.count("?")
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+            usage[name] = "; ".join(row[-1] for row in plan)
+        return usage
+
+    @staticmethod
+    def _log(report: MaintenanceReport) -> None:
+        durations = ", ".join(f"{name} {seconds:.2f} сек" for name, seconds in report.durations.items())
+        logger.info(
+            "Обслуживание БД: размер файла %.1f МБ, удалено обработанных событий статусов %s, "
+            "освобождено страниц %s, checkpoint WAL %s; %s",
+            report.file_size / 1024 / 1024,
+            report.purged_events,
+            report.freed_pages,
+            report.checkpoint,
+            durations,
+        )
+        if report.table_sizes:
+            sizes = ", ".join(f"{name} {size / 1024:.0f} КБ" for name, size in report.table_sizes.items())
+            logger.info("Обслуживание БД: размер таблиц с индексами: %s", sizes)
+        for name, plan in report.index_usage.items():
+            logger.info("Обслуживание БД: план %s: %s", name, plan)
+        if report.checkpoint and report.checkpoint[0]:
+            logger.warning("Обслуживание БД: WAL не удалось сбросить полностью, его держат активные читатели")
+        for name in report.full_scans:
+            logger.warning("Обслуживание БД: запрос «%s» читает таблицу целиком без индекса", name)
+
+
+database_maintenance = DatabaseMaintenance()
+
+
+async def maintain_database() -> None:
+    try:
+        await asyncio.to_thread(database_maintenance.run)
+    except Exception as exc:
+        logger.error("Ошибка обслуживания БД: %s", exc)
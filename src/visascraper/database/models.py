@@ -1,10 +1,17 @@
 from __future__ import annotations
 
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import DDL, Boolean, Column, Date, DateTime, Index, Integer, String, Text, UniqueConstraint, event, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import declarative_base
 
+from visascraper.utils.logger import logger
+
 Base = declarative_base()
 
+STATUS_EVENT_KIND_BATCH = "batch_application"
+STATUS_EVENT_KIND_STAY = "stay_permit"
+
 
 class User(Base):
     __tablename__ = "users"
@@ -20,7 +27,7 @@ class BatchApplication(Base):
 
     id = Column(Integer, primary_key=True)
     batch_no = Column(String)
-    register_number = Column(String, index=True)
+    register_number = Column(String, unique=True, index=True)
     full_name = Column(String, index=True)
     visitor_visa_number = Column(String)
     passport_number = Column(String, index=True)
@@ -30,6 +37,7 @@ class BatchApplication(Base):
     action_link = Column(String)
     account = Column(String, index=True)
     birth_date = Column(String)
+    birth_month_day = Column(String, index=True)
     last_status = Column(String, default=None)
     notified_as_new = Column(Boolean, default=False, nullable=False)
 
@@ -46,8 +54,162 @@ class StayPermit(Base):
     arrival_date = Column(String)
     issue_date = Column(String)
     expired_date = Column(String)
+    expires_on = Column(Date, index=True)
     status = Column(String)
     last_status = Column(String)
     action_link = Column(String)
     account = Column(String, index=True)
     notified_as_new = Column(Boolean, default=False, nullable=False)
+
+
+class PdfDocument(Base):
+    __tablename__ = "pdf_documents"
+    __table_args__ = (UniqueConstraint("kind", "register_number", name="uq_pdf_documents_kind_register_number"),)
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    register_number = Column(String, nullable=False)
+    content_hash = Column(String, nullable=False, index=True)
+    size = Column(Integer, nullable=False)
+    fetched_at = Column(DateTime, nullable=False)
+    source_url = Column(String)
+    remote_url = Column(String)
+    # Хеш версии, которая последней загружена на Яндекс.Диск; отличие от content_hash
+    # означает, что удалённый файл устарел и его нужно перезаписать.
+    uploaded_hash = Column(String)
+    last_accessed_at = Column(DateTime, index=True)
+    is_cached = Column(Boolean, default=True, nullable=False)
+
+
+class SheetSnapshot(Base):
+    __tablename__ = "sheet_snapshots"
+    __table_args__ = (
+        UniqueConstraint("spreadsheet_id", "title", name="uq_sheet_snapshots_spreadsheet_id_title"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    spreadsheet_id = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    rows = Column(Text, nullable=False)
+    modified_time = Column(String)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class ArchivedSheetRow(Base):
+    __tablename__ = "archived_sheet_rows"
+    __table_args__ = (UniqueConstraint("sheet_title", "row_key", name="uq_archived_sheet_rows_sheet_title_row_key"),)
+
+    id = Column(Integer, primary_key=True)
+    sheet_title = Column(String, nullable=False)
+    row_key = Column(String, nullable=False)
+    spreadsheet_id = Column(String, nullable=False)
+    archived_at = Column(DateTime, nullable=False)
+
+
+class ArchivedRecord(Base):
+    """Ключ заявки, перенесённой в архивную БД; такие заявки не добавляются в рабочие таблицы повторно."""
+
+    __tablename__ = "archived_records"
+    __table_args__ = (UniqueConstraint("kind", "register_number", name="uq_archived_records_kind_register_number"),)
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    register_number = Column(String, nullable=False)
+    archived_at = Column(DateTime, nullable=False)
+
+
+class StatusEvent(Base):
+    """Смена статуса заявки; пишется триггером в той же транзакции, что и обновление записи."""
+
+    __tablename__ = "status_events"
+    __table_args__ = (
+        Index(
+            "ix_status_events_unprocessed",
+            "kind",
+            "id",
+            sqlite_where=text("processed_at IS NULL"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    register_number = Column(String, nullable=False)
+    old_status = Column(String)
+    new_status = Column(String)
+    created_at = Column(DateTime, nullable=False)
+    processed_at = Column(DateTime)
+
+
+def _status_event_trigger(table_name: str, key_column: str, kind: str) -> DDL:
+    return DDL(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table_name}_status_event
+        AFTER UPDATE OF status ON {table_name}
+        WHEN OLD.status IS NOT NEW.status AND NEW.{key_column} IS NOT NULL
+        BEGIN
+            INSERT INTO status_events (kind, register_number, old_status, new_status, created_at)
+            VALUES ('{kind}', NEW.{key_column}, OLD.status, NEW.status, datetime('now', 'localtime'));
+        END
+        """
+    )
+
+
+STATUS_EVENT_TRIGGERS = (
+    _status_event_trigger("batch_applications", "register_number", STATUS_EVENT_KIND_BATCH),
+    _status_event_trigger("stay_permits", "reg_number", STATUS_EVENT_KIND_STAY),
+)
+
+
+FULLTEXT_INDEXES = {
+    "batch_applications": ("batch_applications_fts", ("full_name", "passport_number")),
+    "stay_permits": ("stay_permits_fts", ("name", "passport_number")),
+}
+
+
+def _fulltext_statements(table_name: str, fts_table: str, columns: tuple[str, ...]) -> tuple[str, ...]:
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    changed = " OR ".join(f"old.{column} IS NOT new.{column}" for column in columns)
+    delete_old = f"INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});"
+    return (
+        f"""
+        CREATE VIRTUAL TABLE {fts_table} USING fts5(
+            {column_list}, content='{table_name}', content_rowid='id', tokenize='trigram'
+        )
+        """,
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_fts_insert AFTER INSERT ON {table_name} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table_name}_fts_delete AFTER DELETE ON {table_name} BEGIN {delete_old} END",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table_name}_fts_update AFTER UPDATE OF {column_list} ON {table_name}
+        WHEN {changed}
+        BEGIN {delete_old} {insert_new} END
+        """,
+        f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')",
+    )
+
+
+def create_fulltext_indexes(connection: Connection) -> None:
+    """Создаёт триграммные FTS5-индексы для поиска по ФИО и паспорту и заполняет их по текущим данным.
+
+    Если SQLite собран без FTS5, поиск продолжает работать через ``LIKE``.
+    """
+    for table_name, (fts_table, columns) in FULLTEXT_INDEXES.items():
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,)
+        ).first()
+        if exists:
+            continue
+        try:
+            for statement in _fulltext_statements(table_name, fts_table, columns):
+                connection.exec_driver_sql(statement)
+        except OperationalError as exc:
+            logger.warning("Полнотекстовый индекс %s не создан: %s", fts_table, exc)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_status_event_triggers(target, connection: Connection, **kwargs) -> None:
+    for trigger in STATUS_EVENT_TRIGGERS:
+        connection.execute(trigger)
+    create_fulltext_indexes(connection)
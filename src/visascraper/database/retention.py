@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import TypeVar
+
+from sqlalchemy import MetaData, Table, create_engine
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from visascraper.config import settings
+from visascraper.database.db import engine
+from visascraper.database.lookups import IN_CHUNK_SIZE
+from visascraper.database.models import (
+    STATUS_EVENT_KIND_BATCH,
+    STATUS_EVENT_KIND_STAY,
+    BatchApplication,
+    StayPermit,
+    create_fulltext_indexes,
+)
+from visascraper.database.writer import DatabaseWriter, db_writer
+from visascraper.dto import FINAL_STATUSES
+from visascraper.utils.logger import logger
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True, frozen=True)
+class RetentionRule:
+    """Какие записи таблицы считаются завершёнными и старыми."""
+
+    table: Table
+    kind: str
+    key_column: str
+    where: str
+
+
+_FINAL_STATUSES_SQL = ", ".join(f"'{status}'" for status in FINAL_STATUSES)
+
+RETENTION_RULES = (
+    RetentionRule(
+        table=BatchApplication.__table__,
+        kind=STATUS_EVENT_KIND_BATCH,
+        key_column="register_number",
+        # payment_date хранится как DD-MM-YYYY.
+        where=(
+            f"lower(status) IN ({_FINAL_STATUSES_SQL}) "
+            "AND payment_date GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]' "
+            "AND substr(payment_date, 7, 4) || '-' || substr(payment_date, 4, 2) || '-' || substr(payment_date, 1, 2) < ?"
+        ),
+    ),
+    RetentionRule(
+        table=StayPermit.__table__,
+        kind=STATUS_EVENT_KIND_STAY,
+        key_column="reg_number",
+        where="expires_on < ?",
+    ),
+)
+
+
+def _drop_archived(db: Session, rule: RetentionRule, ids: list[int], archived_at: str) -> None:
+    """Задание писателя: запоминает ключи перенесённых записей и удаляет их из рабочей БД."""
+    table = rule.table.name
+    selected = f"FROM {table} WHERE id IN ({', '.join('?' * len(ids))})"
+    conn = db.connection()
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO archived_records (kind, register_number, archived_at) "
+        f"SELECT ?, {rule.key_column}, ? {selected}",
+        (rule.kind, archived_at, *ids),
+    )
+    conn.exec_driver_sql(f"DELETE {selected}", tuple(ids))
+
+
+def _columns(conn: Connection, schema: str, table: str) -> list[str]:
+    return [row[1] for row in conn.exec_driver_sql(f"PRAGMA {schema}.table_info({table})")]
+
+
+class RecordArchiver:
+    """Переносит завершённые старые заявки из рабочей БД в отдельный файл SQLite.
+
+    Рабочие таблицы и их индексы остаются маленькими, а ключи перенесённых заявок
+    сохраняются в ``archived_records``, чтобы парсер не вернул их как новые.
+    Перенос идёт пачками: сначала строки фиксируются в архивном файле, затем
+    через ``db_writer`` записываются ключи и строки удаляются из рабочей БД. Если
+    запуск прервался между этими шагами, следующий повторно не копирует строки,
+    уже попавшие в архив (``INSERT OR IGNORE``), а только удаляет их.
+    """
+
+    def __init__(
+        self,
+        main_engine: Engine = engine,
+        archive_path: Path = settings.database_archive_path,
+        max_age_days: int = settings.database_archive_after_days,
+        batch_size: int = IN_CHUNK_SIZE,
+        writer: DatabaseWriter = db_writer,
+    ):
+        self.main_engine = main_engine
+        self.writer = writer
+        self.archive_path = archive_path
+        self.max_age_days = max_age_days
+        self.batch_size = batch_size
+        self._read_sessions: sessionmaker[Session] | None = None
+        self._lock = threading.Lock()
+
+    def ensure_archive(self) -> None:
+        archive_metadata = MetaData()
+        for rule in RETENTION_RULES:
+            rule.table.to_metadata(archive_metadata)
+        archive_engine = create_engine(f"sqlite:///{self.archive_path.as_posix()}")
+        try:
+            archive_metadata.create_all(bind=archive_engine)
+            with archive_engine.begin() as conn:
+                create_fulltext_indexes(conn)
+        finally:
+            archive_engine.dispose()
+
+    def archive(self, today: date | None = None) -> dict[str, int]:
+        if self.max_age_days <= 0:
+            return {}
+
+        cutoff = ((today or date.today()) - timedelta(days=self.max_age_days)).isoformat()
+        self.ensure_archive()
+        moved: dict[str, int] = {}
+        with self.main_engine.connect() as conn:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS archive", (self.archive_path.as_posix(),))
+            try:
+                for rule in RETENTION_RULES:
+                    moved[rule.table.name] = self._archive_table(conn, rule, cutoff)
+            finally:
+                conn.rollback()
+                conn.exec_driver_sql("DETACH DATABASE archive")
+
+        logger.info("Архивация БД: перенесено записей старше %s дней: %s", self.max_age_days, moved)
+        return moved
+
+    def _archive_table(self, conn: Connection, rule: RetentionRule, cutoff: str) -> int:
+        table = rule.table.name
+        archive_columns = set(_columns(conn, "archive", table))
+        columns = ", ".join(name for name in _columns(conn, "main", table) if name != "id" and name in archive_columns)
+        moved = 0
+        while True:
+            ids = [
+                row[0]
+                for row in conn.exec_driver_sql(
+                    f"SELECT id FROM main.{table} WHERE {rule.where} LIMIT ?",
+                    (cutoff, self.batch_size),
+                )
+            ]
+            if not ids:
+                return moved
+
+            # В режиме WAL коммит в несколько файлов не атомарен, поэтому архив
+            # фиксируется отдельно и до удаления из рабочей БД.
+            conn.exec_driver_sql(
+                f"INSERT OR IGNORE INTO archive.{table} ({columns}) "
+                f"SELECT {columns} FROM main.{table} WHERE id IN ({', '.join('?' * len(ids))})",
+                tuple(ids),
+            )
+            conn.commit()
+            self.writer.run(_drop_archived, rule, ids, datetime.now().isoformat(sep=" "))
+            moved += len(ids)
+
+    def search(self, search: Callable[[Session, str], list[T]], search_input: str) -> list[T]:
+        """Выполняет ту же функцию поиска по архивной БД (только чтение)."""
+        if not self.archive_path.exists():
+            return []
+        with self._lock:
+            if self._read_sessions is None:
+                archive_engine = create_engine(
+                    f"sqlite:///file:{self.archive_path.as_posix()}?mode=ro&uri=true",
+                    connect_args={"check_same_thread": False},
+                )
+                self._read_sessions = sessionmaker(autocommit=False, autoflush=False, bind=archive_engine)
+        with self._read_sessions() as db:
+            results = search(db, search_input)
+        if results:
+            logger.info("Найдено записей в архивной БД: %s", len(results))
+        return results
+
+
+record_archiver = RecordArchiver()
+
+
+async def archive_old_records() -> None:
+    try:
+        await asyncio.to_thread(record_archiver.archive)
+    except Exception as exc:
+        logger.error("Ошибка архивации записей БД: %s", exc)
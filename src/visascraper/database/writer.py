@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import queue
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from visascraper.database.db import WriterSessionLocal
+from visascraper.utils.logger import logger
+
+T = TypeVar("T")
+MAX_WRITE_BATCH = 100
+
+
+@dataclass(slots=True)
+class WriteJob:
+    func: Callable[..., Any]
+    args: tuple[Any, ...]
+    future: Future[Any]
+
+
+class DatabaseWriter:
+    """Единственный поток, который пишет в SQLite.
+
+    Задания из очереди выполняются пачками в одной транзакции и фиксируются одним
+    COMMIT (group commit). Каждое задание идёт в своём SAVEPOINT, поэтому ошибка
+    одного откатывает только его. Задание получает сессию первым аргументом и не
+    должно вызывать ``commit`` само.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker[Session] = WriterSessionLocal,
+        max_batch: int = MAX_WRITE_BATCH,
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.commits = 0
+        self._queue: queue.Queue[WriteJob | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., T], *args: Any) -> Future[T]:
+        future: Future[T] = Future()
+        self._ensure_started()
+        self._queue.put(WriteJob(func, args, future))
+        return future
+
+    def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Выполняет запись и ждёт её фиксации. Нельзя вызывать из самого потока писателя."""
+        return self.submit(func, *args).result()
+
+    def close(self, timeout: float = 10.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout=timeout)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._execute(batch)
+
+    def _execute(self, batch: list[WriteJob]) -> None:
+        outcomes: list[tuple[WriteJob, Any, BaseException | None]] = []
+        try:
+            with self.session_factory() as db:
+                for job in batch:
+                    try:
+                        with db.begin_nested():
+                            outcomes.append((job, job.func(db, *job.args), None))
+                    except Exception as exc:
+                        outcomes.append((job, None, exc))
+                db.commit()
+            self.commits += 1
+        except Exception as exc:
+            logger.error("Не удалось зафиксировать пачку из %s записей в БД: %s", len(batch), exc)
+            for job in batch:
+                job.future.set_exception(exc)
+            return
+
+        for job, result, error in outcomes:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+
+db_writer = DatabaseWriter()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import date, datetime
 
 BATCH_APPLICATION_HEADERS = [
     "Batch No",
@@ -22,6 +23,7 @@ BATCH_MANAGER_HEADERS = [
     "Status",
     "Action Link",
     "Account",
+    "Register Number",
 ]
 STAY_PERMIT_HEADERS = [
     "Name",
@@ -34,13 +36,48 @@ STAY_PERMIT_HEADERS = [
     "Action Link",
     "Passport Number",
     "Account",
+    "Register Number",
 ]
 
+SHEET_BATCH_APPLICATION = "Batch Application"
+SHEET_BATCH_MANAGER = "Batch Application(Manager)"
+SHEET_STAY_PERMIT = "StayPermit"
+
+IDX_BA_REGISTER_NUMBER = 1
+IDX_BA_PAYMENT_DATE = 6
+IDX_BA_STATUS = 8
 IDX_BA_ACCOUNT = 10
 IDX_MGR_ACCOUNT = 5
 IDX_MGR_PAYMENT_DATE = 2
+IDX_MGR_STATUS = 3
+IDX_MGR_REGISTER_NUMBER = 6
+IDX_SP_EXPIRED_DATE = 5
+IDX_SP_STATUS = 6
+IDX_SP_PASSPORT_NUMBER = 8
 IDX_SP_ACCOUNT = 9
+IDX_SP_REGISTER_NUMBER = 10
 PAYMENT_DATE_FORMAT = "%d-%m-%Y"
+STAY_DATE_FORMAT = "%Y-%m-%d"
+BIRTH_DATE_FORMAT = "%d/%m/%Y"
+PORTAL_DATE_FORMATS = (STAY_DATE_FORMAT, BIRTH_DATE_FORMAT, PAYMENT_DATE_FORMAT, "%d.%m.%Y")
+FINAL_STATUSES = ("approved", "rejected", "expired", "canceled", "cancelled")
+
+
+def parse_portal_date(value: str | None) -> date | None:
+    """Разбирает дату портала в любом из известных форматов; ``None``, если формат не распознан."""
+    value = (value or "").strip()
+    for date_format in PORTAL_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def birth_month_day(value: str | None) -> str | None:
+    """Ключ ``MM-DD`` для поиска дней рождения по индексу."""
+    parsed = parse_portal_date(value)
+    return parsed.strftime("%m-%d") if parsed else None
 
 
 @dataclass(slots=True)
@@ -57,7 +94,7 @@ class BatchApplicationData:
     account: str
     birth_date: str
 
-    def to_db_dict(self) -> dict[str, str]:
+    def to_db_dict(self) -> dict[str, str | None]:
         return {
             "batch_no": self.batch_no,
             "register_number": self.register_number,
@@ -70,6 +107,7 @@ class BatchApplicationData:
             "action_link": self.action_link,
             "account": self.account,
             "birth_date": self.birth_date,
+            "birth_month_day": birth_month_day(self.birth_date),
         }
 
     def to_client_table_row(self) -> list[str]:
@@ -95,6 +133,7 @@ class BatchApplicationData:
             self.status,
             self.action_link,
             self.account,
+            self.register_number,
         ]
 
 
@@ -112,7 +151,7 @@ class StayPermitData:
     action_link: str
     account: str
 
-    def to_db_dict(self) -> dict[str, str]:
+    def to_db_dict(self) -> dict[str, str | date | None]:
         return {
             "reg_number": self.reg_number,
             "name": self.name,
@@ -122,6 +161,7 @@ class StayPermitData:
             "arrival_date": self.arrival_date,
             "issue_date": self.issue_date,
             "expired_date": self.expired_date,
+            "expires_on": parse_portal_date(self.expired_date),
             "status": self.status,
             "action_link": self.action_link,
             "account": self.account,
@@ -139,4 +179,5 @@ class StayPermitData:
             self.action_link,
             self.passport_number,
             self.account,
+            self.reg_number,
         ]
@@ -1,10 +1,349 @@
 from __future__ import annotations
 
+import json
+import threading
+import time
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
 import gspread
+import requests
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+from gspread.auth import DEFAULT_SCOPES
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+from visascraper.config import settings
+from visascraper.utils.logger import logger
+
+SHEETS_API_HOST = "sheets.googleapis.com"
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRY_DELAY_SECONDS = 64.0
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+TOKEN_RETRY_SECONDS = 30.0
+HTTP_POOL_SIZE = 8
+
+
+class TokenBucket:
+    """Распределяет запросы равномерно в пределах квоты ``per_minute``.
+
+    Токен резервируется сразу, даже если его ещё нет: баланс уходит в минус, и
+    вызывающий поток спит ровно до своей очереди, так что ожидающие запросы
+    обслуживаются по порядку, а не наперегонки.
+    """
+
+    def __init__(
+        self,
+        per_minute: int,
+        burst: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = max(1, per_minute) / 60.0
+        self.capacity = float(max(1, min(burst, per_minute)))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def penalize(self, seconds: float) -> None:
+        """Откладывает все следующие запросы минимум на ``seconds`` (после ответа 429)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class SheetsQuota:
+    """Общий для всех клиентов учёт квот Sheets API на чтение и запись.
+
+    Одинаковые GET-запросы, выполняющиеся одновременно, объединяются: в API уходит
+    один запрос, остальные потоки получают его ответ.
+    """
+
+    def __init__(
+        self,
+        reads_per_minute: int,
+        writes_per_minute: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.reads = TokenBucket(reads_per_minute, clock=clock, sleep=sleep)
+        self.writes = TokenBucket(writes_per_minute, clock=clock, sleep=sleep)
+        self.sleep = sleep
+        self.coalesced = 0
+        self._inflight: dict[Hashable, Future[Response]] = {}
+        self._inflight_lock = threading.Lock()
+
+    def bucket_for(self, method: str, endpoint: str) -> TokenBucket | None:
+        if SHEETS_API_HOST not in endpoint:
+            return None
+        return self.reads if method.lower() == "get" else self.writes
+
+    def single_flight(self, key: Hashable, call: Callable[[], Response]) -> Response:
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            response = call()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+
+sheets_quota = SheetsQuota(
+    reads_per_minute=settings.sheets_read_requests_per_minute,
+    writes_per_minute=settings.sheets_write_requests_per_minute,
+)
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _is_rate_limited(exc: APIError) -> bool:
+    if exc.code == 429:
+        return True
+    errors = exc.error.get("errors") or []
+    return exc.code == 403 and any(error.get("domain") == "usageLimits" for error in errors)
+
+
+def _retry_after(exc: APIError) -> float | None:
+    header = getattr(exc.response, "headers", {}).get("Retry-After")
+    try:
+        return float(header) if header else None
+    except ValueError:
+        return None
+
+
+class QuotaAwareHTTPClient(HTTPClient):
+    """HTTP-клиент gspread, который заранее выдерживает квоты Sheets API.
+
+    Запросы к Sheets проходят через токен-бакеты ``sheets_quota`` (чтение и запись
+    отдельно), одинаковые параллельные GET объединяются, а ответы 429/5xx
+    повторяются с паузой из ``Retry-After`` или экспоненциальной задержкой.
+    """
+
+    quota: SheetsQuota = sheets_quota
+    max_attempts = 5
+
+    def request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Any = None,
+        data: bytes | None = None,
+        json: Any = None,
+        files: Any = None,
+        headers: Any = None,
+    ) -> Response:
+        def call() -> Response:
+            return self._request_within_quota(method, endpoint, params, data, json, files, headers)
+
+        if method.lower() == "get" and data is None and json is None and files is None:
+            return self.quota.single_flight((endpoint, _freeze(params)), call)
+        return call()
+
+    def _request_within_quota(
+        self,
+        method: str,
+        endpoint: str,
+        params: Any,
+        data: bytes | None,
+        json: Any,
+        files: Any,
+        headers: Any,
+    ) -> Response:
+        bucket = self.quota.bucket_for(method, endpoint)
+        attempt = 0
+        while True:
+            attempt += 1
+            if bucket:
+                bucket.acquire()
+            try:
+                return super().request(method, endpoint, params=params, data=data, json=json, files=files, headers=headers)
+            except APIError as exc:
+                rate_limited = _is_rate_limited(exc)
+                if attempt == self.max_attempts or not (rate_limited or exc.code in RETRYABLE_STATUS_CODES):
+                    raise
+
+                delay = _retry_after(exc) or min(2.0**attempt, MAX_RETRY_DELAY_SECONDS)
+                logger.warning(
+                    "Google Sheets ответил %s на %s, повтор через %.0f сек (попытка %s/%s)",
+                    exc.code,
+                    method.upper(),
+                    delay,
+                    attempt,
+                    self.max_attempts,
+                )
+                if rate_limited and bucket:
+                    bucket.penalize(delay)
+                else:
+                    self.quota.sleep(delay)
+
+
+def load_service_account_credentials() -> Credentials:
+    if settings.google_service_account_json:
+        logger.info("Google Sheets инициализирован через GOOGLE_SERVICE_ACCOUNT_JSON")
+        return Credentials.from_service_account_info(
+            json.loads(settings.google_service_account_json),
+            scopes=DEFAULT_SCOPES,
+        )
+
+    credentials_file = settings.google_service_account_file
+    if not credentials_file.exists():
+        raise FileNotFoundError(
+            "Не найден файл сервисного аккаунта Google. "
+            f"Ожидаемый путь: {credentials_file}. "
+            "Укажите GOOGLE_SERVICE_ACCOUNT_FILE или GOOGLE_SERVICE_ACCOUNT_JSON."
+        )
+
+    logger.info("Google Sheets инициализирован через сервисный аккаунт: %s", credentials_file)
+    return Credentials.from_service_account_file(str(credentials_file), scopes=DEFAULT_SCOPES)
+
+
+class SharedGoogleClient:
+    """Один авторизованный клиент gspread на весь процесс.
+
+    Учётные данные читаются один раз, HTTP-сессия держит пул keep-alive соединений
+    к Google API, а фоновый поток обновляет токен за ``refresh_margin`` до истечения,
+    поэтому запросы к Sheets не ждут получения токена и установки TLS.
+    """
+
+    def __init__(
+        self,
+        credentials_factory: Callable[[], Credentials] = load_service_account_credentials,
+        refresh_margin: timedelta = TOKEN_REFRESH_MARGIN,
+        pool_size: int = HTTP_POOL_SIZE,
+    ):
+        self.credentials_factory = credentials_factory
+        self.refresh_margin = refresh_margin
+        self.pool_size = pool_size
+        self._client: gspread.Client | None = None
+        self._credentials: Credentials | None = None
+        self._token_session: requests.Session | None = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: threading.Thread | None = None
+
+    def _pooled_adapter(self) -> HTTPAdapter:
+        return HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+
+    def get(self) -> gspread.Client:
+        with self._lock:
+            if self._client is not None:
+                return self._client
+
+            credentials = self.credentials_factory()
+            client = gspread.Client(auth=credentials, http_client=QuotaAwareHTTPClient)
+            client.http_client.session.mount("https://", self._pooled_adapter())
+            self._token_session = requests.Session()
+            self._token_session.mount("https://", self._pooled_adapter())
+            self._credentials = credentials
+            self._client = client
+
+        # Первый токен запрашивается вне блокировки и без падения при недоступном Google:
+        # gspread сам обновит токен перед запросом, а фоновый поток будет повторять попытки.
+        try:
+            self.refresh_token()
+            delay = self.next_refresh_delay()
+        except Exception as exc:
+            logger.warning("Не удалось получить токен Google, повтор через %.0f сек: %s", TOKEN_RETRY_SECONDS, exc)
+            delay = TOKEN_RETRY_SECONDS
+        self._start_refresher(delay)
+        return client
+
+    def _start_refresher(self, delay: float) -> None:
+        with self._lock:
+            if self._refresher is not None or self._client is None:
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, args=(delay,), name="google-token-refresh", daemon=True
+            )
+            self._refresher.start()
+
+    def refresh_token(self) -> None:
+        if self._credentials is None or self._token_session is None:
+            return
+        with self._refresh_lock:
+            self._credentials.refresh(Request(self._token_session))
+
+    def next_refresh_delay(self) -> float:
+        expiry = self._credentials.expiry if self._credentials is not None else None
+        if expiry is None:
+            return 0.0
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return max(0.0, (expiry - self.refresh_margin - now).total_seconds())
+
+    def _refresh_loop(self, delay: float) -> None:
+        while not self._stop.wait(delay):
+            try:
+                self.refresh_token()
+                delay = self.next_refresh_delay()
+            except Exception as exc:
+                logger.warning("Не удалось заранее обновить токен Google: %s", exc)
+                delay = TOKEN_RETRY_SECONDS
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=5)
+        with self._lock:
+            if self._client is not None:
+                self._client.http_client.session.close()
+            if self._token_session is not None:
+                self._token_session.close()
+            self._client = None
+            self._credentials = None
+            self._token_session = None
+            self._refresher = None
+
+
+google_client = SharedGoogleClient()
 
 
 def setup_google_sheet(credentials_path: dict, sheet_id: str) -> tuple[gspread.Client, gspread.Spreadsheet]:
-    gc = gspread.service_account_from_dict(credentials_path)
+    gc = gspread.service_account_from_dict(credentials_path, http_client=QuotaAwareHTTPClient)
     spreadsheet = gc.open_by_key(sheet_id)
     return gc, spreadsheet
 
@@ -14,8 +14,10 @@ from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from visascraper.config import settings
+from visascraper.services.accounts_cache import AccountCredentialsCache, account_credentials_cache
 from visascraper.services.scraper import DataParser
-from visascraper.services.sheets import GoogleSheetsManager
+from visascraper.services.sheets import GoogleSheetsManager, SheetsStreamWriter
+from visascraper.services.sheets_archive import SheetsArchiver
 from visascraper.utils.logger import logger
 
 ProgressCallback = Callable[[int, int, str, int, int, int], None]
@@ -199,9 +201,16 @@ class TelegramProgressReporter:
 
 
 class JobScheduler:
-    def __init__(self, gs_manager: GoogleSheetsManager, data_parser: DataParser):
+    def __init__(
+        self,
+        gs_manager: GoogleSheetsManager,
+        data_parser: DataParser,
+        accounts_cache: AccountCredentialsCache = account_credentials_cache,
+    ):
         self.gs_manager = gs_manager
         self.data_parser = data_parser
+        self.accounts_cache = accounts_cache
+        self.archiver = SheetsArchiver()
         self.scheduler = BackgroundScheduler(timezone=settings.app_timezone)
 
     @staticmethod
@@ -227,7 +236,13 @@ class JobScheduler:
         return any(fragment in error_text for fragment in retryable_fragments)
 
     def _get_accounts(self) -> list[tuple[str, str]]:
-        max_attempts = 4
+        cached = self.accounts_cache.fresh_accounts()
+        if cached is not None:
+            return cached
+
+        last_good = self.accounts_cache.last_good()
+        # При наличии сохранённого списка не ждём повторов: парсинг не должен простаивать из-за Sheets.
+        max_attempts = 1 if last_good is not None else 4
         last_exc: Exception | None = None
 
         for attempt in range(1, max_attempts + 1):
@@ -235,6 +250,8 @@ class JobScheduler:
                 accounts = self.gs_manager.get_account_credentials()
                 if not accounts:
                     logger.warning("В таблице аккаунтов не найдено ни одной пары логин/пароль")
+                if self.accounts_cache.update(accounts):
+                    logger.info("Список аккаунтов изменился: %s аккаунтов", len(accounts))
                 return accounts
             except Exception as exc:
                 last_exc = exc
@@ -247,18 +264,20 @@ class JobScheduler:
                         exc,
                         delay,
                     )
-                    try:
-                        self.gs_manager = GoogleSheetsManager()
-                        logger.info("Клиент Google Sheets переинициализирован перед повторной попыткой %s/%s", attempt + 1, max_attempts)
-                    except Exception as reinit_exc:
-                        logger.warning("Не удалось переинициализировать клиент Google Sheets перед повторной попыткой: %s", reinit_exc)
                     time.sleep(delay)
                     logger.info("Повторяем чтение таблицы аккаунтов: попытка %s/%s", attempt + 1, max_attempts)
                     continue
+                break
 
-                logger.error("Не удалось прочитать таблицу аккаунтов: %s", exc)
-                raise AccountsReadError(str(exc)) from exc
+        if last_good is not None:
+            logger.warning(
+                "Таблица аккаунтов недоступна (%s), используем сохранённый список от %s",
+                last_exc,
+                self.accounts_cache.fetched_at,
+            )
+            return last_good
 
+        logger.error("Не удалось прочитать таблицу аккаунтов: %s", last_exc)
         raise AccountsReadError(str(last_exc) if last_exc else "Неизвестная ошибка чтения таблицы аккаунтов")
 
     def _run_accounts(
@@ -273,12 +292,24 @@ class JobScheduler:
 
         names = [name for name, _ in accounts]
         passwords = [password for _, password in accounts]
-        batch_rows, manager_rows, stay_rows = self.data_parser.parse_accounts(
-            names,
-            passwords,
-            progress_callback=progress_callback,
-        )
-        self.gs_manager.write_to_sheet(batch_rows, manager_rows, stay_rows)
+        sink = SheetsStreamWriter(self.gs_manager)
+        try:
+            self.data_parser.parse_accounts(
+                names,
+                passwords,
+                progress_callback=progress_callback,
+                account_callback=sink.add,
+            )
+        except BaseException:
+            # Даже при падении парсинга сохраняем в таблицу уже обработанные аккаунты,
+            # но ошибка записи не должна подменить исходную ошибку парсинга.
+            try:
+                sink.close()
+            except Exception as close_exc:
+                logger.error("Не удалось записать в Google Sheets строки задачи '%s': %s", label, close_exc)
+            raise
+        sink.close()
+        self.archiver.run_if_due(self.gs_manager)
         logger.info("Задача '%s' успешно завершена", label)
 
     def _run_with_telegram_progress(
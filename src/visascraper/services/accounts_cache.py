@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from visascraper.config import DATA_DIR, settings
+from visascraper.utils.logger import logger
+
+LEGACY_CACHE_PATH = DATA_DIR / "accounts_cache.json"
+
+
+def _fernet(key: str | None) -> Fernet | None:
+    if not key:
+        return None
+    try:
+        return Fernet(key.encode("ascii"))
+    except (ValueError, UnicodeEncodeError) as exc:
+        logger.warning("ACCOUNTS_CACHE_KEY некорректен, кэш аккаунтов хранится только в памяти: %s", exc)
+        return None
+
+
+class AccountCredentialsCache:
+    """Локальная копия списка аккаунтов из листа «Аккаунты».
+
+    Лист перечитывается не чаще ``refresh_interval``; изменения определяются по
+    контрольной сумме списка. В списке пароли портала, поэтому на диск он
+    пишется только зашифрованным ключом ``ACCOUNTS_CACHE_KEY`` (Fernet); без ключа
+    последний успешно прочитанный список живёт в памяти до перезапуска.
+    """
+
+    def __init__(
+        self,
+        path: Path = settings.accounts_cache_path,
+        key: str | None = settings.accounts_cache_key,
+        refresh_interval: timedelta = timedelta(minutes=settings.accounts_refresh_minutes),
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        self.path = path
+        self._cipher = _fernet(key)
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._accounts: list[tuple[str, str]] | None = None
+        self._checksum: str | None = None
+        self._fetched_at: datetime | None = None
+
+    @staticmethod
+    def checksum(accounts: list[tuple[str, str]]) -> str:
+        payload = json.dumps(accounts, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def fetched_at(self) -> datetime | None:
+        return self._fetched_at
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if LEGACY_CACHE_PATH.exists():
+            LEGACY_CACHE_PATH.unlink(missing_ok=True)
+            logger.info("Удалён незашифрованный кэш аккаунтов %s", LEGACY_CACHE_PATH)
+        if self._cipher is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self._cipher.decrypt(self.path.read_bytes()))
+            self._accounts = [(str(name), str(password)) for name, password in data["accounts"]]
+            self._checksum = data["checksum"]
+            self._fetched_at = datetime.fromisoformat(data["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError, InvalidToken) as exc:
+            logger.warning("Кэш аккаунтов %s повреждён, он будет перечитан из Google Sheets: %s", self.path, exc)
+            self._accounts = self._checksum = self._fetched_at = None
+
+    def fresh_accounts(self) -> list[tuple[str, str]] | None:
+        """Список аккаунтов, если он прочитан не раньше ``refresh_interval`` назад."""
+        with self._lock:
+            self._ensure_loaded()
+            if self._accounts is None or self._fetched_at is None:
+                return None
+            if self.clock() - self._fetched_at >= self.refresh_interval:
+                return None
+            return list(self._accounts)
+
+    def last_good(self) -> list[tuple[str, str]] | None:
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._accounts) if self._accounts is not None else None
+
+    def update(self, accounts: list[tuple[str, str]]) -> bool:
+        """Сохраняет свежий список и возвращает ``True``, если он отличается от предыдущего."""
+        checksum = self.checksum(accounts)
+        with self._lock:
+            self._ensure_loaded()
+            changed = checksum != self._checksum
+            self._accounts = list(accounts)
+            self._checksum = checksum
+            self._fetched_at = self.clock()
+            self._write()
+        return changed
+
+    def _write(self) -> None:
+        if self._cipher is None:
+            return
+        payload = {
+            "checksum": self._checksum,
+            "fetched_at": self._fetched_at.isoformat() if self._fetched_at else None,
+            "accounts": self._accounts,
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            token = self._cipher.encrypt(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+            # Даже зашифрованный файл доступен только владельцу процесса.
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as file:
+                file.write(token)
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            logger.warning("Не удалось сохранить кэш аккаунтов %s: %s", self.path, exc)
+
+
+account_credentials_cache = AccountCredentialsCache()
@@ -0,0 +1,458 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, sessionmaker
+
+from visascraper.config import ensure_runtime_dirs, settings
+from visascraper.database.db import SessionLocal
+from visascraper.database.lookups import filter_in_chunks
+from visascraper.database.models import BatchApplication, PdfDocument, StayPermit
+from visascraper.database.writer import DatabaseWriter, db_writer
+from visascraper.dto import FINAL_STATUSES
+from visascraper.utils.logger import logger
+
+ensure_runtime_dirs()
+
+PDF_KIND_BATCH = "batch_application"
+PDF_KIND_STAY = "stay_permit"
+PDF_CHUNK_SIZE = 64 * 1024
+ACCESS_TOUCH_INTERVAL = timedelta(minutes=10)
+STALE_PART_SECONDS = 3600
+
+
+@dataclass(slots=True, frozen=True)
+class StoredPdf:
+    kind: str
+    register_number: str
+    content_hash: str
+    size: int
+    fetched_at: datetime
+    remote_url: str | None
+    path: Path
+    uploaded_hash: str | None = None
+    cached: bool = True
+
+    @property
+    def filename(self) -> str:
+        return pdf_filename(self.kind, self.register_number)
+
+    @property
+    def needs_overwrite(self) -> bool:
+        """На Яндекс.Диске лежит другая версия файла, и её нужно перезаписать."""
+        return self.uploaded_hash is not None and self.uploaded_hash != self.content_hash
+
+
+@dataclass(slots=True, frozen=True)
+class PdfCacheStats:
+    hits: int
+    misses: int
+    evicted_files: int
+    evicted_bytes: int
+    cached_files: int
+    cached_bytes: int
+    pinned_files: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def pdf_filename(kind: str, register_number: str) -> str:
+    return f"{register_number}_{kind}.pdf"
+
+
+def iter_file_chunks(path: Path, chunk_size: int = PDF_CHUNK_SIZE) -> Iterator[bytes]:
+    with path.open("rb") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+class PDFStore:
+    """Content-addressed PDF storage with an index in SQLite.
+
+    Files live under ``root`` as ``<sha256>.pdf``; the ``pdf_documents`` table maps
+    (kind, register number) to the current hash, size, fetch time and Yandex link.
+    The local copy is a bounded cache: ``enforce_limits`` evicts least recently used
+    files over ``max_bytes`` or unused for ``max_idle``, keeping pinned ones. Index rows
+    (and their remote links) survive eviction. ``session_factory`` is used for reads
+    only; every index write goes through ``writer``.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        session_factory: sessionmaker[Session] = SessionLocal,
+        max_age: timedelta | None = None,
+        max_bytes: int | None = None,
+        max_idle: timedelta | None = None,
+        pin_window: timedelta | None = None,
+        writer: DatabaseWriter = db_writer,
+    ):
+        self.root = root
+        self.session_factory = session_factory
+        self.writer = writer
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_idle = max_idle
+        self.pin_window = pin_window
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evicted_files = 0
+        self._evicted_bytes = 0
+
+    def _blob_path(self, content_hash: str) -> Path:
+        return self.root / f"{content_hash}.pdf"
+
+    def _to_stored(self, record: PdfDocument) -> StoredPdf:
+        return StoredPdf(
+            kind=record.kind,
+            register_number=record.register_number,
+            content_hash=record.content_hash,
+            size=record.size,
+            fetched_at=record.fetched_at,
+            remote_url=record.remote_url or None,
+            path=self._blob_path(record.content_hash),
+            uploaded_hash=record.uploaded_hash or None,
+            cached=bool(record.is_cached),
+        )
+
+    @staticmethod
+    def _get_record(db: Session, kind: str, register_number: str) -> PdfDocument | None:
+        return (
+            db.query(PdfDocument)
+            .filter(PdfDocument.kind == kind, PdfDocument.register_number == register_number)
+            .first()
+        )
+
+    def _import_legacy_file(self, kind: str, register_number: str) -> StoredPdf | None:
+        legacy_path = settings.temp_dir / pdf_filename(kind, register_number)
+        if not legacy_path.is_file():
+            return None
+        stored = self.put_stream(kind, register_number, iter_file_chunks(legacy_path))
+        legacy_path.unlink(missing_ok=True)
+        if stored:
+            logger.info("PDF %s перенесён в хранилище по хешу", legacy_path.name)
+        return stored
+
+    def _count(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def lookup(self, kind: str, register_number: str) -> StoredPdf | None:
+        """Единая точка поиска PDF: возвращает запись индекса, если файл есть в локальном кэше."""
+        if not register_number:
+            return None
+        now = datetime.now()
+        with self.session_factory() as db:
+            record = self._get_record(db, kind, register_number)
+            stored = self._to_stored(record) if record else None
+            last_accessed_at = record.last_accessed_at if record else None
+        if stored and stored.cached:
+            if stored.path.is_file():
+                if last_accessed_at is None or now - last_accessed_at > ACCESS_TOUCH_INTERVAL:
+                    # Отметка доступа нужна только для LRU, ждать её фиксации незачем.
+                    self.writer.submit(_touch_record, kind, register_number, now)
+                self._count(hit=True)
+                return stored
+            self.writer.run(_mark_not_cached, kind, register_number)
+
+        imported = self._import_legacy_file(kind, register_number)
+        self._count(hit=imported is not None)
+        return imported
+
+    def get_entry(self, kind: str, register_number: str) -> StoredPdf | None:
+        """Запись индекса независимо от наличия локального файла (для ссылок и свежести)."""
+        if not register_number:
+            return None
+        with self.session_factory() as db:
+            record = self._get_record(db, kind, register_number)
+            return self._to_stored(record) if record else None
+
+    def is_fresh(self, stored: StoredPdf) -> bool:
+        if self.max_age is None:
+            return True
+        return datetime.now() - stored.fetched_at < self.max_age
+
+    def _write_blob(self, chunks: Iterable[bytes]) -> tuple[str, int] | None:
+        """Пишет поток во временный файл рядом с хранилищем и атомарно переименовывает в <sha256>.pdf.
+
+        Пустой поток не сохраняется: возвращается ``None``.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, suffix=".part")
+        tmp_path = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp_file.write(chunk)
+            if not size:
+                tmp_path.unlink(missing_ok=True)
+                return None
+            content_hash = digest.hexdigest()
+            blob_path = self._blob_path(content_hash)
+            if blob_path.exists():
+                tmp_path.unlink(missing_ok=True)
+            else:
+                os.replace(tmp_path, blob_path)
+            return content_hash, size
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def put(self, kind: str, register_number: str, content: bytes, source_url: str = "") -> StoredPdf | None:
+        return self.put_stream(kind, register_number, [content], source_url=source_url)
+
+    def put_stream(
+        self,
+        kind: str,
+        register_number: str,
+        chunks: Iterable[bytes],
+        source_url: str = "",
+    ) -> StoredPdf | None:
+        written = self._write_blob(chunks)
+        if written is None:
+            logger.warning("Пустой PDF %s для %s не сохранён", kind, register_number)
+            return None
+        content_hash, size = written
+
+        previous_hash, stored = self.writer.run(self._save_record, kind, register_number, content_hash, size, source_url)
+        replaced = bool(previous_hash) and previous_hash != content_hash
+        if replaced:
+            logger.info("PDF %s для %s изменился, ссылка будет обновлена", kind, register_number)
+            self._remove_orphan(previous_hash)
+        return stored
+
+    def _save_record(
+        self,
+        db: Session,
+        kind: str,
+        register_number: str,
+        content_hash: str,
+        size: int,
+        source_url: str,
+    ) -> tuple[str | None, StoredPdf]:
+        """Задание писателя: обновляет запись индекса и возвращает прежний хеш и новую запись."""
+        record = self._get_record(db, kind, register_number)
+        if record is None:
+            record = PdfDocument(kind=kind, register_number=register_number)
+            db.add(record)
+        previous_hash = record.content_hash
+        if previous_hash and previous_hash != content_hash:
+            record.remote_url = None
+        now = datetime.now()
+        record.content_hash = content_hash
+        record.size = size
+        record.fetched_at = now
+        record.last_accessed_at = now
+        record.is_cached = True
+        record.source_url = source_url or record.source_url
+        db.flush()
+        return previous_hash, self._to_stored(record)
+
+    def get_remote_url(self, kind: str, register_number: str) -> str | None:
+        with self.session_factory() as db:
+            record = self._get_record(db, kind, register_number)
+            return record.remote_url if record and record.remote_url else None
+
+    def set_remote_url(
+        self,
+        kind: str,
+        register_number: str,
+        remote_url: str,
+        content_hash: str | None = None,
+    ) -> bool:
+        """Запоминает загруженную версию ``content_hash`` и её ссылку.
+
+        Если PDF успел измениться, пока шла загрузка, ссылка не сохраняется и
+        возвращается ``False``: следующая загрузка перезапишет файл.
+        """
+        if not remote_url:
+            return False
+        return self.writer.run(_save_remote_url, kind, register_number, remote_url, content_hash)
+
+    def _remove_orphan(self, content_hash: str) -> None:
+        with self.session_factory() as db:
+            still_used = db.query(PdfDocument.id).filter(PdfDocument.content_hash == content_hash).first()
+        if still_used:
+            return
+        self._blob_path(content_hash).unlink(missing_ok=True)
+
+    @staticmethod
+    def _pinned_hashes(db: Session, pin_since: datetime | None) -> set[str]:
+        pending_batch = db.query(BatchApplication.register_number).filter(
+            func.lower(func.coalesce(BatchApplication.status, "")).not_in(FINAL_STATUSES)
+        )
+        pending_stay = db.query(StayPermit.reg_number).filter(
+            func.lower(func.coalesce(StayPermit.status, "")).not_in(FINAL_STATUSES)
+        )
+        pinned_rows = db.query(PdfDocument.content_hash).filter(
+            PdfDocument.is_cached.is_(True),
+            (
+                ((PdfDocument.kind == PDF_KIND_BATCH) & PdfDocument.register_number.in_(pending_batch.scalar_subquery()))
+                | ((PdfDocument.kind == PDF_KIND_STAY) & PdfDocument.register_number.in_(pending_stay.scalar_subquery()))
+            ),
+        )
+        pinned = {row[0] for row in pinned_rows}
+        if pin_since is not None:
+            recent_rows = db.query(PdfDocument.content_hash).filter(
+                PdfDocument.is_cached.is_(True),
+                PdfDocument.last_accessed_at >= pin_since,
+            )
+            pinned.update(row[0] for row in recent_rows)
+        return pinned
+
+    def _remove_stale_parts(self) -> None:
+        threshold = time.time() - STALE_PART_SECONDS
+        for part_path in self.root.glob("*.part"):
+            try:
+                if part_path.stat().st_mtime < threshold:
+                    part_path.unlink(missing_ok=True)
+            except OSError:
+                continue
+
+    def enforce_limits(self, now: datetime | None = None) -> PdfCacheStats:
+        """Удаляет локальные файлы сверх бюджета (LRU) и давно не использованные, кроме закреплённых.
+
+        Закреплены PDF заявлений в незавершённых статусах и файлы, которые
+        открывались (уведомления, поиск в боте) в пределах ``pin_window``.
+        """
+        now = now or datetime.now()
+        self._remove_stale_parts()
+        with self.session_factory() as db:
+            last_used = func.max(func.coalesce(PdfDocument.last_accessed_at, PdfDocument.fetched_at))
+            blobs = (
+                db.query(PdfDocument.content_hash, func.max(PdfDocument.size), last_used)
+                .filter(PdfDocument.is_cached.is_(True))
+                .group_by(PdfDocument.content_hash)
+                .order_by(last_used)
+                .all()
+            )
+            pinned = self._pinned_hashes(db, now - self.pin_window if self.pin_window else None)
+
+            total_bytes = sum(size for _, size, _ in blobs)
+            evicted: dict[str, int] = {}
+            idle_before = now - self.max_idle if self.max_idle else None
+            for content_hash, size, used_at in blobs:
+                if content_hash in pinned:
+                    continue
+                over_budget = self.max_bytes is not None and total_bytes > self.max_bytes
+                idle = idle_before is not None and used_at is not None and used_at < idle_before
+                if not over_budget and not idle:
+                    continue
+                evicted[content_hash] = size
+                total_bytes -= size
+
+        if evicted:
+            self.writer.run(_mark_evicted, list(evicted))
+
+        for content_hash in evicted:
+            self._blob_path(content_hash).unlink(missing_ok=True)
+
+        with self._stats_lock:
+            self._evicted_files += len(evicted)
+            self._evicted_bytes += sum(evicted.values())
+        if self.max_bytes is not None and total_bytes > self.max_bytes:
+            logger.warning(
+                "Кэш PDF превышает бюджет после очистки: %s байт при лимите %s (закреплено файлов: %s)",
+                total_bytes,
+                self.max_bytes,
+                len(pinned),
+            )
+        return self.stats(cached_files=len(blobs) - len(evicted), cached_bytes=total_bytes, pinned_files=len(pinned))
+
+    def stats(self, cached_files: int = 0, cached_bytes: int = 0, pinned_files: int = 0) -> PdfCacheStats:
+        with self._stats_lock:
+            return PdfCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evicted_files=self._evicted_files,
+                evicted_bytes=self._evicted_bytes,
+                cached_files=cached_files,
+                cached_bytes=cached_bytes,
+                pinned_files=pinned_files,
+            )
+
+
+def _touch_record(db: Session, kind: str, register_number: str, accessed_at: datetime) -> None:
+    db.query(PdfDocument).filter(PdfDocument.kind == kind, PdfDocument.register_number == register_number).update(
+        {PdfDocument.last_accessed_at: accessed_at}, synchronize_session=False
+    )
+
+
+def _mark_not_cached(db: Session, kind: str, register_number: str) -> None:
+    db.query(PdfDocument).filter(PdfDocument.kind == kind, PdfDocument.register_number == register_number).update(
+        {PdfDocument.is_cached: False}, synchronize_session=False
+    )
+
+
+def _mark_evicted(db: Session, content_hashes: list[str]) -> None:
+    for chunk_query in filter_in_chunks(db.query(PdfDocument), PdfDocument.content_hash, content_hashes):
+        chunk_query.update({PdfDocument.is_cached: False}, synchronize_session=False)
+
+
+def _save_remote_url(
+    db: Session,
+    kind: str,
+    register_number: str,
+    remote_url: str,
+    content_hash: str | None,
+) -> bool:
+    """Задание писателя для ``PDFStore.set_remote_url``."""
+    record = PDFStore._get_record(db, kind, register_number)
+    if record is None:
+        return False
+    record.uploaded_hash = content_hash or record.content_hash
+    current = record.uploaded_hash == record.content_hash
+    if current:
+        record.remote_url = remote_url
+    return current
+
+
+def _hours(value: int) -> timedelta | None:
+    return timedelta(hours=value) if value > 0 else None
+
+
+pdf_store = PDFStore(
+    settings.temp_dir / "pdf",
+    max_age=_hours(settings.pdf_refresh_hours),
+    max_bytes=settings.pdf_cache_max_mb * 1024 * 1024 if settings.pdf_cache_max_mb > 0 else None,
+    max_idle=_hours(settings.pdf_cache_max_age_days * 24),
+    pin_window=_hours(settings.pdf_cache_pin_hours),
+)
+
+
+async def enforce_pdf_cache_limits() -> None:
+    stats = await asyncio.to_thread(pdf_store.enforce_limits)
+    logger.info(
+        "Кэш PDF: файлов %s (%.1f МБ), закреплено %s, удалено всего %s (%.1f МБ), попаданий %s, промахов %s (%.0f%%)",
+        stats.cached_files,
+        stats.cached_bytes / 1024 / 1024,
+        stats.pinned_files,
+        stats.evicted_files,
+        stats.evicted_bytes / 1024 / 1024,
+        stats.hits,
+        stats.misses,
+        stats.hit_ratio * 100,
+    )
@@ -9,14 +9,16 @@ from typing import Optional
 from bs4 import BeautifulSoup
 from curl_cffi import requests
 
+from visascraper.config import settings
 from visascraper.database.crud import (
     notify_new_batch_applications,
-    save_or_update_batch_data,
-    save_or_update_stay_permit_data,
     save_or_update_stay_permit_data_async,
+    upsert_batch_applications,
+    upsert_stay_permits,
 )
-from visascraper.database.db import SessionLocal
+from visascraper.database.writer import db_writer
 from visascraper.dto import BatchApplicationData, PAYMENT_DATE_FORMAT, StayPermitData
+from visascraper.services.pdf_store import PDF_KIND_BATCH, PDF_KIND_STAY
 from visascraper.services.storage import PDFManager, SessionManager
 from visascraper.session_manager import check_session, load_session, login
 from visascraper.utils.logger import logger
@@ -35,6 +37,7 @@ BASE_URL = "https://evisa.imigrasi.go.id"
 
 
 ProgressCallback = Callable[[int, int, str, int, int, int], None]
+AccountRowsCallback = Callable[[str, list[list[str]], list[list[str]], list[list[str]]], None]
 
 
 class DataParser:
@@ -75,14 +78,28 @@ class DataParser:
             logger.error("Ошибка при парсинге даты рождения из %s: %s", detail_link, exc)
             return ""
 
+    def _apply_uploaded_links(
+        self,
+        kind: str,
+        parsed_items: list[BatchApplicationData] | list[StayPermitData],
+        key_attr: str,
+    ) -> None:
+        missing = [getattr(item, key_attr) for item in parsed_items if not item.action_link]
+        if not missing:
+            return
+        links = self.pdf_manager.collect_links(kind, missing, timeout=settings.yandex_upload_wait_seconds)
+        for item in parsed_items:
+            if not item.action_link:
+                item.action_link = links.get(getattr(item, key_attr), "")
+
     def _store_batch_items(
         self,
         account_name: str,
         parsed_items: list[BatchApplicationData],
     ) -> tuple[list[list[str]], list[list[str]]]:
+        self._apply_uploaded_links(PDF_KIND_BATCH, parsed_items, "register_number")
         payload = [item.to_db_dict() for item in parsed_items]
-        with SessionLocal() as db:
-            save_or_update_batch_data(db, payload)
+        db_writer.run(upsert_batch_applications, payload)
         logger.info("Batch Application для %s сохранены в БД: %s записей", account_name, len(payload))
 
         if payload and self.main_loop and self.main_loop.is_running():
@@ -91,9 +108,9 @@ class DataParser:
         return [item.to_client_table_row() for item in parsed_items], [item.to_manager_row() for item in parsed_items]
 
     def _store_stay_items(self, account_name: str, parsed_items: list[StayPermitData]) -> list[list[str]]:
+        self._apply_uploaded_links(PDF_KIND_STAY, parsed_items, "reg_number")
         payload = [item.to_db_dict() for item in parsed_items]
-        with SessionLocal() as db:
-            save_or_update_stay_permit_data(db, payload)
+        db_writer.run(upsert_stay_permits, payload)
         logger.info("Stay Permit для %s сохранены в БД: %s записей", account_name, len(payload))
 
         if payload and self.main_loop and self.main_loop.is_running():
@@ -186,6 +203,7 @@ class DataParser:
                                 action_link_original=action_link_original,
                                 reg_number=batch_item.register_number,
                                 full_name=batch_item.full_name,
+                                status=batch_item.status,
                             )
                             parsed_items.append(batch_item)
                         except Exception as exc:
@@ -287,6 +305,7 @@ class DataParser:
                                 session_id=session_id,
                                 pdf_relative_url=pdf_relative_url,
                                 reg_number=stay_item.reg_number,
+                                status=stay_item.status,
                             )
                             collected_items[stay_item.reg_number] = stay_item
                         except Exception as exc:
@@ -326,7 +345,13 @@ class DataParser:
         account_names: list[str],
         account_passwords: list[str],
         progress_callback: ProgressCallback | None = None,
+        account_callback: AccountRowsCallback | None = None,
     ) -> tuple[list[list[str]], list[list[str]], list[list[str]]]:
+        """Парсит аккаунты по очереди.
+
+        Если передан ``account_callback``, строки каждого аккаунта отдаются ему сразу
+        после обработки и не накапливаются: метод вернёт пустые списки.
+        """
         total_accounts = min(len(account_names), len(account_passwords))
         logger.info("Начинаем парсинг для %s аккаунтов", total_accounts)
         if total_accounts == 0:
@@ -336,6 +361,8 @@ class DataParser:
         batch_app_rows: list[list[str]] = []
         manager_rows: list[list[str]] = []
         stay_rows: list[list[str]] = []
+        batch_count = 0
+        stay_count = 0
 
         if progress_callback:
             progress_callback(0, total_accounts, "подготовка", total_accounts, 0, 0)
@@ -357,15 +384,21 @@ class DataParser:
                         remaining,
                     )
                     if progress_callback:
-                        progress_callback(processed, total_accounts, name, remaining, len(batch_app_rows), len(stay_rows))
+                        progress_callback(processed, total_accounts, name, remaining, batch_count, stay_count)
                     self.session_manager.close_session(session)
                     continue
 
-            stay_rows.extend(self.fetch_and_update_stay(session, name, session_id))
+            account_stay_rows = self.fetch_and_update_stay(session, name, session_id)
             batch_rows, manager_batch_rows = self.fetch_and_update_batch(session, name, session_id)
-            batch_app_rows.extend(batch_rows)
-            manager_rows.extend(manager_batch_rows)
             self.session_manager.close_session(session)
+            batch_count += len(batch_rows)
+            stay_count += len(account_stay_rows)
+            if account_callback:
+                account_callback(name, batch_rows, manager_batch_rows, account_stay_rows)
+            else:
+                batch_app_rows.extend(batch_rows)
+                manager_rows.extend(manager_batch_rows)
+                stay_rows.extend(account_stay_rows)
 
             processed = index
             remaining = total_accounts - processed
@@ -376,6 +409,6 @@ class DataParser:
                 remaining,
             )
             if progress_callback:
-                progress_callback(processed, total_accounts, name, remaining, len(batch_app_rows), len(stay_rows))
+                progress_callback(processed, total_accounts, name, remaining, batch_count, stay_count)
 
         return batch_app_rows, manager_rows, stay_rows
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from visascraper.database.db import SessionLocal
+from visascraper.database.models import SheetSnapshot
+from visascraper.database.writer import DatabaseWriter, db_writer
+
+
+class SheetSnapshotStore:
+    """Локальная копия содержимого листов Google Sheets в SQLite.
+
+    Снимок привязан к ``modifiedTime`` таблицы из Drive API, полученному перед
+    чтением листов: пока время изменения совпадает, листы не перечитываются. Любая
+    правка таблицы меняет ``modifiedTime`` и делает снимок недействительным. После
+    нашей записи снимок получает время, только если последнюю ревизию сделал наш
+    сервисный аккаунт; снимок без времени всегда считается устаревшим. Снимки
+    пишутся через ``writer``, ``session_factory`` нужен только для чтения.
+    """
+
+    def __init__(self, session_factory: sessionmaker[Session] = SessionLocal, writer: DatabaseWriter = db_writer):
+        self.session_factory = session_factory
+        self.writer = writer
+
+    def load(
+        self,
+        spreadsheet_id: str,
+        titles: list[str],
+        modified_time: str | None,
+    ) -> dict[str, list[list[str]]] | None:
+        """Возвращает строки всех листов ``titles`` или ``None``, если снимок неполон или устарел."""
+        if not modified_time:
+            return None
+
+        with self.session_factory() as db:
+            records = (
+                db.query(SheetSnapshot)
+                .filter(SheetSnapshot.spreadsheet_id == spreadsheet_id, SheetSnapshot.title.in_(titles))
+                .all()
+            )
+
+        if len(records) != len(titles) or any(record.modified_time != modified_time for record in records):
+            return None
+        return {record.title: json.loads(record.rows) for record in records}
+
+    def save(self, spreadsheet_id: str, rows_by_title: dict[str, list[list[str]]], modified_time: str | None) -> None:
+        # JSON собирается до очереди писателя, чтобы не занимать его транзакцию.
+        serialized = {
+            title: json.dumps(rows, ensure_ascii=False, separators=(",", ":")) for title, rows in rows_by_title.items()
+        }
+        self.writer.run(_save_snapshots, spreadsheet_id, serialized, modified_time)
+
+
+def _save_snapshots(db: Session, spreadsheet_id: str, serialized: dict[str, str], modified_time: str | None) -> None:
+    """Задание писателя для ``SheetSnapshotStore.save``."""
+    now = datetime.now()
+    records = {
+        record.title: record
+        for record in db.query(SheetSnapshot)
+        .filter(SheetSnapshot.spreadsheet_id == spreadsheet_id, SheetSnapshot.title.in_(serialized))
+        .all()
+    }
+    for title, rows in serialized.items():
+        record = records.get(title)
+        if record is None:
+            record = SheetSnapshot(spreadsheet_id=spreadsheet_id, title=title)
+            db.add(record)
+        record.rows = rows
+        record.modified_time = modified_time
+        record.updated_at = now
+
+
+sheet_snapshot_store = SheetSnapshotStore()
@@ -1,47 +1,87 @@
 from __future__ import annotations
 
-import json
 import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import date, datetime
-from typing import Iterable
+from difflib import SequenceMatcher
+from typing import Callable, Iterable
 
 import gspread
+from gspread.urls import DRIVE_FILES_API_V3_URL
+from gspread.utils import absolute_range_name
 
 from visascraper.config import settings
 from visascraper.dto import (
     BATCH_APPLICATION_HEADERS,
     BATCH_MANAGER_HEADERS,
     IDX_BA_ACCOUNT,
+    IDX_BA_PAYMENT_DATE,
+    IDX_BA_REGISTER_NUMBER,
     IDX_MGR_ACCOUNT,
     IDX_MGR_PAYMENT_DATE,
+    IDX_MGR_REGISTER_NUMBER,
     IDX_SP_ACCOUNT,
+    IDX_SP_REGISTER_NUMBER,
     PAYMENT_DATE_FORMAT,
+    SHEET_BATCH_APPLICATION,
+    SHEET_BATCH_MANAGER,
+    SHEET_STAY_PERMIT,
     STAY_PERMIT_HEADERS,
 )
+from visascraper.infrasctructure.google_sheets import google_client
+from visascraper.services.sheet_snapshots import SheetSnapshotStore, sheet_snapshot_store
+from visascraper.services.sheets_archive import ArchivedRowStore, archived_row_store
 from visascraper.utils.logger import logger
-from visascraper.utils.sheets_rotator import ExistingSpreadsheetRequiredError, ensure_valid_spreadsheet
+from visascraper.utils.sheets_rotator import (
+    ActiveSpreadsheet,
+    ExistingSpreadsheetRequiredError,
+    resolve_active_spreadsheet,
+)
+
+
+@dataclass(slots=True)
+class WorksheetDiff:
+    """Минимальный набор изменений листа: структурные запросы и диапазоны значений."""
+
+    structural_requests: list[dict] = field(default_factory=list)
+    value_ranges: list[tuple[int, list[list[str]]]] = field(default_factory=list)
+    inserted_rows: int = 0
+    deleted_rows: int = 0
+    updated_rows: int = 0
+    grid_rows: int = 0
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.structural_requests and not self.value_ranges
+
+
+@dataclass(slots=True)
+class WorksheetSync:
+    """Входные данные синхронизации одного листа."""
+
+    title: str
+    header: list[str]
+    incoming_rows: list[list[str]]
+    preserve_account_index: int
+    key_indexes: tuple[int, ...] | None = None
+    sort_key: Callable[[list[str]], date] | None = None
+    drop_row: Callable[[list[str]], bool] | None = None
 
 
 class GoogleSheetsManager:
-    def __init__(self):
+    def __init__(
+        self,
+        snapshots: SheetSnapshotStore = sheet_snapshot_store,
+        archived_rows: ArchivedRowStore = archived_row_store,
+    ):
         self.gc = self._init_client()
+        self.snapshots = snapshots
+        self.archived_rows = archived_rows
 
     def _init_client(self) -> gspread.Client:
-        if settings.google_service_account_json:
-            credentials = json.loads(settings.google_service_account_json)
-            logger.info("Google Sheets инициализирован через GOOGLE_SERVICE_ACCOUNT_JSON")
-            return gspread.service_account_from_dict(credentials)
-
-        credentials_file = settings.google_service_account_file
-        if not credentials_file.exists():
-            raise FileNotFoundError(
-                "Не найден файл сервисного аккаунта Google. "
-                f"Ожидаемый путь: {credentials_file}. "
-                "Укажите GOOGLE_SERVICE_ACCOUNT_FILE или GOOGLE_SERVICE_ACCOUNT_JSON."
-            )
-
-        logger.info("Google Sheets инициализирован через сервисный аккаунт: %s", credentials_file)
-        return gspread.service_account(filename=str(credentials_file))
+        return google_client.get()
 
     @staticmethod
     def _parse_date_for_sorting(date_str: str) -> date:
@@ -73,13 +113,154 @@ class GoogleSheetsManager:
         incoming_rows: list[list[str]],
         preserve_account_index: int,
         accounts_to_replace: set[str],
+        drop_row: Callable[[list[str]], bool] | None = None,
+        key_indexes: tuple[int, ...] | None = None,
+        sort_key: Callable[[list[str]], date] | None = None,
     ) -> list[list[str]]:
-        preserved_rows = [
-            row
-            for row in existing_rows[1:]
-            if row and len(row) > preserve_account_index and row[preserve_account_index] not in accounts_to_replace
-        ]
-        return cls._normalize_rows([header] + preserved_rows + incoming_rows)
+        """Заменяет строки обновляемых аккаунтов новыми, не двигая неизменившиеся строки.
+
+        Новая строка встаёт на место старой с тем же ключом, строки без пары
+        дописываются в конец, а ``sort_key`` (устойчивая сортировка по убыванию)
+        возвращает листу общий порядок. Поэтому запись по одному аккаунту за раз
+        не переносит блоки аккаунтов в конец листа и неизменившиеся данные дают
+        пустой diff.
+        """
+        incoming_rows = cls._normalize_rows(incoming_rows)
+        pending: dict[tuple[str, ...], deque[int]] = {}
+        for index, row in enumerate(incoming_rows):
+            pending.setdefault(cls._row_key(row, key_indexes), deque()).append(index)
+
+        used: set[int] = set()
+        rows: list[list[str]] = []
+        for row in existing_rows[1:]:
+            if not row or len(row) <= preserve_account_index:
+                continue
+            if row[preserve_account_index] not in accounts_to_replace:
+                rows.append(row)
+                continue
+            candidates = pending.get(cls._row_key(row, key_indexes))
+            if candidates:
+                index = candidates.popleft()
+                used.add(index)
+                rows.append(incoming_rows[index])
+        rows.extend(row for index, row in enumerate(incoming_rows) if index not in used)
+
+        if drop_row is not None:
+            rows = [row for row in rows if not drop_row(row)]
+        if sort_key is not None:
+            rows.sort(key=sort_key, reverse=True)
+        return cls._normalize_rows([header] + rows)
+
+    @staticmethod
+    def _trim_row(row: list[str]) -> list[str]:
+        end = len(row)
+        while end and row[end - 1] == "":
+            end -= 1
+        return row[:end]
+
+    @classmethod
+    def _row_key(cls, row: list[str], key_indexes: tuple[int, ...] | None) -> tuple[str, ...]:
+        if key_indexes is None:
+            return tuple(cls._trim_row(row))
+        return tuple(row[index] if len(row) > index else "" for index in key_indexes)
+
+    @staticmethod
+    def _dimension_range(sheet_id: int, start: int, end: int) -> dict:
+        return {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": start, "endIndex": end}
+
+    @classmethod
+    def _plan_worksheet_diff(
+        cls,
+        existing_rows: list[list[str]],
+        final_rows: list[list[str]],
+        key_indexes: tuple[int, ...] | None,
+        sheet_id: int,
+        row_count: int,
+    ) -> WorksheetDiff:
+        """Сопоставляет строки по ключу и строит вставки/удаления строк и точечные обновления значений.
+
+        Структурные операции собираются снизу вверх, чтобы индексы исходного листа
+        оставались верными; значения пишутся в координатах итогового листа.
+        """
+        diff = WorksheetDiff()
+        old_len = len(existing_rows)
+        updates: dict[int, list[str]] = {}
+        grid_rows = row_count
+
+        def put_update(final_index: int, old_row: list[str] | None) -> None:
+            row = list(final_rows[final_index])
+            if old_row is not None and len(old_row) > len(row):
+                row.extend([""] * (len(old_row) - len(row)))
+            updates[final_index] = row
+
+        matcher = SequenceMatcher(
+            None,
+            [cls._row_key(row, key_indexes) for row in existing_rows],
+            [cls._row_key(row, key_indexes) for row in final_rows],
+            autojunk=False,
+        )
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                for offset in range(i2 - i1):
+                    old_row = existing_rows[i1 + offset]
+                    if cls._trim_row(old_row) != cls._trim_row(final_rows[j1 + offset]):
+                        put_update(j1 + offset, old_row)
+                        diff.updated_rows += 1
+                continue
+
+            common = min(i2 - i1, j2 - j1)
+            for offset in range(common):
+                put_update(j1 + offset, existing_rows[i1 + offset])
+            diff.updated_rows += common
+
+            if i2 - i1 > common:
+                start = i1 + common
+                diff.deleted_rows += i2 - start
+                if i2 == old_len:
+                    width = max(len(row) for row in existing_rows[start:i2])
+                    for offset in range(i2 - start):
+                        updates[len(final_rows) + offset] = [""] * width
+                else:
+                    diff.structural_requests.append(
+                        {"deleteDimension": {"range": cls._dimension_range(sheet_id, start, i2)}}
+                    )
+                    grid_rows -= i2 - start
+            elif j2 - j1 > common:
+                inserted = j2 - j1 - common
+                diff.inserted_rows += inserted
+                for offset in range(common, j2 - j1):
+                    put_update(j1 + offset, None)
+                if i2 < old_len:
+                    diff.structural_requests.append(
+                        {
+                            "insertDimension": {
+                                "range": cls._dimension_range(sheet_id, i2, i2 + inserted),
+                                "inheritFromBefore": i2 > 0,
+                            }
+                        }
+                    )
+                    grid_rows += inserted
+
+        required_rows = max(updates, default=-1) + 1
+        if required_rows > grid_rows:
+            diff.structural_requests.append(
+                {"appendDimension": {"sheetId": sheet_id, "dimension": "ROWS", "length": required_rows - grid_rows}}
+            )
+            grid_rows = required_rows
+        diff.grid_rows = grid_rows
+
+        block_start: int | None = None
+        block_rows: list[list[str]] = []
+        for index in sorted(updates):
+            if block_start is not None and index == block_start + len(block_rows):
+                block_rows.append(updates[index])
+                continue
+            if block_start is not None:
+                diff.value_ranges.append((block_start + 1, block_rows))
+            block_start, block_rows = index, [updates[index]]
+        if block_start is not None:
+            diff.value_ranges.append((block_start + 1, block_rows))
+        return diff
 
     def get_account_credentials(self) -> list[tuple[str, str]]:
         if not settings.google_accounts_sheet_id:
@@ -100,87 +281,317 @@ class GoogleSheetsManager:
         manager_data: list[list[str]],
         stay_data: list[list[str]],
     ) -> None:
-        max_retries = 3
-
         try:
-            spreadsheet_key = ensure_valid_spreadsheet(self.gc)
+            active = resolve_active_spreadsheet(self.gc)
         except ExistingSpreadsheetRequiredError as exc:
             logger.error("Запись в Google Sheets пропущена: %s", exc)
             return
 
-        for attempt in range(1, max_retries + 1):
+        batch_accounts = self._accounts_from_rows(batch_app_data, account_index=IDX_BA_ACCOUNT)
+        manager_accounts = self._accounts_from_rows(manager_data, account_index=IDX_MGR_ACCOUNT)
+        stay_accounts = self._accounts_from_rows(stay_data, account_index=IDX_SP_ACCOUNT)
+        accounts_to_process = batch_accounts | manager_accounts | stay_accounts
+        if not accounts_to_process:
+            logger.info("Нет аккаунтов для обновления Google Sheets")
+            return
+
+        syncs = self._worksheet_syncs(batch_app_data, manager_data, stay_data)
+
+        logger.info("Записываем данные в таблицу %s", active.id)
+        logger.info("Аккаунты на обновление: %s", sorted(accounts_to_process))
+        try:
+            self.sync_worksheets(active, syncs, accounts_to_process)
+        except Exception as exc:
+            logger.warning("Пакетная запись в Google Sheets не удалась, пишем листы по отдельности: %s", exc)
+            # Метаданные листов могли устареть после частично применённой записи.
             try:
-                spreadsheet = self.gc.open_by_key(spreadsheet_key)
-                logger.info("Записываем данные в таблицу %s", spreadsheet_key)
-
-                batch_accounts = self._accounts_from_rows(batch_app_data, account_index=IDX_BA_ACCOUNT)
-                manager_accounts = self._accounts_from_rows(manager_data, account_index=IDX_MGR_ACCOUNT)
-                stay_accounts = self._accounts_from_rows(stay_data, account_index=IDX_SP_ACCOUNT)
-                accounts_to_process = batch_accounts | manager_accounts | stay_accounts
-                if not accounts_to_process:
-                    logger.info("Нет аккаунтов для обновления Google Sheets")
-                    return
-
-                logger.info("Аккаунты на обновление: %s", sorted(accounts_to_process))
-
-                self._rewrite_worksheet(
-                    worksheet=spreadsheet.worksheet("Batch Application"),
-                    header=BATCH_APPLICATION_HEADERS,
-                    incoming_rows=sorted(
-                        self._normalize_rows(batch_app_data),
-                        key=lambda row: self._parse_date_for_sorting(row[6]),
-                        reverse=True,
-                    ),
-                    preserve_account_index=IDX_BA_ACCOUNT,
-                    accounts_to_replace=accounts_to_process,
-                )
-                self._rewrite_worksheet(
-                    worksheet=spreadsheet.worksheet("Batch Application(Manager)"),
-                    header=BATCH_MANAGER_HEADERS,
-                    incoming_rows=sorted(
-                        self._normalize_rows(manager_data),
-                        key=lambda row: self._parse_date_for_sorting(row[IDX_MGR_PAYMENT_DATE]),
-                        reverse=True,
-                    ),
-                    preserve_account_index=IDX_MGR_ACCOUNT,
-                    accounts_to_replace=accounts_to_process,
-                )
-                self._rewrite_worksheet(
-                    worksheet=spreadsheet.worksheet("StayPermit"),
-                    header=STAY_PERMIT_HEADERS,
-                    incoming_rows=self._normalize_rows(stay_data),
-                    preserve_account_index=IDX_SP_ACCOUNT,
-                    accounts_to_replace=accounts_to_process,
+                active = resolve_active_spreadsheet(self.gc, refresh=True)
+            except Exception as refresh_exc:
+                logger.error(
+                    "Не удалось обновить метаданные таблицы %s после ошибки пакетной записи (%s): %s; "
+                    "пишем листы по прежним метаданным",
+                    active.id,
+                    exc,
+                    refresh_exc,
                 )
-                logger.info("Google Sheets успешно обновлён")
+            self._sync_worksheets_isolated(active, syncs, accounts_to_process)
+        logger.info("Google Sheets успешно обновлён")
+
+    def _sync_worksheets_isolated(
+        self,
+        active: ActiveSpreadsheet,
+        syncs: list[WorksheetSync],
+        accounts_to_replace: set[str],
+    ) -> None:
+        """Синхронизирует листы параллельно и независимо: ошибка одного листа не мешает остальным."""
+        with ThreadPoolExecutor(max_workers=len(syncs), thread_name_prefix="sheets-sync") as executor:
+            futures = {
+                sync.title: executor.submit(self._sync_worksheet_with_retries, active, sync, accounts_to_replace)
+                for sync in syncs
+            }
+        failures = {title: future.exception() for title, future in futures.items() if future.exception()}
+        if failures:
+            for title, exc in failures.items():
+                logger.error("Лист %s не записан в Google Sheets: %s", title, exc)
+            raise next(iter(failures.values()))
+
+    def _sync_worksheet_with_retries(
+        self,
+        active: ActiveSpreadsheet,
+        sync: WorksheetSync,
+        accounts_to_replace: set[str],
+        max_retries: int = 3,
+    ) -> None:
+        for attempt in range(1, max_retries + 1):
+            try:
+                self.sync_worksheets(active, [sync], accounts_to_replace)
                 return
             except Exception as exc:
-                logger.error("Попытка %s/%s записи в Google Sheets завершилась ошибкой: %s", attempt, max_retries, exc)
+                logger.error(
+                    "Попытка %s/%s записи листа %s завершилась ошибкой: %s",
+                    attempt,
+                    max_retries,
+                    sync.title,
+                    exc,
+                )
                 if attempt == max_retries:
                     raise
                 time.sleep(10 * attempt)
 
-    def _rewrite_worksheet(
+    def _worksheet_syncs(
         self,
-        worksheet,
-        header: list[str],
-        incoming_rows: list[list[str]],
-        preserve_account_index: int,
+        batch_app_data: list[list[str]],
+        manager_data: list[list[str]],
+        stay_data: list[list[str]],
+    ) -> list[WorksheetSync]:
+        return [
+            WorksheetSync(
+                title=SHEET_BATCH_APPLICATION,
+                header=BATCH_APPLICATION_HEADERS,
+                incoming_rows=self._normalize_rows(batch_app_data),
+                preserve_account_index=IDX_BA_ACCOUNT,
+                key_indexes=(IDX_BA_REGISTER_NUMBER, IDX_BA_ACCOUNT),
+                sort_key=lambda row: self._parse_date_for_sorting(row[IDX_BA_PAYMENT_DATE]),
+                drop_row=self.archived_rows.matcher(SHEET_BATCH_APPLICATION),
+            ),
+            WorksheetSync(
+                title=SHEET_BATCH_MANAGER,
+                header=BATCH_MANAGER_HEADERS,
+                incoming_rows=self._normalize_rows(manager_data),
+                preserve_account_index=IDX_MGR_ACCOUNT,
+                key_indexes=(IDX_MGR_REGISTER_NUMBER, IDX_MGR_ACCOUNT),
+                sort_key=lambda row: self._parse_date_for_sorting(row[IDX_MGR_PAYMENT_DATE]),
+                drop_row=self.archived_rows.matcher(SHEET_BATCH_MANAGER),
+            ),
+            WorksheetSync(
+                title=SHEET_STAY_PERMIT,
+                header=STAY_PERMIT_HEADERS,
+                incoming_rows=self._normalize_rows(stay_data),
+                preserve_account_index=IDX_SP_ACCOUNT,
+                key_indexes=(IDX_SP_REGISTER_NUMBER, IDX_SP_ACCOUNT),
+                drop_row=self.archived_rows.matcher(SHEET_STAY_PERMIT),
+            ),
+        ]
+
+    def prune_archived_rows(self, active: ActiveSpreadsheet) -> None:
+        """Удаляет из активной таблицы строки, уже перенесённые в архив."""
+        self.sync_worksheets(active, self._worksheet_syncs([], [], []), accounts_to_replace=set())
+
+    def load_worksheets(
+        self,
+        active: ActiveSpreadsheet,
+        titles: list[str],
+    ) -> tuple[dict[str, list[list[str]]], str | None]:
+        """Возвращает строки листов и ``modifiedTime`` таблицы, читая листы только при изменении таблицы."""
+        modified_time = self._fetch_modified_time(active)
+        existing_by_title = self.snapshots.load(active.id, titles, modified_time)
+        if existing_by_title is not None:
+            logger.info("Таблица %s не менялась с прошлой синхронизации, используем локальную копию листов", active.id)
+            return existing_by_title, modified_time
+
+        existing_by_title = self._read_worksheets(active, titles)
+        self.snapshots.save(active.id, existing_by_title, modified_time)
+        return existing_by_title, modified_time
+
+    def sync_worksheets(
+        self,
+        active: ActiveSpreadsheet,
+        syncs: list[WorksheetSync],
         accounts_to_replace: set[str],
     ) -> None:
-        existing_rows = self._normalize_rows(worksheet.get_all_values())
-        final_rows = self._compose_final_rows(
-            existing_rows=existing_rows,
-            header=header,
-            incoming_rows=incoming_rows,
-            preserve_account_index=preserve_account_index,
-            accounts_to_replace=accounts_to_replace,
-        )
+        """Читает все листы одним ``values_batch_get`` и пишет все изменения одним ``values_batch_update``.
+
+        Идентификаторы и размеры листов берутся из метаданных, уже полученных при
+        проверке активной таблицы; структурные изменения всех листов, если они нужны,
+        уходят одним ``batch_update``. Если ``modifiedTime`` таблицы совпадает со
+        временем снимка (прошлого чтения или нашей последней записи), слияние идёт
+        по локальной копии листов без чтения.
+        """
+        worksheets = [active.worksheet(sync.title) for sync in syncs]
+        existing_by_title, modified_time = self.load_worksheets(active, [sync.title for sync in syncs])
+
+        structural_requests: list[dict] = []
+        data: list[dict] = []
+        final_by_title: dict[str, list[list[str]]] = {}
+        grid_rows: dict[str, int] = {}
+        for sync, worksheet in zip(syncs, worksheets):
+            existing_rows = existing_by_title[sync.title]
+            final_rows = self._compose_final_rows(
+                existing_rows=existing_rows,
+                header=sync.header,
+                incoming_rows=sync.incoming_rows,
+                preserve_account_index=sync.preserve_account_index,
+                accounts_to_replace=accounts_to_replace,
+                drop_row=sync.drop_row,
+                key_indexes=sync.key_indexes,
+                sort_key=sync.sort_key,
+            )
+            diff = self._plan_worksheet_diff(
+                existing_rows=existing_rows,
+                final_rows=final_rows,
+                key_indexes=sync.key_indexes,
+                sheet_id=worksheet.id,
+                row_count=active.row_count(sync.title),
+            )
+            final_by_title[sync.title] = final_rows
+            grid_rows[sync.title] = diff.grid_rows
+            if diff.is_empty:
+                logger.info("Лист %s не изменился, запись пропущена", sync.title)
+                continue
+
+            structural_requests.extend(diff.structural_requests)
+            data.extend(
+                {"range": absolute_range_name(sync.title, f"A{start_row}"), "values": rows}
+                for start_row, rows in diff.value_ranges
+            )
+            logger.info(
+                "Лист %s обновлён: изменено %s, добавлено %s, удалено %s строк (всего %s)",
+                sync.title,
+                diff.updated_rows,
+                diff.inserted_rows,
+                diff.deleted_rows,
+                len(final_rows),
+            )
+
+        if structural_requests:
+            active.spreadsheet.batch_update({"requests": structural_requests})
+            for title, row_count in grid_rows.items():
+                active.set_row_count(title, row_count)
+        if data:
+            active.spreadsheet.values_batch_update({"valueInputOption": "USER_ENTERED", "data": data})
+        if structural_requests or data:
+            # Ответ на запись не содержит modifiedTime. Время, прочитанное после записи,
+            # принимается, только если последнюю правку сделал наш сервисный аккаунт;
+            # иначе снимок сохраняется без времени и следующий запуск перечитает листы.
+            self.snapshots.save(active.id, final_by_title, self._fetch_own_modified_time(active))
+
+    def _read_worksheets(self, active: ActiveSpreadsheet, titles: list[str]) -> dict[str, list[list[str]]]:
+        response = active.spreadsheet.values_batch_get([absolute_range_name(title) for title in titles])
+        value_ranges = response.get("valueRanges", [])
+        return {
+            title: self._normalize_rows(value_ranges[index].get("values", []) if index < len(value_ranges) else [])
+            for index, title in enumerate(titles)
+        }
+
+    def _fetch_own_modified_time(self, active: ActiveSpreadsheet) -> str | None:
+        """``modifiedTime`` таблицы, если последняя ревизия сделана нашим сервисным аккаунтом, иначе ``None``."""
+        try:
+            metadata = self.gc.http_client.request(
+                "get",
+                f"{DRIVE_FILES_API_V3_URL}/{active.id}",
+                params={"supportsAllDrives": True, "fields": "modifiedTime,lastModifyingUser(emailAddress)"},
+            ).json()
+        except Exception as exc:
+            logger.warning("Не удалось получить автора последней правки таблицы %s: %s", active.id, exc)
+            return None
+        own_email = getattr(self.gc.http_client.auth, "service_account_email", None)
+        last_modifying_user = metadata.get("lastModifyingUser") or {}
+        if not own_email or last_modifying_user.get("emailAddress") != own_email:
+            return None
+        return metadata.get("modifiedTime")
+
+    @staticmethod
+    def _fetch_modified_time(active: ActiveSpreadsheet) -> str | None:
+        try:
+            return active.spreadsheet.get_lastUpdateTime()
+        except Exception as exc:
+            logger.warning("Не удалось получить время изменения таблицы %s: %s", active.id, exc)
+            return None
+
+
+class SheetsStreamWriter:
+    """Сбрасывает строки готовых аккаунтов в Google Sheets по ходу парсинга.
+
+    Строки копятся до истечения ``min_interval`` с прошлой записи, так что быстрые
+    аккаунты объединяются в одну запись; при превышении ``max_pending_rows`` запись
+    выполняется сразу, чтобы память не росла. Ошибка промежуточной записи не
+    прерывает парсинг: строки остаются в буфере, а следующая попытка делается
+    только после того, как накопится ещё ``max_pending_rows`` строк, чтобы каждый
+    следующий аккаунт не ждал повторов недоступного Google Sheets.
+    """
+
+    def __init__(
+        self,
+        manager: GoogleSheetsManager,
+        min_interval: float = settings.sheets_flush_interval_seconds,
+        max_pending_rows: int = settings.sheets_flush_max_rows,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.manager = manager
+        self.min_interval = min_interval
+        self.max_pending_rows = max_pending_rows
+        self.clock = clock
+        self.flushes = 0
+        self._last_flush: float | None = None
+        self._suspended = False
+        self._retry_at_rows = 0
+        self._batch_rows: list[list[str]] = []
+        self._manager_rows: list[list[str]] = []
+        self._stay_rows: list[list[str]] = []
+
+    @property
+    def pending_rows(self) -> int:
+        return len(self._batch_rows) + len(self._manager_rows) + len(self._stay_rows)
+
+    def add(
+        self,
+        account: str,
+        batch_rows: list[list[str]],
+        manager_rows: list[list[str]],
+        stay_rows: list[list[str]],
+    ) -> None:
+        self._batch_rows.extend(batch_rows)
+        self._manager_rows.extend(manager_rows)
+        self._stay_rows.extend(stay_rows)
+        if self._suspended:
+            if self.pending_rows < self._retry_at_rows:
+                return
+        else:
+            interval_elapsed = self._last_flush is None or self.clock() - self._last_flush >= self.min_interval
+            if not interval_elapsed and self.pending_rows < self.max_pending_rows:
+                return
+        try:
+            self.flush()
+        except Exception as exc:
+            self._suspended = True
+            self._retry_at_rows = self.pending_rows + self.max_pending_rows
+            logger.error(
+                "Промежуточная запись в Google Sheets после аккаунта %s не удалась, следующая попытка после "
+                "%s строк в буфере или в конце задачи: %s",
+                account,
+                self._retry_at_rows,
+                exc,
+            )
+            return
+        self._suspended = False
 
-        if final_rows == existing_rows:
-            logger.info("Лист %s не изменился, запись пропущена", worksheet.title)
+    def flush(self) -> None:
+        self._last_flush = self.clock()
+        if not self.pending_rows:
             return
+        self.manager.write_to_sheet(self._batch_rows, self._manager_rows, self._stay_rows)
+        self.flushes += 1
+        self._batch_rows, self._manager_rows, self._stay_rows = [], [], []
 
-        worksheet.clear()
-        worksheet.update(final_rows, "A1", value_input_option="USER_ENTERED")
-        logger.info("Лист %s обновлён: %s строк", worksheet.title, len(final_rows))
+    def close(self) -> None:
+        self.flush()
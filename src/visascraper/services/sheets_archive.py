@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING
+
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import absolute_range_name
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from visascraper.config import settings
+from visascraper.database.db import SessionLocal
+from visascraper.database.models import ArchivedSheetRow
+from visascraper.database.writer import DatabaseWriter, db_writer
+from visascraper.dto import (
+    BATCH_APPLICATION_HEADERS,
+    BATCH_MANAGER_HEADERS,
+    FINAL_STATUSES,
+    IDX_BA_PAYMENT_DATE,
+    IDX_BA_REGISTER_NUMBER,
+    IDX_BA_STATUS,
+    IDX_MGR_PAYMENT_DATE,
+    IDX_MGR_REGISTER_NUMBER,
+    IDX_MGR_STATUS,
+    IDX_SP_EXPIRED_DATE,
+    IDX_SP_REGISTER_NUMBER,
+    IDX_SP_STATUS,
+    PAYMENT_DATE_FORMAT,
+    SHEET_BATCH_APPLICATION,
+    SHEET_BATCH_MANAGER,
+    SHEET_STAY_PERMIT,
+    STAY_DATE_FORMAT,
+    STAY_PERMIT_HEADERS,
+)
+from visascraper.utils.logger import logger
+from visascraper.utils.sheets_rotator import (
+    ActiveSpreadsheet,
+    ExistingSpreadsheetRequiredError,
+    resolve_active_spreadsheet,
+    resolve_archive_spreadsheet,
+)
+
+if TYPE_CHECKING:
+    from visascraper.services.sheets import GoogleSheetsManager
+
+
+def normalize_key_value(value: object) -> str:
+    """Приводит регистрационный номер к одному виду для значений из парсера и из листа.
+
+    Лист пишется с ``USER_ENTERED``, поэтому Google Sheets может превратить номер
+    из одних цифр в число и потерять ведущие нули; регистр и пробелы по краям
+    тоже не должны влиять на совпадение.
+    """
+    text = str(value).strip().upper() if value is not None else ""
+    if text.isdigit():
+        return text.lstrip("0") or "0"
+    return text
+
+
+@dataclass(slots=True, frozen=True)
+class ArchiveRule:
+    """Когда строку листа можно перенести в архив и по какой колонке её узнавать."""
+
+    title: str
+    header: tuple[str, ...]
+    status_index: int
+    date_index: int
+    date_format: str
+    key_index: int
+
+    @staticmethod
+    def _cell(row: list[str], index: int) -> str:
+        return row[index].strip() if len(row) > index and row[index] else ""
+
+    def key(self, row: list[str]) -> str:
+        """Регистрационный номер заявки; пустая строка, если в строке его нет."""
+        return normalize_key_value(self._cell(row, self.key_index))
+
+    def is_due(self, row: list[str], cutoff: date) -> bool:
+        if self._cell(row, self.status_index).lower() not in FINAL_STATUSES:
+            return False
+        try:
+            return datetime.strptime(self._cell(row, self.date_index), self.date_format).date() < cutoff
+        except ValueError:
+            return False
+
+
+ARCHIVE_RULES = (
+    ArchiveRule(
+        title=SHEET_BATCH_APPLICATION,
+        header=tuple(BATCH_APPLICATION_HEADERS),
+        status_index=IDX_BA_STATUS,
+        date_index=IDX_BA_PAYMENT_DATE,
+        date_format=PAYMENT_DATE_FORMAT,
+        key_index=IDX_BA_REGISTER_NUMBER,
+    ),
+    ArchiveRule(
+        title=SHEET_BATCH_MANAGER,
+        header=tuple(BATCH_MANAGER_HEADERS),
+        status_index=IDX_MGR_STATUS,
+        date_index=IDX_MGR_PAYMENT_DATE,
+        date_format=PAYMENT_DATE_FORMAT,
+        key_index=IDX_MGR_REGISTER_NUMBER,
+    ),
+    ArchiveRule(
+        title=SHEET_STAY_PERMIT,
+        header=tuple(STAY_PERMIT_HEADERS),
+        status_index=IDX_SP_STATUS,
+        date_index=IDX_SP_EXPIRED_DATE,
+        date_format=STAY_DATE_FORMAT,
+        key_index=IDX_SP_REGISTER_NUMBER,
+    ),
+)
+ARCHIVE_RULES_BY_TITLE = {rule.title: rule for rule in ARCHIVE_RULES}
+
+
+class ArchivedRowStore:
+    """Ключи строк, уже перенесённых в архивную таблицу.
+
+    Парсер каждый раз получает с портала все заявки аккаунта, поэтому без этого
+    списка заархивированные строки возвращались бы в активную таблицу.
+    """
+
+    def __init__(self, session_factory: sessionmaker[Session] = SessionLocal, writer: DatabaseWriter = db_writer):
+        self.session_factory = session_factory
+        self.writer = writer
+        self._keys: dict[str, set[str]] | None = None
+        self._lock = threading.Lock()
+
+    def _loaded(self) -> dict[str, set[str]]:
+        with self._lock:
+            if self._keys is None:
+                keys: dict[str, set[str]] = {}
+                with self.session_factory() as db:
+                    for title, row_key in db.query(ArchivedSheetRow.sheet_title, ArchivedSheetRow.row_key):
+                        keys.setdefault(title, set()).add(row_key)
+                self._keys = keys
+            return self._keys
+
+    def contains(self, rule: ArchiveRule, row: list[str]) -> bool:
+        return rule.key(row) in self._loaded().get(rule.title, ())
+
+    def matcher(self, title: str) -> Callable[[list[str]], bool] | None:
+        """Функция-фильтр заархивированных строк листа или ``None``, если таких строк нет."""
+        rule = ARCHIVE_RULES_BY_TITLE.get(title)
+        keys = self._loaded().get(title) if rule else None
+        if not rule or not keys:
+            return None
+        return lambda row: rule.key(row) in keys
+
+    def add(self, rule: ArchiveRule, rows: Iterable[list[str]], spreadsheet_id: str) -> None:
+        row_keys = {row_key for row_key in map(rule.key, rows) if row_key}
+        if not row_keys:
+            return
+
+        self.writer.run(_insert_archived_rows, rule.title, row_keys, spreadsheet_id)
+        with self._lock:
+            if self._keys is not None:
+                self._keys.setdefault(rule.title, set()).update(row_keys)
+
+
+def _insert_archived_rows(db: Session, title: str, row_keys: set[str], spreadsheet_id: str) -> None:
+    """Задание писателя для ``ArchivedRowStore.add``."""
+    now = datetime.now()
+    db.execute(
+        insert(ArchivedSheetRow)
+        .values(
+            [
+                {"sheet_title": title, "row_key": row_key, "spreadsheet_id": spreadsheet_id, "archived_at": now}
+                for row_key in row_keys
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=["sheet_title", "row_key"])
+    )
+
+
+archived_row_store = ArchivedRowStore()
+
+
+class SheetsArchiver:
+    """Переносит завершённые заявки старше ``max_age_days`` из активной таблицы в архивную.
+
+    Строки сначала дописываются в архивную таблицу и запоминаются в
+    ``archived_sheet_rows``, и только потом удаляются из активной, поэтому прерванный
+    запуск безопасно повторить: уже перенесённые строки повторно не дописываются.
+    """
+
+    def __init__(
+        self,
+        store: ArchivedRowStore = archived_row_store,
+        max_age_days: int = settings.sheets_archive_after_days,
+        interval: timedelta = timedelta(hours=settings.sheets_archive_interval_hours),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.store = store
+        self.max_age_days = max_age_days
+        self.interval = interval
+        self.clock = clock
+        self._last_run: float | None = None
+
+    def run_if_due(self, manager: GoogleSheetsManager) -> int:
+        if self.max_age_days <= 0:
+            return 0
+        if self._last_run is not None and self.clock() - self._last_run < self.interval.total_seconds():
+            return 0
+
+        self._last_run = self.clock()
+        try:
+            return self.archive(manager)
+        except ExistingSpreadsheetRequiredError as exc:
+            logger.error("Архивация строк Google Sheets пропущена: %s", exc)
+        except Exception as exc:
+            logger.error("Ошибка архивации строк Google Sheets: %s", exc)
+        return 0
+
+    def archive(self, manager: GoogleSheetsManager, today: date | None = None) -> int:
+        cutoff = (today or date.today()) - timedelta(days=self.max_age_days)
+        active = resolve_active_spreadsheet(manager.gc)
+        existing_by_title, _ = manager.load_worksheets(active, [rule.title for rule in ARCHIVE_RULES])
+        due_by_rule = {
+            # Строки без регистрационного номера нельзя потом узнать среди строк парсера, их не трогаем.
+            rule: [row for row in existing_by_title[rule.title][1:] if rule.key(row) and rule.is_due(row, cutoff)]
+            for rule in ARCHIVE_RULES
+        }
+        total = sum(len(rows) for rows in due_by_rule.values())
+        if not total:
+            logger.info("Архивация Google Sheets: нет завершённых строк старше %s дней", self.max_age_days)
+            return 0
+
+        archive = resolve_archive_spreadsheet(manager.gc)
+        for rule, rows in due_by_rule.items():
+            new_rows = [row for row in rows if not self.store.contains(rule, row)]
+            if new_rows:
+                self._append(archive, rule, new_rows)
+            self.store.add(rule, rows, archive.id)
+            if rows:
+                logger.info("Лист %s: в архив %s перенесено %s строк", rule.title, archive.id, len(new_rows))
+
+        manager.prune_archived_rows(active)
+        return total
+
+    @staticmethod
+    def _append(archive: ActiveSpreadsheet, rule: ArchiveRule, rows: list[list[str]]) -> None:
+        try:
+            archive.worksheet(rule.title)
+        except WorksheetNotFound:
+            archive.worksheets[rule.title] = archive.spreadsheet.add_worksheet(
+                rule.title, rows=1, cols=len(rule.header)
+            )
+            rows = [list(rule.header)] + rows
+
+        archive.spreadsheet.values_append(
+            absolute_range_name(rule.title),
+            params={"valueInputOption": "USER_ENTERED", "insertDataOption": "INSERT_ROWS"},
+            body={"values": rows},
+        )
@@ -1,13 +1,24 @@
 from __future__ import annotations
 
-import os
-from io import BytesIO
+import threading
+from concurrent.futures import Future, wait
+from pathlib import Path
 from typing import Optional
 
 import yadisk
 from curl_cffi import requests
 
-from visascraper.config import ensure_runtime_dirs, settings
+from visascraper.config import ensure_runtime_dirs
+from visascraper.dto import FINAL_STATUSES
+from visascraper.services.pdf_store import (
+    PDF_CHUNK_SIZE,
+    PDF_KIND_BATCH,
+    PDF_KIND_STAY,
+    PDFStore,
+    StoredPdf,
+    pdf_store,
+)
+from visascraper.services.upload_worker import REMOTE_DIR, UploadJob, YandexUploadWorker
 from visascraper.utils.logger import logger
 
 ensure_runtime_dirs()
@@ -37,9 +48,12 @@ class SessionManager:
 
 
 class YandexDiskUploader:
+    REMOTE_DIR = REMOTE_DIR
+
     def __init__(self, token: str | None):
         self.token = token
         self.client = yadisk.YaDisk(token=token) if token else None
+        self._remote_dir_ready = False
         if self.client:
             self._check_token()
         else:
@@ -51,30 +65,36 @@ class YandexDiskUploader:
         if not self.client.check_token():
             raise RuntimeError("Недействительный токен Яндекс.Диска. Проверьте YANDEX_TOKEN.")
 
-    def upload_pdf(self, pdf_content: bytes, filename: str) -> str:
+    def _ensure_remote_dir(self) -> None:
+        if self._remote_dir_ready or not self.client:
+            return
+        try:
+            self.client.mkdir(self.REMOTE_DIR)
+        except yadisk.exceptions.PathExistsError:
+            pass
+        self._remote_dir_ready = True
+
+    def upload_pdf(self, file_path: Path, filename: str, overwrite: bool = False) -> str:
+        """Загружает и публикует PDF; вызывается только для файлов без сохранённой ссылки."""
         if not self.client:
             return ""
 
-        file_path = f"/Visa/{filename}"
-        try:
-            if self.client.exists(file_path):
-                meta = self.client.get_meta(file_path, fields=["public_url"])
+        remote_path = f"{self.REMOTE_DIR}/{filename}"
+        if not overwrite:
+            try:
+                meta = self.client.get_meta(remote_path, fields=["public_url"])
                 if meta.public_url:
                     return meta.public_url
-        except yadisk.exceptions.PathNotFoundError:
-            logger.info("Файл %s отсутствует на Яндекс.Диске, загружаем", file_path)
-        except Exception as exc:
-            logger.warning("Ошибка проверки файла %s на Яндекс.Диске: %s", file_path, exc)
+            except yadisk.exceptions.PathNotFoundError:
+                logger.info("Файл %s отсутствует на Яндекс.Диске, загружаем", remote_path)
+            except Exception as exc:
+                logger.warning("Ошибка проверки файла %s на Яндекс.Диске: %s", remote_path, exc)
 
         try:
-            try:
-                self.client.mkdir("/Visa")
-            except yadisk.exceptions.PathExistsError:
-                pass
-
-            self.client.upload(BytesIO(pdf_content), file_path, overwrite=True)
-            self.client.publish(file_path)
-            meta = self.client.get_meta(file_path, fields=["public_url"])
+            self._ensure_remote_dir()
+            self.client.upload(str(file_path), remote_path, overwrite=True)
+            self.client.publish(remote_path)
+            meta = self.client.get_meta(remote_path, fields=["public_url"])
             return meta.public_url or ""
         except Exception as exc:
             logger.error("Не удалось загрузить PDF %s на Яндекс.Диск: %s", filename, exc)
@@ -82,21 +102,44 @@ class YandexDiskUploader:
 
 
 class PDFManager:
-    def __init__(self, session_manager: SessionManager, yandex_uploader: YandexDiskUploader):
+    def __init__(
+        self,
+        session_manager: SessionManager,
+        yandex_uploader: YandexDiskUploader,
+        store: PDFStore = pdf_store,
+        upload_worker: YandexUploadWorker | None = None,
+    ):
         self.session_manager = session_manager
         self.yandex_uploader = yandex_uploader
-        self.temp_dir = settings.temp_dir
+        self.store = store
+        self.upload_worker = upload_worker
+        self._pending_uploads: dict[tuple[str, str], Future[str]] = {}
+        self._pending_lock = threading.Lock()
 
-    def download_pdf(self, session: requests.Session, session_id: str, pdf_url: str) -> Optional[bytes]:
+    def download_pdf(
+        self,
+        session: requests.Session,
+        session_id: str,
+        pdf_url: str,
+        kind: str,
+        reg_number: str,
+    ) -> Optional[StoredPdf]:
+        """Скачивает PDF потоком прямо в хранилище, не держа файл целиком в памяти."""
         cookies = {"PHPSESSID": session_id}
         headers = {
             "User-Agent": "Mozilla/5.0",
             "Referer": "https://evisa.imigrasi.go.id/",
         }
+        response = None
         try:
-            response = session.get(pdf_url, cookies=cookies, headers=headers)
+            response = session.get(pdf_url, cookies=cookies, headers=headers, stream=True)
             if response.status_code == 200 and "application/pdf" in response.headers.get("Content-Type", ""):
-                return response.content
+                return self.store.put_stream(
+                    kind,
+                    reg_number,
+                    response.iter_content(chunk_size=PDF_CHUNK_SIZE),
+                    source_url=pdf_url,
+                )
             logger.error(
                 "Ошибка загрузки PDF %s: status=%s content-type=%s",
                 pdf_url,
@@ -105,23 +148,113 @@ class PDFManager:
             )
         except Exception as exc:
             logger.error("Ошибка при загрузке PDF %s: %s", pdf_url, exc)
+        finally:
+            if response is not None:
+                response.close()
         return None
 
     def _get_or_cache_pdf(
         self,
-        local_name: str,
+        kind: str,
+        reg_number: str,
+        session: requests.Session,
+        session_id: str,
+        pdf_url: str,
+        status: str = "",
+    ) -> Optional[StoredPdf]:
+        stored = self.store.lookup(kind, reg_number)
+        if stored and self._is_current(stored, status):
+            return stored
+
+        downloaded = self.download_pdf(session, session_id, pdf_url, kind, reg_number)
+        return downloaded or stored
+
+    def _is_current(self, stored: StoredPdf, status: str) -> bool:
+        """PDF завершённой заявки больше не меняется, поэтому его не перекачивают по ``max_age``."""
+        return (status or "").strip().lower() in FINAL_STATUSES or self.store.is_fresh(stored)
+
+    def _is_pending(self, kind: str, reg_number: str) -> bool:
+        with self._pending_lock:
+            return (kind, reg_number) in self._pending_uploads
+
+    def _enqueue_upload(self, stored: StoredPdf) -> None:
+        key = (stored.kind, stored.register_number)
+        with self._pending_lock:
+            pending = self._pending_uploads.get(key)
+            if pending is not None and not pending.done():
+                return
+            job = UploadJob(
+                kind=stored.kind,
+                register_number=stored.register_number,
+                file_path=stored.path,
+                remote_path=f"{REMOTE_DIR}/{stored.filename}",
+                overwrite=stored.needs_overwrite,
+                content_hash=stored.content_hash,
+            )
+            self._pending_uploads[key] = self.upload_worker.submit(job)
+
+    def _upload(self, stored: StoredPdf) -> str:
+        if stored.remote_url:
+            return stored.remote_url
+
+        if self.upload_worker and self.upload_worker.is_running:
+            self._enqueue_upload(stored)
+            return ""
+
+        public_url = self.yandex_uploader.upload_pdf(
+            stored.path,
+            stored.filename,
+            overwrite=stored.needs_overwrite,
+        )
+        self.store.set_remote_url(stored.kind, stored.register_number, public_url, stored.content_hash)
+        return public_url
+
+    def _resolve_link(
+        self,
+        kind: str,
+        reg_number: str,
         session: requests.Session,
         session_id: str,
         pdf_url: str,
-    ) -> Optional[bytes]:
-        path = self.temp_dir / local_name
-        if path.exists():
-            return path.read_bytes()
+        status: str = "",
+    ) -> str:
+        entry = self.store.get_entry(kind, reg_number)
+        if entry and entry.remote_url and self._is_current(entry, status):
+            return entry.remote_url
+
+        stored = self._get_or_cache_pdf(kind, reg_number, session, session_id, pdf_url, status)
+        if stored:
+            return self._upload(stored)
+        return entry.remote_url if entry and entry.remote_url else ""
+
+    def collect_links(self, kind: str, reg_numbers: list[str], timeout: float | None = None) -> dict[str, str]:
+        """Ждёт фоновые загрузки для указанных номеров и возвращает готовые публичные ссылки.
 
-        pdf_content = self.download_pdf(session, session_id, pdf_url)
-        if pdf_content:
-            path.write_bytes(pdf_content)
-        return pdf_content
+        Незавершённые за ``timeout`` загрузки продолжаются в фоне: ссылка попадёт в БД
+        по завершении и в таблицу — на следующем цикле.
+        """
+        with self._pending_lock:
+            futures = {
+                reg_number: self._pending_uploads[(kind, reg_number)]
+                for reg_number in reg_numbers
+                if (kind, reg_number) in self._pending_uploads
+            }
+        if not futures:
+            return {}
+
+        done, not_done = wait(futures.values(), timeout=timeout)
+        if not_done:
+            logger.info("Загрузка на Яндекс.Диск продолжается в фоне: %s файлов", len(not_done))
+
+        links: dict[str, str] = {}
+        with self._pending_lock:
+            for reg_number, future in futures.items():
+                if future not in done:
+                    continue
+                self._pending_uploads.pop((kind, reg_number), None)
+                if future.result():
+                    links[reg_number] = future.result()
+        return links
 
     def upload_batch_pdf(
         self,
@@ -130,15 +263,14 @@ class PDFManager:
         action_link_original: str,
         reg_number: str,
         full_name: str,
+        status: str = "",
     ) -> str:
         if not action_link_original:
             return ""
-        file_name = f"{reg_number}_batch_application.pdf"
-        pdf_content = self._get_or_cache_pdf(file_name, session, session_id, action_link_original)
-        if not pdf_content:
+        public_url = self._resolve_link(PDF_KIND_BATCH, reg_number, session, session_id, action_link_original, status)
+        if not public_url and not self._is_pending(PDF_KIND_BATCH, reg_number):
             logger.warning("Не удалось подготовить PDF Batch для %s (%s)", full_name, reg_number)
-            return ""
-        return self.yandex_uploader.upload_pdf(pdf_content, file_name)
+        return public_url
 
     def upload_stay_pdf(
         self,
@@ -146,6 +278,7 @@ class PDFManager:
         session_id: str,
         pdf_relative_url: str,
         reg_number: str,
+        status: str = "",
     ) -> str:
         if not pdf_relative_url:
             return ""
@@ -153,9 +286,7 @@ class PDFManager:
         if pdf_relative_url.startswith("/"):
             pdf_url = f"https://evisa.imigrasi.go.id{pdf_relative_url}"
 
-        file_name = f"{reg_number}_stay_permit.pdf"
-        pdf_content = self._get_or_cache_pdf(file_name, session, session_id, pdf_url)
-        if not pdf_content:
+        public_url = self._resolve_link(PDF_KIND_STAY, reg_number, session, session_id, pdf_url, status)
+        if not public_url and not self._is_pending(PDF_KIND_STAY, reg_number):
             logger.warning("Не удалось подготовить PDF Stay Permit для %s", reg_number)
-            return ""
-        return self.yandex_uploader.upload_pdf(pdf_content, file_name)
+        return public_url
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import yadisk
+
+from visascraper.config import settings
+from visascraper.database.crud import update_action_link
+from visascraper.services.pdf_store import PDFStore, pdf_store
+from visascraper.utils.logger import logger
+
+REMOTE_DIR = "/Visa"
+
+
+@dataclass(slots=True)
+class UploadJob:
+    kind: str
+    register_number: str
+    file_path: Path
+    remote_path: str
+    overwrite: bool = False
+    content_hash: str | None = None
+    result: Future[str] = field(default_factory=Future)
+
+
+class YandexUploadWorker:
+    """Фоновая загрузка PDF на Яндекс.Диск через асинхронный клиент yadisk.
+
+    Задания ставятся в очередь из потоков парсера через ``submit``; ``concurrency``
+    воркеров на event loop бота загружают файлы параллельно и после публикации
+    записывают ссылку в индекс PDF и в ``action_link`` записи в БД.
+    """
+
+    def __init__(self, concurrency: int = 4, store: PDFStore = pdf_store) -> None:
+        self.concurrency = max(1, concurrency)
+        self.store = store
+        self._client: yadisk.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[UploadJob | None] | None = None
+        self._tasks: list[asyncio.Task[None]] = []
+        self._remote_dir_ready = False
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks) and self._loop is not None and self._loop.is_running()
+
+    async def start(self, token: str | None) -> None:
+        if self.is_running:
+            return
+        if not token:
+            logger.warning("Воркер загрузки на Яндекс.Диск не запущен: YANDEX_TOKEN не задан")
+            return
+
+        self._client = yadisk.AsyncClient(token=token, session="aiohttp")
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"yadisk-upload-{index}")
+            for index in range(self.concurrency)
+        ]
+        logger.info("Воркер загрузки на Яндекс.Диск запущен: параллельных загрузок %s", self.concurrency)
+
+    async def stop(self) -> None:
+        if self._queue:
+            for _ in self._tasks:
+                await self._queue.put(None)
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        if self._client:
+            await self._client.close()
+
+        self._client = None
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+        self._remote_dir_ready = False
+
+    def submit(self, job: UploadJob) -> Future[str]:
+        """Потокобезопасно ставит задание в очередь и возвращает future с публичной ссылкой."""
+        if not self.is_running or not self._queue or not self._loop:
+            job.result.set_result("")
+            return job.result
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job.result
+
+    async def _worker(self) -> None:
+        if not self._queue:
+            return
+
+        while True:
+            job = await self._queue.get()
+            try:
+                if job is None:
+                    break
+                public_url = await self._upload(job)
+                if public_url:
+                    await asyncio.to_thread(self._apply_result, job, public_url)
+                job.result.set_result(public_url)
+            except Exception as exc:
+                logger.error("Ошибка фоновой загрузки %s на Яндекс.Диск: %s", job.remote_path, exc)
+                if not job.result.done():
+                    job.result.set_result("")
+            finally:
+                self._queue.task_done()
+
+    async def _ensure_remote_dir(self) -> None:
+        if self._remote_dir_ready or not self._client:
+            return
+        try:
+            await self._client.mkdir(REMOTE_DIR)
+        except yadisk.exceptions.PathExistsError:
+            pass
+        self._remote_dir_ready = True
+
+    async def _upload(self, job: UploadJob) -> str:
+        if not self._client:
+            return ""
+
+        if not job.overwrite:
+            try:
+                meta = await self._client.get_meta(job.remote_path, fields=["public_url"])
+                if meta.public_url:
+                    return meta.public_url
+            except yadisk.exceptions.PathNotFoundError:
+                pass
+
+        await self._ensure_remote_dir()
+        await self._client.upload(str(job.file_path), job.remote_path, overwrite=True)
+        await self._client.publish(job.remote_path)
+        meta = await self._client.get_meta(job.remote_path, fields=["public_url"])
+        return meta.public_url or ""
+
+    def _apply_result(self, job: UploadJob, public_url: str) -> None:
+        if self.store.set_remote_url(job.kind, job.register_number, public_url, job.content_hash):
+            update_action_link(job.kind, job.register_number, public_url)
+
+
+upload_worker = YandexUploadWorker(concurrency=settings.yandex_upload_concurrency)
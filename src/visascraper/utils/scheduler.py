@@ -10,6 +10,9 @@ from visascraper.bot.notification import (
     notify_approved_users,
 )
 from visascraper.config import settings
+from visascraper.database.maintenance import maintain_database
+from visascraper.database.retention import archive_old_records
+from visascraper.services.pdf_store import enforce_pdf_cache_limits
 from visascraper.utils.logger import logger
 
 
@@ -19,6 +22,9 @@ def start_scheduler() -> AsyncIOScheduler:
     scheduler.add_job(notify_approved_stay_permits, "interval", minutes=1, coalesce=True)
     scheduler.add_job(check_birthdays, "cron", hour=5, minute=0)
     scheduler.add_job(check_visa_expirations, "cron", hour=5, minute=0)
+    scheduler.add_job(enforce_pdf_cache_limits, "interval", hours=1, coalesce=True)
+    scheduler.add_job(archive_old_records, "cron", hour=4, minute=0, coalesce=True)
+    scheduler.add_job(maintain_database, "cron", hour=4, minute=30, coalesce=True)
     scheduler.start()
     logger.info("AsyncIOScheduler запущен")
     return scheduler
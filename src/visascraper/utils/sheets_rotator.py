@@ -1,5 +1,10 @@
 from __future__ import annotations
 
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
 import gspread
 
 from visascraper.config import settings
@@ -12,7 +17,57 @@ class ExistingSpreadsheetRequiredError(RuntimeError):
     """Raised when there is no usable active spreadsheet and auto-creation is disabled."""
 
 
-def get_current_data_sheet_id(gc: gspread.Client) -> str:
+@dataclass(slots=True)
+class ActiveSpreadsheet:
+    """Активная таблица вместе с метаданными листов, полученными при проверке размера.
+
+    Размеры листов после наших собственных структурных изменений учитываются через
+    ``set_row_count``, поэтому закэшированный объект остаётся пригодным для проверки
+    лимита ``MAX_SPREADSHEET_CELLS`` без повторного чтения метаданных.
+    """
+
+    id: str
+    spreadsheet: gspread.Spreadsheet
+    worksheets: dict[str, gspread.Worksheet] = field(default_factory=dict)
+    total_cells: int = 0
+    resolved_at: float = 0.0
+    row_counts: dict[str, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def worksheet(self, title: str) -> gspread.Worksheet:
+        try:
+            return self.worksheets[title]
+        except KeyError:
+            raise gspread.exceptions.WorksheetNotFound(title) from None
+
+    def row_count(self, title: str) -> int:
+        if title in self.row_counts:
+            return self.row_counts[title]
+        return self.worksheet(title).row_count
+
+    def set_row_count(self, title: str, row_count: int) -> None:
+        with self._lock:
+            delta = row_count - self.row_count(title)
+            self.row_counts[title] = row_count
+            self.total_cells += delta * self.worksheet(title).col_count
+
+
+_active_cache: ActiveSpreadsheet | None = None
+_active_cache_lock = threading.Lock()
+
+
+def invalidate_active_spreadsheet() -> None:
+    global _active_cache
+    with _active_cache_lock:
+        _active_cache = None
+
+
+def _spreadsheet_id_from_url(url: str) -> str:
+    return url.split("/d/")[-1].split("/")[0]
+
+
+def _find_index_sheet_id(gc: gspread.Client, matches: Callable[[str], bool]) -> str:
+    """Ищет в оглавлении последнюю таблицу, статус которой (4-я колонка) подходит под ``matches``."""
     if not settings.google_archive_index_id:
         return ""
 
@@ -21,16 +76,31 @@ def get_current_data_sheet_id(gc: gspread.Client) -> str:
         ws = index_ss.sheet1
         values = ws.get_all_values()
         for row in reversed(values):
-            if len(row) >= 4 and "активна" in row[3].lower():
-                url = row[2]
-                return url.split("/d/")[-1].split("/")[0]
+            if len(row) >= 4 and matches(row[3].lower()):
+                return _spreadsheet_id_from_url(row[2])
     except Exception as exc:
         logger.error("Ошибка чтения оглавления таблиц: %s", exc)
 
     return ""
 
 
-def ensure_valid_spreadsheet(gc: gspread.Client) -> str:
+def get_current_data_sheet_id(gc: gspread.Client) -> str:
+    return _find_index_sheet_id(gc, lambda status: "активна" in status)
+
+
+def get_archive_sheet_id(gc: gspread.Client) -> str:
+    return _find_index_sheet_id(gc, lambda status: "архив" in status and "активна" not in status)
+
+
+def _check_size(active: ActiveSpreadsheet) -> None:
+    if active.total_cells > MAX_SPREADSHEET_CELLS:
+        raise ExistingSpreadsheetRequiredError(
+            f"Активная Google-таблица {active.id} превысила безопасный лимит по размеру. "
+            "Автосоздание отключено: создайте новую таблицу вручную и отметьте её как активную."
+        )
+
+
+def _load_active_spreadsheet(gc: gspread.Client) -> ActiveSpreadsheet:
     current_id = get_current_data_sheet_id(gc)
     if not current_id:
         raise ExistingSpreadsheetRequiredError(
@@ -46,11 +116,64 @@ def ensure_valid_spreadsheet(gc: gspread.Client) -> str:
             "Автосоздание отключено: проверьте доступ сервисного аккаунта и запись в индексе."
         ) from exc
 
-    total_cells = sum(ws.row_count * ws.col_count for ws in spreadsheet.worksheets())
-    if total_cells > MAX_SPREADSHEET_CELLS:
+    worksheets = spreadsheet.worksheets()
+    active = ActiveSpreadsheet(
+        id=current_id,
+        spreadsheet=spreadsheet,
+        total_cells=sum(ws.row_count * ws.col_count for ws in worksheets),
+        resolved_at=time.monotonic(),
+    )
+    _check_size(active)
+    active.worksheets = {ws.title: ws for ws in worksheets}
+    return active
+
+
+def resolve_active_spreadsheet(gc: gspread.Client, refresh: bool = False) -> ActiveSpreadsheet:
+    """Возвращает активную таблицу, перечитывая индекс не чаще раза в ``SHEETS_ACTIVE_CACHE_TTL_SECONDS``."""
+    global _active_cache
+    with _active_cache_lock:
+        cached = _active_cache
+        ttl = settings.sheets_active_cache_ttl_seconds
+        if not refresh and cached is not None and time.monotonic() - cached.resolved_at < ttl:
+            try:
+                _check_size(cached)
+            except ExistingSpreadsheetRequiredError:
+                _active_cache = None
+                raise
+            return cached
+
+        _active_cache = None
+        active = _load_active_spreadsheet(gc)
+        if ttl > 0:
+            _active_cache = active
+        return active
+
+
+def resolve_archive_spreadsheet(gc: gspread.Client) -> ActiveSpreadsheet:
+    """Открывает архивную таблицу из оглавления; результат не кэшируется, архивация запускается редко."""
+    archive_id = get_archive_sheet_id(gc)
+    if not archive_id:
         raise ExistingSpreadsheetRequiredError(
-            f"Активная Google-таблица {current_id} превысила безопасный лимит по размеру. "
-            "Автосоздание отключено: создайте новую таблицу вручную и отметьте её как активную."
+            "Архивная Google-таблица не найдена в оглавлении. "
+            "Автосоздание отключено: добавьте таблицу со статусом «архив» вручную."
         )
 
-    return current_id
+    try:
+        spreadsheet = gc.open_by_key(archive_id)
+    except Exception as exc:
+        raise ExistingSpreadsheetRequiredError(f"Архивная Google-таблица недоступна: {archive_id}.") from exc
+
+    worksheets = spreadsheet.worksheets()
+    archive = ActiveSpreadsheet(
+        id=archive_id,
+        spreadsheet=spreadsheet,
+        worksheets={ws.title: ws for ws in worksheets},
+        total_cells=sum(ws.row_count * ws.col_count for ws in worksheets),
+        resolved_at=time.monotonic(),
+    )
+    if archive.total_cells > MAX_SPREADSHEET_CELLS:
+        raise ExistingSpreadsheetRequiredError(
+            f"Архивная Google-таблица {archive_id} заполнена. "
+            "Создайте новую архивную таблицу вручную и добавьте её в оглавление."
+        )
+    return archive
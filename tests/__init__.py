@@ -1,6 +1,16 @@
 from pathlib import Path
+import atexit
+import os
+import shutil
 import sys
+import tempfile
 
 SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
 if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
+
+# Импорт config/logger создаёт каталоги БД и логов: тесты не должны трогать рабочие.
+_RUNTIME_DIR = tempfile.mkdtemp(prefix="visascraper-tests-")
+atexit.register(shutil.rmtree, _RUNTIME_DIR, ignore_errors=True)
+os.environ["DATA_DIR"] = os.path.join(_RUNTIME_DIR, "data")
+os.environ["LOGS_DIR"] = os.path.join(_RUNTIME_DIR, "logs")
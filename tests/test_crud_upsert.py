@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+from pathlib import Path
+import asyncio
+from datetime import date
+import sys
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from visascraper.database.crud import (
+    SEARCH_RESULT_LIMIT,
+    notify_new_batch_applications,
+    upsert_batch_applications,
+    upsert_stay_permits,
+    search_by_passport,
+    search_by_stay_permit,
+)
+from visascraper.bot.notification import (
+    _birthday_messages,
+    _visa_expiration_messages,
+    notify_approved_stay_permits,
+    notify_approved_users,
+)
+from visascraper.database.db import (
+    _migrate_batch_register_number_unique,
+    _migrate_typed_dates,
+    configure_writer_engine,
+)
+from visascraper.database.models import Base, BatchApplication, StatusEvent, StayPermit
+from visascraper.database.writer import DatabaseWriter
+from visascraper.dto import StayPermitData, birth_month_day, parse_portal_date
+
+
+def batch_payload(register_number: str, status: str, action_link: str = "") -> dict:
+    return {
+        "batch_no": "B-1",
+        "register_number": register_number,
+        "full_name": "John Doe",
+        "passport_number": "P123",
+        "status": status,
+        "action_link": action_link,
+        "account": "acc-1",
+    }
+
+
+class DatabaseTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{(Path(self._tmp.name) / 'index.db').as_posix()}")
+        configure_writer_engine(self.engine)
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.writer = DatabaseWriter(self.session_factory)
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        self.engine.dispose()
+        self._tmp.cleanup()
+
+    def _batch(self, register_number: str) -> BatchApplication:
+        with self.session_factory() as db:
+            return db.query(BatchApplication).filter(BatchApplication.register_number == register_number).one()
+
+
+class BulkUpsertTests(DatabaseTestCase):
+    def test_insert_then_update_tracks_status_transition_in_sql(self) -> None:
+        with self.session_factory() as db:
+            upsert_batch_applications(db, [batch_payload("REG-1", "In Process", "https://disk/1")])
+            db.commit()
+            db.query(BatchApplication).update({BatchApplication.notified_as_new: True})
+            db.commit()
+
+        inserted = self._batch("REG-1")
+        self.assertEqual((inserted.status, inserted.last_status), ("In Process", "In Process"))
+
+        with self.session_factory() as db:
+            upsert_batch_applications(db, [batch_payload("REG-1", "Approved")])
+            db.commit()
+        updated = self._batch("REG-1")
+        self.assertEqual((updated.status, updated.last_status), ("Approved", "In Process"))
+        self.assertEqual(updated.action_link, "https://disk/1")
+        self.assertTrue(updated.notified_as_new)
+
+        with self.session_factory() as db:
+            upsert_batch_applications(db, [batch_payload("REG-1", "Approved", "https://disk/2")])
+            db.commit()
+        unchanged = self._batch("REG-1")
+        self.assertEqual((unchanged.status, unchanged.last_status), ("Approved", "In Process"))
+        self.assertEqual(unchanged.action_link, "https://disk/2")
+
+    def test_duplicates_in_payload_collapse_to_last_item(self) -> None:
+        with self.session_factory() as db:
+            upsert_stay_permits(
+                db,
+                [
+                    {"reg_number": "ITK-1", "status": "Draft", "account": "acc-1"},
+                    {"reg_number": "ITK-1", "status": "Issued", "account": "acc-1"},
+                    {"reg_number": "", "status": "Issued", "account": "acc-1"},
+                ],
+            )
+            db.commit()
+            permits = db.query(StayPermit).all()
+
+        self.assertEqual([(permit.reg_number, permit.status) for permit in permits], [("ITK-1", "Issued")])
+
+    def test_migration_removes_duplicates_and_enforces_uniqueness(self) -> None:
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_batch_applications_register_number")
+            conn.exec_driver_sql("CREATE INDEX ix_batch_applications_register_number ON batch_applications (register_number)")
+            conn.exec_driver_sql(
+                "INSERT INTO batch_applications (register_number, status, notified_as_new) "
+                "VALUES ('REG-1', 'old', 1), ('REG-1', 'new', 0), ('REG-2', 'only', 0)"
+            )
+            _migrate_batch_register_number_unique(conn)
+            rows = conn.exec_driver_sql(
+                "SELECT register_number, status, notified_as_new FROM batch_applications ORDER BY register_number"
+            ).fetchall()
+
+        self.assertEqual(rows, [("REG-1", "new", 1), ("REG-2", "only", 0)])
+        with self.session_factory() as db:
+            upsert_batch_applications(db, [batch_payload("REG-2", "Approved")])
+            db.commit()
+        self.assertEqual(self._batch("REG-2").last_status, "only")
+
+
+class NewRecordNotificationTests(DatabaseTestCase):
+    def test_new_records_are_claimed_once_in_bulk(self) -> None:
+        payload = [batch_payload(f"REG-{index}", "In Process") for index in range(3)]
+        with self.session_factory() as db:
+            upsert_batch_applications(db, payload[:2])
+            db.commit()
+
+        send = AsyncMock()
+        with (
+            patch("visascraper.database.crud.db_writer", self.writer),
+            patch("visascraper.database.crud.send_telegram_message", send),
+            patch("visascraper.database.crud.pdf_store.lookup", return_value=None),
+        ):
+            asyncio.run(notify_new_batch_applications(payload + payload[:1]))
+            self.assertEqual(send.await_count, 2)
+            self.assertIn("REG-0", send.await_args_list[0].args[0])
+
+            send.reset_mock()
+            asyncio.run(notify_new_batch_applications(payload))
+            send.assert_not_awaited()
+
+        self.assertTrue(self._batch("REG-1").notified_as_new)
+
+
+class StatusEventTests(DatabaseTestCase):
+    def _notify(self, notifier) -> AsyncMock:
+        send = AsyncMock()
+        with (
+            patch("visascraper.bot.notification.db_writer", self.writer),
+            patch("visascraper.bot.notification.ReadSessionLocal", self.session_factory),
+            patch("visascraper.bot.notification.send_telegram_message", send),
+            patch("visascraper.bot.notification.pdf_store.lookup", return_value=None),
+        ):
+            asyncio.run(notifier())
+        return send
+
+    def test_upsert_records_transitions_and_notifier_consumes_them_once(self) -> None:
+        with self.session_factory() as db:
+            upsert_batch_applications(db, [batch_payload("REG-1", "In Process"), batch_payload("REG-2", "In Process")])
+            db.commit()
+            upsert_batch_applications(db, [batch_payload("REG-1", "Approved"), batch_payload("REG-2", "In Process")])
+            db.commit()
+            events = db.query(StatusEvent.register_number, StatusEvent.old_status, StatusEvent.new_status).all()
+
+        self.assertEqual(events, [("REG-1", "In Process", "Approved")])
+
+        send = self._notify(notify_approved_users)
+        self.assertEqual(send.await_count, 1)
+        self.assertIn("Виза одобрена", send.await_args.args[0])
+        self._notify(notify_approved_users).assert_not_awaited()
+
+    def test_stay_permit_approval_and_unprocessed_index(self) -> None:
+        with self.session_factory() as db:
+            upsert_stay_permits(db, [{"reg_number": "ITK-1", "status": "Draft"}])
+            db.commit()
+            upsert_stay_permits(db, [{"reg_number": "ITK-1", "status": "Approved"}])
+            db.commit()
+            plan = " ".join(
+                str(row[-1])
+                for row in db.connection().exec_driver_sql(
+                    "EXPLAIN QUERY PLAN SELECT id FROM status_events WHERE kind = 'stay_permit' AND processed_at IS NULL"
+                )
+            )
+
+        self.assertIn("ix_status_events_unprocessed", plan)
+        self.assertEqual(self._notify(notify_approved_users).await_count, 0)
+        self.assertEqual(self._notify(notify_approved_stay_permits).await_count, 1)
+
+
+class TypedDateTests(DatabaseTestCase):
+    def _stay(self, reg_number: str, expired_date: str) -> dict:
+        return StayPermitData(
+            reg_number=reg_number,
+            name="Jane",
+            type_of_staypermit="ITK",
+            visa_type="C312",
+            passport_number="P1",
+            arrival_date="",
+            issue_date="",
+            expired_date=expired_date,
+            status="Approved",
+            action_link="",
+            account="acc-1",
+        ).to_db_dict()
+
+    def test_portal_dates_are_normalized(self) -> None:
+        self.assertEqual(parse_portal_date("2026-03-05"), date(2026, 3, 5))
+        self.assertEqual(parse_portal_date("05-03-2026"), date(2026, 3, 5))
+        self.assertIsNone(parse_portal_date("soon"))
+        self.assertEqual(birth_month_day("05/03/1990"), "03-05")
+        self.assertIsNone(birth_month_day(""))
+
+    def test_daily_checks_use_typed_columns(self) -> None:
+        today = date(2026, 1, 1)
+        with self.session_factory() as db:
+            upsert_stay_permits(
+                db,
+                [self._stay("ITK-5", "2026-01-06"), self._stay("ITK-40", "2026-02-10"), self._stay("ITK-7", "2026-01-08")],
+            )
+            db.commit()
+            upsert_batch_applications(
+                db,
+                [
+                    {**batch_payload("REG-1", "Approved"), "birth_month_day": "01-01"},
+                    {**batch_payload("REG-2", "Approved"), "birth_month_day": "01-02"},
+                ],
+            )
+            db.commit()
+            plan = " ".join(
+                str(row[-1])
+                for row in db.connection().exec_driver_sql(
+                    "EXPLAIN QUERY PLAN SELECT id FROM stay_permits WHERE expires_on IN ('2026-01-06', '2026-02-10')"
+                )
+            )
+
+        self.assertIn("ix_stay_permits_expires_on", plan)
+        with (
+            patch("visascraper.bot.notification.ReadSessionLocal", self.session_factory),
+            patch("visascraper.bot.notification.pdf_store.lookup", return_value=None),
+        ):
+            expirations = _visa_expiration_messages(today, [40, 5])
+            birthdays = _birthday_messages(today)
+
+        self.assertEqual(len(expirations), 2)
+        self.assertIn("через 40 дней", expirations[0][0])
+        self.assertIn("через 5 дней", expirations[1][0])
+        self.assertEqual(len(birthdays), 1)
+
+    def test_migration_backfills_existing_rows(self) -> None:
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO batch_applications (register_number, birth_date, notified_as_new) "
+                "VALUES ('REG-1', '05/03/1990', 0), ('REG-2', '', 0)"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO stay_permits (reg_number, expired_date, notified_as_new) VALUES ('ITK-1', '2026-02-10', 0)"
+            )
+            _migrate_typed_dates(conn)
+
+        self.assertEqual(self._batch("REG-1").birth_month_day, "03-05")
+        self.assertIsNone(self._batch("REG-2").birth_month_day)
+        with self.session_factory() as db:
+            self.assertEqual(db.query(StayPermit.expires_on).scalar(), date(2026, 2, 10))
+
+
+class FulltextSearchTests(DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        with self.session_factory() as db:
+            upsert_batch_applications(
+                db,
+                [
+                    {**batch_payload("REG-1", "Approved"), "full_name": "Roman Dudukalov", "passport_number": "4729312290"},
+                    {**batch_payload("REG-2", "Approved"), "full_name": "Anna Petrova", "passport_number": "7510000001"},
+                    {**batch_payload("REG-3", "Approved"), "full_name": "Li Wu", "passport_number": "E12345678"},
+                ],
+            )
+            db.commit()
+            upsert_stay_permits(
+                db,
+                [
+                    {"reg_number": "ITK-1", "passport_number": "X4729312290", "status": "Issued"},
+                    {"reg_number": "ITK-2", "passport_number": "4729312290", "status": "Issued"},
+                ],
+            )
+            db.commit()
+
+    def _search(self, search, value: str) -> list[str]:
+        with self.session_factory() as db:
+            return [getattr(row, "register_number", None) or row.reg_number for row in search(db, value)]
+
+    def test_batch_search_matches_name_and_passport_fragments(self) -> None:
+        self.assertEqual(self._search(search_by_passport, "roman dudukalov 4729312290"), ["REG-1"])
+        self.assertEqual(sorted(self._search(search_by_passport, "DUDU PETR")), ["REG-1", "REG-2"])
+        self.assertEqual(self._search(search_by_passport, "ANNA 4729312290"), [])
+        self.assertEqual(self._search(search_by_passport, "LI"), ["REG-3"])
+
+    def test_index_follows_updates(self) -> None:
+        with self.session_factory() as db:
+            upsert_batch_applications(db, [{**batch_payload("REG-2", "Approved"), "full_name": "Anna Sidorova"}])
+            db.commit()
+
+        self.assertEqual(self._search(search_by_passport, "SIDOROVA"), ["REG-2"])
+        self.assertEqual(self._search(search_by_passport, "PETROVA"), [])
+
+    def test_stay_search_prefers_exact_passport(self) -> None:
+        self.assertEqual(self._search(search_by_stay_permit, "4729312290"), ["ITK-2"])
+        self.assertEqual(self._search(search_by_stay_permit, "472931"), ["ITK-1", "ITK-2"])
+        with self.session_factory() as db:
+            plan = " ".join(
+                str(row[-1])
+                for row in db.connection().exec_driver_sql(
+                    "EXPLAIN QUERY PLAN SELECT rowid FROM stay_permits_fts WHERE stay_permits_fts MATCH 'abc'"
+                )
+            )
+        self.assertIn("VIRTUAL TABLE INDEX", plan)
+
+    def test_fragment_search_is_limited(self) -> None:
+        with self.session_factory() as db:
+            upsert_stay_permits(
+                db,
+                [
+                    {"reg_number": f"ITK-X{index}", "passport_number": f"A{index:02d}123", "status": "Issued"}
+                    for index in range(SEARCH_RESULT_LIMIT + 5)
+                ],
+            )
+            db.commit()
+
+        self.assertEqual(len(self._search(search_by_stay_permit, "123")), SEARCH_RESULT_LIMIT + 1)
+
+    def test_fulltext_table_lookup_is_cached(self) -> None:
+        self._search(search_by_passport, "DUDU")
+        statements = []
+
+        def listener(conn, cursor, statement, *args) -> None:
+            statements.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", listener)
+        try:
+            self.assertEqual(self._search(search_by_passport, "DUDU"), ["REG-1"])
+        finally:
+            event.remove(self.engine, "before_cursor_execute", listener)
+        self.assertFalse([sql for sql in statements if "sqlite_master" in sql])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from visascraper.database.lookups import chunked, filter_in_chunks
+from visascraper.database.models import Base, StayPermit
+
+
+class ChunkedLookupTests(unittest.TestCase):
+    def test_chunked_splits_any_iterable(self) -> None:
+        self.assertEqual(list(chunked(iter(range(5)), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunked([], 2)), [])
+
+    def test_filter_in_chunks_matches_single_in_query(self) -> None:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            db.add_all(StayPermit(reg_number=f"ITK-{index}") for index in range(7))
+            db.commit()
+
+            keys = ["ITK-5", "ITK-1", "ITK-1", "", "ITK-6", "missing", "ITK-0"]
+            queries = list(filter_in_chunks(db.query(StayPermit.reg_number), StayPermit.reg_number, keys, size=2))
+            found = sorted(reg_number for query in queries for (reg_number,) in query)
+
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(found, ["ITK-0", "ITK-1", "ITK-5", "ITK-6"])
+
+
+if __name__ == "__main__":
+    unittest.main()
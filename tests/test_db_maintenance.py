@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+from datetime import datetime, timedelta
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from visascraper.database.crud import upsert_batch_applications
+from visascraper.database.maintenance import AUTO_VACUUM_INCREMENTAL, DatabaseMaintenance
+from visascraper.database.models import Base, BatchApplication, StatusEvent
+from visascraper.database.writer import DatabaseWriter
+
+
+class DatabaseMaintenanceTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.logs = self.enterContext(self.assertLogs("visascraper", level="INFO"))
+        self._tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{(Path(self._tmp.name) / 'index.db').as_posix()}")
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.writer = DatabaseWriter(self.session_factory)
+        self.maintenance = DatabaseMaintenance(
+            self.engine, vacuum_pages=10_000, convert_auto_vacuum=True, status_events_days=30, writer=self.writer
+        )
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        self.engine.dispose()
+        self._tmp.cleanup()
+
+    def _fill_and_clear(self) -> None:
+        with self.session_factory() as db:
+            upsert_batch_applications(
+                db,
+                [
+                    {"register_number": f"REG-{i}", "full_name": "X" * 500, "passport_number": f"P{i:08d}"}
+                    for i in range(500)
+                ],
+            )
+            db.commit()
+            db.execute(delete(BatchApplication))
+            db.commit()
+
+    def _pragma(self, name: str) -> int:
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+    def test_converts_old_file_and_then_vacuums_incrementally(self) -> None:
+        self.assertNotEqual(self._pragma("auto_vacuum"), AUTO_VACUUM_INCREMENTAL)
+
+        self.maintenance.run()
+        self.assertEqual(self._pragma("auto_vacuum"), AUTO_VACUUM_INCREMENTAL)
+
+        self._fill_and_clear()
+        self.assertGreater(self._pragma("freelist_count"), 0)
+
+        report = self.maintenance.run()
+        self.assertGreater(report.freed_pages, 0)
+        self.assertEqual(self._pragma("freelist_count"), 0)
+        self.assertEqual(report.checkpoint[0], 0)
+
+    def test_old_file_is_not_fully_vacuumed_without_opt_in(self) -> None:
+        maintenance = DatabaseMaintenance(self.engine, vacuum_pages=10_000, convert_auto_vacuum=False, writer=self.writer)
+
+        maintenance.run()
+
+        self.assertNotEqual(self._pragma("auto_vacuum"), AUTO_VACUUM_INCREMENTAL)
+        self.assertTrue(any("DATABASE_CONVERT_AUTO_VACUUM=1" in line for line in self.logs.output))
+
+    def test_reports_sizes_durations_and_index_usage(self) -> None:
+        report = self.maintenance.run()
+
+        self.assertEqual(set(report.durations), {"status_events", "optimize", "vacuum", "checkpoint", "stats"})
+        self.assertTrue(any("размер таблиц с индексами" in line for line in self.logs.output))
+        self.assertGreater(report.file_size, 0)
+        self.assertIn("batch_applications", report.table_sizes)
+        self.assertNotIn("ix_batch_applications_register_number", report.table_sizes)
+        self.assertEqual(report.full_scans, [])
+        self.assertIn("ix_batch_applications_register_number", report.index_usage["batch_applications по register_number"])
+
+    def test_purges_only_old_processed_status_events(self) -> None:
+        now = datetime.now()
+        with self.session_factory() as db:
+            db.add_all(
+                [
+                    StatusEvent(kind="batch", register_number="OLD", created_at=now, processed_at=now - timedelta(days=31)),
+                    StatusEvent(kind="batch", register_number="NEW", created_at=now, processed_at=now - timedelta(days=1)),
+                    StatusEvent(kind="batch", register_number="PENDING", created_at=now - timedelta(days=60)),
+                ]
+            )
+            db.commit()
+
+        report = self.maintenance.run()
+
+        self.assertEqual(report.purged_events, 1)
+        with self.session_factory() as db:
+            remaining = sorted(register_number for (register_number,) in db.query(StatusEvent.register_number))
+        self.assertEqual(remaining, ["NEW", "PENDING"])
+
+
+if __name__ == "__main__":
+    unittest.main()
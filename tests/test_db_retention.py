@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from datetime import date
+from pathlib import Path
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from visascraper.database.crud import (
+    upsert_batch_applications,
+    upsert_stay_permits,
+    search_by_passport,
+)
+from visascraper.database.db import configure_writer_engine
+from visascraper.database.models import ArchivedRecord, Base, BatchApplication, StayPermit
+from visascraper.database.retention import RecordArchiver
+from visascraper.database.writer import DatabaseWriter
+
+
+def batch(register_number: str, status: str, payment_date: str) -> dict:
+    return {
+        "register_number": register_number,
+        "full_name": f"Person {register_number}",
+        "passport_number": f"P{register_number.replace('-', '')}01",
+        "payment_date": payment_date,
+        "status": status,
+        "account": "acc-1",
+    }
+
+
+class RecordArchiverTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.logs = self.enterContext(self.assertLogs("visascraper", level="INFO"))
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        self.engine = create_engine(f"sqlite:///{(root / 'index.db').as_posix()}")
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.archive_path = root / "archive.db"
+        self.writer_engine = create_engine(f"sqlite:///{(root / 'index.db').as_posix()}")
+        configure_writer_engine(self.writer_engine)
+        self.writer = DatabaseWriter(sessionmaker(bind=self.writer_engine))
+        self.archiver = RecordArchiver(
+            self.engine, self.archive_path, max_age_days=365, batch_size=2, writer=self.writer
+        )
+
+        with self.session_factory() as db:
+            upsert_batch_applications(
+                db,
+                [
+                    batch("OLD-1", "Approved", "01-01-2020"),
+                    batch("OLD-2", "Rejected", "15-03-2021"),
+                    batch("OLD-3", "Approved", "20-04-2022"),
+                    batch("PENDING", "In Process", "01-01-2020"),
+                    batch("RECENT", "Approved", "01-03-2026"),
+                ],
+            )
+            db.commit()
+            upsert_stay_permits(
+                db,
+                [
+                    {"reg_number": "ITK-OLD", "expires_on": date(2024, 1, 1), "status": "Approved"},
+                    {"reg_number": "ITK-NEW", "expires_on": date(2026, 12, 1), "status": "Approved"},
+                ],
+            )
+            db.commit()
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        self.writer_engine.dispose()
+        self.engine.dispose()
+        self._tmp.cleanup()
+
+    def _keys(self, model, column) -> list[str]:
+        with self.session_factory() as db:
+            return sorted(value for (value,) in db.query(column))
+
+    def test_finished_old_records_move_to_archive_file(self) -> None:
+        moved = self.archiver.archive(today=date(2026, 6, 1))
+
+        self.assertEqual(moved, {"batch_applications": 3, "stay_permits": 1})
+        self.assertTrue(any("Архивация БД" in line for line in self.logs.output))
+        self.assertEqual(self._keys(BatchApplication, BatchApplication.register_number), ["PENDING", "RECENT"])
+        self.assertEqual(self._keys(StayPermit, StayPermit.reg_number), ["ITK-NEW"])
+        self.assertEqual(len(self._keys(ArchivedRecord, ArchivedRecord.register_number)), 4)
+
+        with sqlite3.connect(self.archive_path) as archive:
+            archived = sorted(row[0] for row in archive.execute("SELECT register_number FROM batch_applications"))
+        self.assertEqual(archived, ["OLD-1", "OLD-2", "OLD-3"])
+        self.assertEqual(self.archiver.archive(today=date(2026, 6, 1)), {"batch_applications": 0, "stay_permits": 0})
+
+    def test_rows_already_in_archive_are_only_deleted_on_retry(self) -> None:
+        with patch.object(self.writer, "run", side_effect=RuntimeError("crash before delete")):
+            with self.assertRaises(RuntimeError):
+                self.archiver.archive(today=date(2026, 6, 1))
+
+        self.archiver.archive(today=date(2026, 6, 1))
+
+        with sqlite3.connect(self.archive_path) as archive:
+            archived = sorted(row[0] for row in archive.execute("SELECT register_number FROM batch_applications"))
+        self.assertEqual(archived, ["OLD-1", "OLD-2", "OLD-3"])
+        self.assertEqual(self._keys(BatchApplication, BatchApplication.register_number), ["PENDING", "RECENT"])
+
+    def test_archived_records_are_not_reinserted_and_stay_searchable(self) -> None:
+        self.archiver.archive(today=date(2026, 6, 1))
+
+        with self.session_factory() as db:
+            upsert_batch_applications(db, [batch("OLD-1", "Approved", "01-01-2020"), batch("NEW", "In Process", "")])
+            db.commit()
+        self.assertEqual(self._keys(BatchApplication, BatchApplication.register_number), ["NEW", "PENDING", "RECENT"])
+
+        found = self.archiver.search(search_by_passport, "POLD201")
+        self.assertEqual([record.register_number for record in found], ["OLD-2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
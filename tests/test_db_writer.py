@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+import tempfile
+import threading
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from visascraper.database.db import configure_writer_engine
+from visascraper.database.executor import run_db
+from visascraper.database.models import Base, User
+from visascraper.database.writer import DatabaseWriter
+
+
+def add_user(db: Session, telegram_id: str) -> str:
+    db.add(User(telegram_id=telegram_id))
+    db.flush()
+    return telegram_id
+
+
+class DatabaseWriterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{(Path(self._tmp.name) / 'index.db').as_posix()}")
+        configure_writer_engine(self.engine)
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.writer = DatabaseWriter(self.session_factory)
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        self.engine.dispose()
+        self._tmp.cleanup()
+
+    def _telegram_ids(self) -> list[str]:
+        with self.session_factory() as db:
+            return sorted(telegram_id for (telegram_id,) in db.query(User.telegram_id))
+
+    def test_concurrent_writes_are_group_committed(self) -> None:
+        release = threading.Event()
+        blocker = self.writer.submit(lambda db: release.wait(5))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(self.writer.submit, add_user, f"user-{index:02d}") for index in range(40)]
+            submitted = [future.result() for future in futures]
+            release.set()
+            results = sorted(future.result(timeout=5) for future in submitted)
+
+        blocker.result(timeout=5)
+        self.assertEqual(results, [f"user-{index:02d}" for index in range(40)])
+        self.assertEqual(self._telegram_ids(), results)
+        self.assertLessEqual(self.writer.commits, 2)
+
+    def test_failed_job_is_rolled_back_alone(self) -> None:
+        release = threading.Event()
+        self.writer.submit(lambda db: release.wait(5))
+        first = self.writer.submit(add_user, "user-1")
+        duplicate = self.writer.submit(add_user, "user-1")
+        second = self.writer.submit(add_user, "user-2")
+        release.set()
+
+        self.assertEqual(first.result(timeout=5), "user-1")
+        self.assertEqual(second.result(timeout=5), "user-2")
+        with self.assertRaises(Exception):
+            duplicate.result(timeout=5)
+        self.assertEqual(self._telegram_ids(), ["user-1", "user-2"])
+
+
+def slow_query(delay: float) -> str:
+    threading.Event().wait(delay)
+    return threading.current_thread().name
+
+
+class RunDbTests(unittest.TestCase):
+    def test_blocking_call_runs_in_dedicated_pool(self) -> None:
+        async def scenario() -> tuple[str, int]:
+            ticks = 0
+
+            async def heartbeat() -> None:
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            task = asyncio.create_task(heartbeat())
+            thread_name = await run_db(slow_query, 0.2)
+            task.cancel()
+            return thread_name, ticks
+
+        thread_name, ticks = asyncio.run(scenario())
+        self.assertTrue(thread_name.startswith("db_"))
+        self.assertGreater(ticks, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
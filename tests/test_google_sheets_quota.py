@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import sys
+import threading
+import time
+import unittest
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from google.auth.credentials import Credentials
+
+from visascraper.infrasctructure.google_sheets import QuotaAwareHTTPClient, SharedGoogleClient, SheetsQuota, TokenBucket
+
+VALUES_URL = "https://sheets.googleapis.com/v4/spreadsheets/sheet-1/values:batchGet"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, payload: dict, headers: dict[str, str] | None = None) -> None:
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = headers or {}
+        self.text = str(payload)
+        self._payload = payload
+
+    def json(self) -> dict:
+        return self._payload
+
+
+class FakeSession:
+    def __init__(self, responses: list[FakeResponse], gate: threading.Event | None = None) -> None:
+        self.responses = responses
+        self.gate = gate
+        self.calls = 0
+
+    def request(self, **kwargs) -> FakeResponse:
+        self.calls += 1
+        if self.gate:
+            self.gate.wait(timeout=5)
+        return self.responses.pop(0)
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_requests_over_burst_are_spaced_to_the_per_minute_rate(self) -> None:
+        clock = FakeClock()
+        bucket = TokenBucket(per_minute=60, burst=2, clock=clock, sleep=clock.sleep)
+
+        waits = [bucket.acquire() for _ in range(4)]
+
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertEqual(clock.sleeps, [1.0, 1.0])
+
+    def test_penalty_postpones_next_request(self) -> None:
+        clock = FakeClock()
+        bucket = TokenBucket(per_minute=60, burst=5, clock=clock, sleep=clock.sleep)
+
+        bucket.penalize(30)
+
+        self.assertAlmostEqual(bucket.acquire(), 31.0)
+
+
+class QuotaAwareHTTPClientTests(unittest.TestCase):
+    def _client(self, session: FakeSession) -> tuple[QuotaAwareHTTPClient, FakeClock]:
+        clock = FakeClock()
+        client = QuotaAwareHTTPClient(auth=None, session=session)
+        client.quota = SheetsQuota(reads_per_minute=60, writes_per_minute=60, clock=clock, sleep=clock.sleep)
+        return client, clock
+
+    def test_rate_limited_request_waits_retry_after_and_succeeds(self) -> None:
+        session = FakeSession(
+            [
+                FakeResponse(429, {"error": {"code": 429, "message": "quota"}}, headers={"Retry-After": "20"}),
+                FakeResponse(200, {"valueRanges": []}),
+            ]
+        )
+        client, clock = self._client(session)
+
+        response = client.request("get", VALUES_URL, params={"ranges": ["A"]})
+
+        self.assertEqual(response.json(), {"valueRanges": []})
+        self.assertEqual(session.calls, 2)
+        self.assertGreaterEqual(clock.now, 20)
+
+    def test_non_retryable_error_is_raised_immediately(self) -> None:
+        session = FakeSession([FakeResponse(400, {"error": {"code": 400, "message": "bad range"}})])
+        client, _ = self._client(session)
+
+        with self.assertRaises(Exception):
+            client.request("post", VALUES_URL, json={})
+        self.assertEqual(session.calls, 1)
+
+    def test_identical_concurrent_reads_are_coalesced(self) -> None:
+        gate = threading.Event()
+        session = FakeSession([FakeResponse(200, {"values": [["a"]]})], gate=gate)
+        client, _ = self._client(session)
+        results: list[dict] = []
+
+        def read() -> None:
+            results.append(client.request("get", VALUES_URL, params={"ranges": ["A"]}).json())
+
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        threads[0].start()
+        while session.calls == 0:
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while client.quota.coalesced < 2:
+            time.sleep(0.001)
+        gate.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(session.calls, 1)
+        self.assertEqual(results, [{"values": [["a"]]}] * 3)
+
+
+class FakeCredentials(Credentials):
+    def __init__(self) -> None:
+        super().__init__()
+        self.refreshes = 0
+
+    def refresh(self, request) -> None:
+        self.refreshes += 1
+        self.token = f"token-{self.refreshes}"
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+
+class UnreachableCredentials(FakeCredentials):
+    def refresh(self, request) -> None:
+        self.refreshes += 1
+        raise ConnectionError("oauth2.googleapis.com unreachable")
+
+
+class SharedGoogleClientTests(unittest.TestCase):
+    def test_client_is_created_once_and_token_is_refreshed_ahead_of_expiry(self) -> None:
+        credentials = FakeCredentials()
+        factory_calls: list[int] = []
+
+        def factory() -> FakeCredentials:
+            factory_calls.append(1)
+            return credentials
+
+        shared = SharedGoogleClient(credentials_factory=factory, refresh_margin=timedelta(minutes=5))
+        try:
+            first = shared.get()
+            second = shared.get()
+
+            self.assertIs(first, second)
+            self.assertEqual(len(factory_calls), 1)
+            self.assertEqual(credentials.refreshes, 1)
+            self.assertIsInstance(first.http_client, QuotaAwareHTTPClient)
+            self.assertEqual(first.http_client.session.get_adapter("https://sheets.googleapis.com")._pool_maxsize, 8)
+            self.assertAlmostEqual(shared.next_refresh_delay(), 55 * 60, delta=5)
+        finally:
+            shared.close()
+
+    def test_failed_first_refresh_does_not_break_startup_or_background_refresh(self) -> None:
+        credentials = UnreachableCredentials()
+        shared = SharedGoogleClient(credentials_factory=lambda: credentials)
+        try:
+            first = shared.get()
+
+            self.assertIs(shared.get(), first)
+            self.assertEqual(credentials.refreshes, 1)
+            self.assertTrue(shared._refresher.is_alive())
+        finally:
+            shared.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from visascraper.database.models import Base
+from visascraper.database.writer import DatabaseWriter
+from visascraper.services.pdf_store import PDF_KIND_BATCH, PDFStore
+from visascraper.services.storage import PDFManager
+
+
+class FakeUploader:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, bool]] = []
+        self.failing = False
+
+    def upload_pdf(self, file_path: Path, filename: str, overwrite: bool = False) -> str:
+        self.calls.append((filename, overwrite))
+        if self.failing:
+            return ""
+        return f"https://disk.local/{filename}?v={len(self.calls)}"
+
+
+class FakePdfResponse:
+    def __init__(self, content: bytes, content_type: str = "application/pdf") -> None:
+        self.status_code = 200
+        self.headers = {"Content-Type": content_type}
+        self._content = content
+        self.closed = False
+
+    def iter_content(self, chunk_size: int | None = None):
+        step = chunk_size or 1
+        for offset in range(0, len(self._content), step):
+            yield self._content[offset : offset + step]
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakePdfSession:
+    def __init__(self, test: "PDFManagerLinkCacheTests") -> None:
+        self.test = test
+        self.responses: list[FakePdfResponse] = []
+
+    def get(self, url: str, **kwargs) -> FakePdfResponse:
+        self.test.assertTrue(kwargs.get("stream"))
+        self.test.downloads.append(url)
+        response = FakePdfResponse(self.test.content)
+        self.responses.append(response)
+        return response
+
+
+class PDFManagerLinkCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        engine = create_engine(f"sqlite:///{(root / 'index.db').as_posix()}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        self.writer = DatabaseWriter(session_factory)
+        self.store = PDFStore(root / "pdf", session_factory=session_factory, max_age=None, writer=self.writer)
+        self.uploader = FakeUploader()
+        self.manager = PDFManager(session_manager=None, yandex_uploader=self.uploader, store=self.store)
+        self.downloads: list[str] = []
+        self.content = b"%PDF-v1"
+        self.session = FakePdfSession(self)
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        self._tmp.cleanup()
+
+    def _upload(self) -> str:
+        return self.manager.upload_batch_pdf(self.session, "sid", "https://portal/print", "REG-1", "John Doe")
+
+    def test_cached_public_url_skips_download_and_yandex(self) -> None:
+        first = self._upload()
+        second = self._upload()
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.downloads), 1)
+        self.assertEqual(self.uploader.calls, [("REG-1_batch_application.pdf", False)])
+
+    def test_stale_pdf_is_refreshed_only_while_application_is_pending(self) -> None:
+        self.store.max_age = timedelta(0)
+
+        for status in ("In Process", "In Process", "Approved", "Approved"):
+            self.manager.upload_batch_pdf(self.session, "sid", "https://portal/print", "REG-1", "John Doe", status=status)
+
+        self.assertEqual(len(self.downloads), 2)
+
+    def test_download_is_streamed_into_store_and_response_closed(self) -> None:
+        self.content = b"%PDF-" + b"x" * 200_000
+
+        stored = self.manager.download_pdf(self.session, "sid", "https://portal/print", PDF_KIND_BATCH, "REG-1")
+
+        self.assertEqual(stored.size, len(self.content))
+        self.assertEqual(stored.path.read_bytes(), self.content)
+        self.assertTrue(self.session.responses[0].closed)
+        self.assertEqual(list(stored.path.parent.glob("*.part")), [])
+
+    def test_non_pdf_response_is_not_stored(self) -> None:
+        self.session.get = lambda url, **kwargs: FakePdfResponse(b"<html>", content_type="text/html")
+
+        stored = self.manager.download_pdf(self.session, "sid", "https://portal/print", PDF_KIND_BATCH, "REG-1")
+
+        self.assertIsNone(stored)
+        self.assertIsNone(self.store.lookup(PDF_KIND_BATCH, "REG-1"))
+
+    def test_empty_pdf_response_keeps_previous_copy(self) -> None:
+        first = self._upload()
+        self.content = b""
+
+        stored = self.manager.download_pdf(self.session, "sid", "https://portal/print", PDF_KIND_BATCH, "REG-1")
+
+        self.assertIsNone(stored)
+        kept = self.store.lookup(PDF_KIND_BATCH, "REG-1")
+        self.assertEqual(kept.path.read_bytes(), b"%PDF-v1")
+        self.assertEqual(kept.remote_url, first)
+        self.assertFalse(kept.needs_overwrite)
+        self.assertEqual(list(kept.path.parent.glob("*.part")), [])
+
+    def test_changed_document_is_reuploaded_with_overwrite(self) -> None:
+        first = self._upload()
+
+        replaced = self.store.put(PDF_KIND_BATCH, "REG-1", b"%PDF-v2")
+        link = self.manager._upload(replaced)
+
+        self.assertNotEqual(first, link)
+        self.assertEqual(self.uploader.calls[-1], ("REG-1_batch_application.pdf", True))
+        self.assertEqual(self.store.get_remote_url(PDF_KIND_BATCH, "REG-1"), link)
+
+    def test_failed_overwrite_is_retried_as_overwrite(self) -> None:
+        self._upload()
+        self.store.put(PDF_KIND_BATCH, "REG-1", b"%PDF-v2")
+        self.uploader.failing = True
+
+        self.assertEqual(self.manager._upload(self.store.lookup(PDF_KIND_BATCH, "REG-1")), "")
+        self.uploader.failing = False
+        link = self.manager._upload(self.store.lookup(PDF_KIND_BATCH, "REG-1"))
+
+        self.assertEqual(self.uploader.calls[-2:], [("REG-1_batch_application.pdf", True)] * 2)
+        self.assertEqual(self.store.get_remote_url(PDF_KIND_BATCH, "REG-1"), link)
+        self.assertFalse(self.store.lookup(PDF_KIND_BATCH, "REG-1").needs_overwrite)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from visascraper.database.models import Base, BatchApplication, PdfDocument
+from visascraper.database.writer import DatabaseWriter
+from visascraper.services.pdf_store import PDF_KIND_BATCH, PDF_KIND_STAY, PDFStore
+
+
+class PDFStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        engine = create_engine(f"sqlite:///{(self.root / 'index.db').as_posix()}")
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.writer = DatabaseWriter(self.session_factory)
+        self.store = PDFStore(
+            self.root / "pdf", session_factory=self.session_factory, max_age=timedelta(hours=1), writer=self.writer
+        )
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        self._tmp.cleanup()
+
+    def test_put_and_lookup_by_register_number(self) -> None:
+        stored = self.store.put(PDF_KIND_BATCH, "REG-1", b"%PDF-1", source_url="https://portal/1")
+
+        found = self.store.lookup(PDF_KIND_BATCH, "REG-1")
+
+        self.assertIsNotNone(found)
+        self.assertEqual(found.content_hash, stored.content_hash)
+        self.assertEqual(found.size, 6)
+        self.assertEqual(found.path.read_bytes(), b"%PDF-1")
+        self.assertEqual(found.filename, "REG-1_batch_application.pdf")
+        self.assertIsNone(self.store.lookup(PDF_KIND_STAY, "REG-1"))
+
+    def test_index_writes_go_through_the_writer(self) -> None:
+        read_only = create_engine(f"sqlite:///file:{(self.root / 'index.db').as_posix()}?mode=ro&uri=true")
+        self.addCleanup(read_only.dispose)
+        store = PDFStore(self.root / "pdf", session_factory=sessionmaker(bind=read_only), writer=self.writer)
+
+        store.put(PDF_KIND_BATCH, "REG-1", b"%PDF-1")
+        self.assertTrue(store.set_remote_url(PDF_KIND_BATCH, "REG-1", "https://disk/1"))
+        self.assertIsNotNone(store.lookup(PDF_KIND_BATCH, "REG-1"))
+        store.enforce_limits()
+
+        self.assertEqual(store.get_remote_url(PDF_KIND_BATCH, "REG-1"), "https://disk/1")
+
+    def test_identical_content_is_stored_once(self) -> None:
+        first = self.store.put(PDF_KIND_BATCH, "REG-1", b"same")
+        second = self.store.put(PDF_KIND_STAY, "REG-2", b"same")
+
+        self.assertEqual(first.path, second.path)
+        self.assertEqual(len(list((self.root / "pdf").glob("*.pdf"))), 1)
+
+    def test_changed_content_resets_remote_url_and_drops_old_blob(self) -> None:
+        first = self.store.put(PDF_KIND_BATCH, "REG-1", b"v1")
+        self.store.set_remote_url(PDF_KIND_BATCH, "REG-1", "https://disk/v1")
+        self.assertEqual(self.store.lookup(PDF_KIND_BATCH, "REG-1").remote_url, "https://disk/v1")
+
+        second = self.store.put(PDF_KIND_BATCH, "REG-1", b"v2")
+
+        self.assertNotEqual(first.content_hash, second.content_hash)
+        self.assertIsNone(second.remote_url)
+        self.assertTrue(second.needs_overwrite)
+        self.assertFalse(first.path.exists())
+
+    def test_link_for_outdated_upload_is_not_saved(self) -> None:
+        first = self.store.put(PDF_KIND_BATCH, "REG-1", b"v1")
+        self.store.put(PDF_KIND_BATCH, "REG-1", b"v2")
+
+        saved = self.store.set_remote_url(PDF_KIND_BATCH, "REG-1", "https://disk/v1", first.content_hash)
+
+        self.assertFalse(saved)
+        self.assertIsNone(self.store.get_remote_url(PDF_KIND_BATCH, "REG-1"))
+        self.assertTrue(self.store.lookup(PDF_KIND_BATCH, "REG-1").needs_overwrite)
+
+    def test_is_fresh_respects_max_age(self) -> None:
+        stored = self.store.put(PDF_KIND_BATCH, "REG-1", b"v1")
+        self.assertTrue(self.store.is_fresh(stored))
+
+        with self.session_factory() as db:
+            record = db.query(PdfDocument).one()
+            record.fetched_at = datetime.now() - timedelta(hours=2)
+            db.commit()
+
+        self.assertFalse(self.store.is_fresh(self.store.lookup(PDF_KIND_BATCH, "REG-1")))
+
+
+class PDFCacheEvictionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        engine = create_engine(f"sqlite:///{(self.root / 'index.db').as_posix()}")
+        Base.metadata.create_all(bind=engine)
+        self.session_factory = sessionmaker(bind=engine)
+        self.writer = DatabaseWriter(self.session_factory)
+        self.store = PDFStore(self.root / "pdf", session_factory=self.session_factory, max_bytes=10, writer=self.writer)
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        self._tmp.cleanup()
+
+    def _set_last_access(self, register_number: str, accessed_at: datetime) -> None:
+        with self.session_factory() as db:
+            record = db.query(PdfDocument).filter(PdfDocument.register_number == register_number).one()
+            record.last_accessed_at = accessed_at
+            db.commit()
+
+    def _add_batch(self, register_number: str, status: str) -> None:
+        with self.session_factory() as db:
+            db.add(BatchApplication(register_number=register_number, status=status))
+            db.commit()
+
+    def test_least_recently_used_files_are_evicted_over_budget(self) -> None:
+        now = datetime.now()
+        for index, register_number in enumerate(("REG-1", "REG-2", "REG-3")):
+            self._add_batch(register_number, "Approved")
+            self.store.put(PDF_KIND_BATCH, register_number, f"{index}-abcd".encode())
+            self._set_last_access(register_number, now - timedelta(hours=10 - index))
+
+        stats = self.store.enforce_limits(now=now)
+
+        self.assertEqual(stats.evicted_files, 2)
+        self.assertEqual(stats.cached_files, 1)
+        self.assertIsNone(self.store.lookup(PDF_KIND_BATCH, "REG-1"))
+        self.assertIsNone(self.store.lookup(PDF_KIND_BATCH, "REG-2"))
+        self.assertIsNotNone(self.store.lookup(PDF_KIND_BATCH, "REG-3"))
+        self.assertIsNotNone(self.store.get_entry(PDF_KIND_BATCH, "REG-1"))
+
+    def test_pending_and_recently_used_files_are_pinned(self) -> None:
+        now = datetime.now()
+        self.store.pin_window = timedelta(hours=1)
+        self._add_batch("REG-PENDING", "In Process")
+        self._add_batch("REG-RECENT", "Approved")
+        self._add_batch("REG-OLD", "Approved")
+        self.store.put(PDF_KIND_BATCH, "REG-PENDING", b"pending-pdf")
+        self.store.put(PDF_KIND_BATCH, "REG-RECENT", b"recent-pdf")
+        self.store.put(PDF_KIND_BATCH, "REG-OLD", b"old-pdf")
+        self._set_last_access("REG-PENDING", now - timedelta(days=5))
+        self._set_last_access("REG-OLD", now - timedelta(days=5))
+
+        stats = self.store.enforce_limits(now=now)
+
+        self.assertEqual(stats.pinned_files, 2)
+        self.assertIsNone(self.store.lookup(PDF_KIND_BATCH, "REG-OLD"))
+        self.assertIsNotNone(self.store.lookup(PDF_KIND_BATCH, "REG-PENDING"))
+        self.assertIsNotNone(self.store.lookup(PDF_KIND_BATCH, "REG-RECENT"))
+
+    def test_idle_files_are_evicted_and_stats_track_hits(self) -> None:
+        now = datetime.now()
+        self.store.max_bytes = None
+        self.store.max_idle = timedelta(days=30)
+        self._add_batch("REG-1", "Approved")
+        self.store.put(PDF_KIND_BATCH, "REG-1", b"pdf")
+        self.assertIsNotNone(self.store.lookup(PDF_KIND_BATCH, "REG-1"))
+        self._set_last_access("REG-1", now - timedelta(days=31))
+
+        self.store.enforce_limits(now=now)
+        self.assertIsNone(self.store.lookup(PDF_KIND_BATCH, "REG-1"))
+
+        stats = self.store.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.evicted_files), (1, 1, 1))
+        self.store.put(PDF_KIND_BATCH, "REG-1", b"pdf")
+        self.assertIsNotNone(self.store.lookup(PDF_KIND_BATCH, "REG-1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
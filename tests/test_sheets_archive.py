@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from datetime import date
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from visascraper.database.models import Base
+from visascraper.database.writer import DatabaseWriter
+from visascraper.dto import BATCH_APPLICATION_HEADERS, BATCH_MANAGER_HEADERS, STAY_PERMIT_HEADERS
+from visascraper.services.sheet_snapshots import SheetSnapshotStore
+from visascraper.services.sheets import GoogleSheetsManager
+from visascraper.services.sheets_archive import ARCHIVE_RULES_BY_TITLE, ArchivedRowStore, SheetsArchiver
+from visascraper.utils.sheets_rotator import ActiveSpreadsheet
+
+
+class _Worksheet:
+    def __init__(self, sheet_id: int, title: str) -> None:
+        self.id = sheet_id
+        self.title = title
+        self.row_count = 1000
+        self.col_count = 26
+
+
+def batch_row(register_number: str, payment_date: str, status: str) -> list[str]:
+    return ["B-1", register_number, "John Doe", "", "", "P-1", payment_date, "C1", status, "", "acc-1"]
+
+
+class SheetsArchiverTests(unittest.TestCase):
+    titles = ["Batch Application", "Batch Application(Manager)", "StayPermit"]
+
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"sqlite:///{(Path(self._tmp.name) / 'index.db').as_posix()}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        self.writer = DatabaseWriter(session_factory)
+        self.store = ArchivedRowStore(session_factory=session_factory, writer=self.writer)
+        with patch.object(GoogleSheetsManager, "_init_client", return_value=Mock()):
+            self.manager = GoogleSheetsManager(
+                snapshots=SheetSnapshotStore(session_factory=session_factory, writer=self.writer),
+                archived_rows=self.store,
+            )
+
+        self.old_row = batch_row("REG-OLD", "01-01-2026", "Approved")
+        self.recent_row = batch_row("REG-NEW", "01-10-2026", "Approved")
+        self.pending_row = batch_row("REG-PENDING", "01-01-2026", "In Process")
+        self.hot = Mock()
+        self.hot.get_lastUpdateTime.return_value = "2026-10-18T00:00:00.000Z"
+        self.hot.values_batch_get.return_value = {
+            "valueRanges": [
+                {"values": [BATCH_APPLICATION_HEADERS, self.recent_row, self.pending_row, self.old_row]},
+                {"values": [BATCH_MANAGER_HEADERS]},
+                {"values": [STAY_PERMIT_HEADERS]},
+            ]
+        }
+        self.active = ActiveSpreadsheet(
+            id="hot",
+            spreadsheet=self.hot,
+            worksheets={title: _Worksheet(index, title) for index, title in enumerate(self.titles)},
+        )
+        self.archive = ActiveSpreadsheet(
+            id="archive",
+            spreadsheet=Mock(),
+            worksheets={"Batch Application": _Worksheet(0, "Batch Application")},
+        )
+        self.archiver = SheetsArchiver(store=self.store, max_age_days=90)
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        self._tmp.cleanup()
+
+    def _archive(self) -> int:
+        with patch("visascraper.services.sheets_archive.resolve_active_spreadsheet", return_value=self.active), patch(
+            "visascraper.services.sheets_archive.resolve_archive_spreadsheet", return_value=self.archive
+        ):
+            return self.archiver.archive(self.manager, today=date(2026, 10, 18))
+
+    def test_finished_old_rows_move_to_archive_and_stay_out_of_hot_sheet(self) -> None:
+        self.assertEqual(self._archive(), 1)
+
+        self.archive.spreadsheet.values_append.assert_called_once()
+        self.assertEqual(self.archive.spreadsheet.values_append.call_args.kwargs["body"], {"values": [self.old_row]})
+        body = self.hot.values_batch_update.call_args.args[0]
+        self.assertEqual(body["data"], [{"range": "'Batch Application'!A4", "values": [[""] * len(self.old_row)]}])
+
+        sync = self.manager._worksheet_syncs([self.old_row, self.recent_row], [], [])[0]
+        self.assertTrue(sync.drop_row(self.old_row))
+        self.assertFalse(sync.drop_row(self.recent_row))
+
+        self.hot.values_batch_get.return_value["valueRanges"][0]["values"].remove(self.old_row)
+        self.assertEqual(self._archive(), 0)
+        self.archive.spreadsheet.values_append.assert_called_once()
+
+    def test_rows_recorded_before_an_interrupted_run_are_not_appended_twice(self) -> None:
+        self.store.add(ARCHIVE_RULES_BY_TITLE["Batch Application"], [self.old_row], "archive")
+
+        self.assertEqual(self._archive(), 1)
+
+        self.archive.spreadsheet.values_append.assert_not_called()
+        self.hot.values_batch_update.assert_called_once()
+
+    def test_rows_are_matched_by_register_number_only(self) -> None:
+        rule = ARCHIVE_RULES_BY_TITLE["Batch Application(Manager)"]
+        archived = ["John Doe", "C1", "01-01-2026", "Approved", "", "acc-1", "00123"]
+        twin = ["John Doe", "C1", "01-01-2026", "Approved", "", "acc-1", "00124"]
+        self.store.add(rule, [archived], "archive")
+
+        sync = self.manager._worksheet_syncs([], [archived, twin], [])[1]
+        self.assertTrue(sync.drop_row(["John Doe", "C1", "1/1/2026", "Approved", "", "acc-1", "123"]))
+        self.assertFalse(sync.drop_row(twin))
+        self.assertFalse(sync.drop_row(archived[:-1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
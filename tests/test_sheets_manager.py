@@ -1,14 +1,47 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
+import random
 import sys
+import tempfile
 import unittest
+from unittest.mock import Mock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
 
 SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
 if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
-from visascraper.services.sheets import GoogleSheetsManager
+from visascraper.database.models import Base, SheetSnapshot
+from visascraper.database.writer import DatabaseWriter
+from visascraper.dto import BATCH_APPLICATION_HEADERS, BATCH_MANAGER_HEADERS, STAY_PERMIT_HEADERS
+from visascraper.services.sheet_snapshots import SheetSnapshotStore
+from visascraper.services.sheets import GoogleSheetsManager, SheetsStreamWriter, WorksheetDiff
+from visascraper.services.sheets_archive import ArchivedRowStore
+from visascraper.utils.sheets_rotator import ActiveSpreadsheet, ExistingSpreadsheetRequiredError
+
+
+def apply_diff(grid: list[list[str]], diff: WorksheetDiff) -> list[list[str]]:
+    grid = [list(row) for row in grid]
+    for request in diff.structural_requests:
+        if "deleteDimension" in request:
+            dimension = request["deleteDimension"]["range"]
+            del grid[dimension["startIndex"] : dimension["endIndex"]]
+        elif "insertDimension" in request:
+            dimension = request["insertDimension"]["range"]
+            for _ in range(dimension["endIndex"] - dimension["startIndex"]):
+                grid.insert(dimension["startIndex"], [])
+        elif "appendDimension" in request:
+            grid.extend([] for _ in range(request["appendDimension"]["length"]))
+    for start_row, rows in diff.value_ranges:
+        for offset, row in enumerate(rows):
+            target = grid[start_row - 1 + offset]
+            target.extend([""] * (len(row) - len(target)))
+            target[: len(row)] = row
+    return [GoogleSheetsManager._trim_row(row) for row in grid if GoogleSheetsManager._trim_row(row)]
 
 
 class GoogleSheetsManagerTests(unittest.TestCase):
@@ -48,6 +81,366 @@ class GoogleSheetsManagerTests(unittest.TestCase):
 
         self.assertEqual(final_rows[1], ["", "acc-1"])
 
+    def test_manager_and_stay_status_changes_are_updated_in_place(self) -> None:
+        with patch.object(GoogleSheetsManager, "_init_client", return_value=Mock()):
+            manager = GoogleSheetsManager(snapshots=Mock(), archived_rows=Mock(matcher=Mock(return_value=None)))
+        manager_row = ["Jane", "C1", "01-02-2026", "In Process", "", "acc-1", "REG-1"]
+        stay_row = ["Jane", "ITK", "C1", "", "", "2027-01-01", "In Process", "", "P-1", "acc-1", "ITK-1"]
+        for sync, row, status_index in zip(manager._worksheet_syncs([], [], [])[1:], (manager_row, stay_row), (3, 6)):
+            existing = [sync.header, ["Other", *row[1:-1], "REG-0"], row]
+            final = [list(existing[0]), existing[1], list(row)]
+            final[2][status_index] = "Approved"
+            self.assertEqual(
+                GoogleSheetsManager._row_key(row, sync.key_indexes), GoogleSheetsManager._row_key(final[2], sync.key_indexes)
+            )
+
+            diff = GoogleSheetsManager._plan_worksheet_diff(existing, final, sync.key_indexes, sheet_id=1, row_count=3)
+
+            self.assertEqual(diff.structural_requests, [])
+            self.assertEqual(diff.value_ranges, [(3, [final[2]])])
+
+    def test_streamed_run_over_unchanged_data_writes_nothing(self) -> None:
+        with patch.object(GoogleSheetsManager, "_init_client", return_value=Mock()):
+            manager = GoogleSheetsManager(snapshots=Mock(), archived_rows=Mock(matcher=Mock(return_value=None)))
+        rng = random.Random(7)
+        accounts = [f"acc-{index}" for index in range(4)]
+        batch_rows = {
+            account: [
+                ["B", f"REG-{account}-{index}", "Name", "", "", "P", f"{rng.randint(1, 28):02d}-03-2026", "C1", "New", "", account]
+                for index in range(100)
+            ]
+            for account in accounts
+        }
+
+        def compose(existing: list[list[str]], rows: list[list[str]], replace: set[str]) -> tuple[list[list[str]], WorksheetDiff]:
+            sync = manager._worksheet_syncs(rows, [], [])[0]
+            final = GoogleSheetsManager._compose_final_rows(
+                existing,
+                sync.header,
+                sync.incoming_rows,
+                sync.preserve_account_index,
+                replace,
+                key_indexes=sync.key_indexes,
+                sort_key=sync.sort_key,
+            )
+            diff = GoogleSheetsManager._plan_worksheet_diff(existing, final, sync.key_indexes, 0, len(existing))
+            return final, diff
+
+        sheet, _ = compose([BATCH_APPLICATION_HEADERS], sum(batch_rows.values(), []), set(accounts))
+        for account in accounts:
+            final, diff = compose(sheet, batch_rows[account], {account})
+            self.assertTrue(diff.is_empty, account)
+            self.assertEqual(final, sheet)
+
+
+class WorksheetDiffTests(unittest.TestCase):
+    header = ["Reg", "Status", "Account"]
+
+    def _plan(self, existing: list[list[str]], final: list[list[str]], row_count: int | None = None) -> WorksheetDiff:
+        return GoogleSheetsManager._plan_worksheet_diff(
+            existing_rows=existing,
+            final_rows=final,
+            key_indexes=(0, 2),
+            sheet_id=7,
+            row_count=len(existing) if row_count is None else row_count,
+        )
+
+    def test_unchanged_sheet_produces_no_requests(self) -> None:
+        rows = [self.header, ["R1", "New", "acc"], ["R2", "Approved", "acc"]]
+        self.assertTrue(self._plan(rows, [list(row) for row in rows]).is_empty)
+
+    def test_status_change_updates_single_row(self) -> None:
+        existing = [self.header, ["R1", "New", "acc"], ["R2", "New", "acc"], ["R3", "New", "acc"]]
+        final = [self.header, ["R1", "New", "acc"], ["R2", "Approved", "acc"], ["R3", "New", "acc"]]
+
+        diff = self._plan(existing, final)
+
+        self.assertEqual(diff.structural_requests, [])
+        self.assertEqual(diff.value_ranges, [(3, [["R2", "Approved", "acc"]])])
+
+    def test_insert_in_the_middle_shifts_rows_structurally(self) -> None:
+        existing = [self.header, ["R1", "New", "acc"], ["R3", "New", "acc"]]
+        final = [self.header, ["R1", "New", "acc"], ["R2", "New", "acc"], ["R3", "New", "acc"]]
+
+        diff = self._plan(existing, final, row_count=1000)
+
+        self.assertEqual(len(diff.structural_requests), 1)
+        self.assertIn("insertDimension", diff.structural_requests[0])
+        self.assertEqual(diff.value_ranges, [(3, [["R2", "New", "acc"]])])
+
+    def test_removed_tail_rows_are_blanked_instead_of_deleted(self) -> None:
+        existing = [self.header, ["R1", "New", "acc"], ["R2", "New", "acc"]]
+        final = [self.header]
+
+        diff = self._plan(existing, final)
+
+        self.assertEqual(diff.structural_requests, [])
+        self.assertEqual(apply_diff(existing, diff), final)
+
+    def test_random_diffs_reproduce_final_layout(self) -> None:
+        rng = random.Random(42)
+        keys = [f"R{index}" for index in range(30)]
+        for _ in range(200):
+            existing = [self.header] + [
+                [key, rng.choice(["New", "Approved"]), rng.choice(["a", "b"])]
+                for key in rng.sample(keys, rng.randint(0, 15))
+            ]
+            final = [self.header] + [
+                [key, rng.choice(["New", "Approved"]), rng.choice(["a", "b"])]
+                for key in rng.sample(keys, rng.randint(0, 15))
+            ]
+            row_count = len(existing) + rng.randint(0, 3)
+            grid = existing + [[] for _ in range(row_count - len(existing))]
+
+            diff = self._plan(existing, final, row_count=row_count)
+
+            self.assertEqual(apply_diff(grid, diff), final)
+
+
+class _Worksheet:
+    def __init__(self, sheet_id: int, title: str) -> None:
+        self.id = sheet_id
+        self.title = title
+        self.row_count = 1000
+        self.col_count = 26
+
+
+class BatchedWorksheetSyncTests(unittest.TestCase):
+    titles = ["Batch Application", "Batch Application(Manager)", "StayPermit"]
+
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"sqlite:///{(Path(self._tmp.name) / 'index.db').as_posix()}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        self.writer = DatabaseWriter(session_factory)
+        self.snapshots = SheetSnapshotStore(session_factory=session_factory, writer=self.writer)
+        self.archived_rows = ArchivedRowStore(session_factory=session_factory, writer=self.writer)
+        self.spreadsheet = Mock()
+        self.spreadsheet.get_lastUpdateTime.return_value = "2026-01-01T00:00:00.000Z"
+        self.spreadsheet.values_batch_get.return_value = {
+            "valueRanges": [
+                {"values": [BATCH_APPLICATION_HEADERS]},
+                {"values": [BATCH_MANAGER_HEADERS]},
+                {},
+            ]
+        }
+        self.active = ActiveSpreadsheet(
+            id="sheet-123",
+            spreadsheet=self.spreadsheet,
+            worksheets={title: _Worksheet(index, title) for index, title in enumerate(self.titles)},
+        )
+        with patch.object(GoogleSheetsManager, "_init_client", return_value=Mock()):
+            self.manager = GoogleSheetsManager(snapshots=self.snapshots, archived_rows=self.archived_rows)
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        self._tmp.cleanup()
+
+    def _row(self, width: int, account_index: int, account: str, marker: str) -> list[str]:
+        row = [marker] * width
+        row[account_index] = account
+        return row
+
+    def _write(self, stay_marker: str = "stay") -> None:
+        with patch("visascraper.services.sheets.resolve_active_spreadsheet", return_value=self.active):
+            self.manager.write_to_sheet(
+                [self._row(len(BATCH_APPLICATION_HEADERS), 10, "acc-1", "")],
+                [self._row(len(BATCH_MANAGER_HEADERS), 5, "acc-1", "")],
+                [self._row(len(STAY_PERMIT_HEADERS), 9, "acc-1", stay_marker)],
+            )
+
+    def test_all_worksheets_are_read_and_written_in_single_batches(self) -> None:
+        self._write()
+
+        self.spreadsheet.values_batch_get.assert_called_once_with(
+            ["'Batch Application'", "'Batch Application(Manager)'", "'StayPermit'"]
+        )
+        self.spreadsheet.batch_update.assert_not_called()
+        self.spreadsheet.values_batch_update.assert_called_once()
+        body = self.spreadsheet.values_batch_update.call_args.args[0]
+        self.assertEqual(body["valueInputOption"], "USER_ENTERED")
+        self.assertEqual(
+            [item["range"] for item in body["data"]],
+            ["'Batch Application'!A2", "'Batch Application(Manager)'!A2", "'StayPermit'!A1"],
+        )
+
+    def _serve_written_rows(self) -> None:
+        with self.snapshots.session_factory() as db:
+            rows = {record.title: json.loads(record.rows) for record in db.query(SheetSnapshot)}
+        self.spreadsheet.values_batch_get.return_value = {
+            "valueRanges": [{"values": rows[title]} for title in self.titles]
+        }
+
+    def test_unmodified_spreadsheet_is_merged_against_local_snapshot(self) -> None:
+        self._write()
+        self._serve_written_rows()
+        self.spreadsheet.values_batch_update.reset_mock()
+
+        # После нашей записи свежесть таблицы неизвестна: листы перечитываются.
+        self._write()
+        self.assertEqual(self.spreadsheet.values_batch_get.call_count, 2)
+        self.spreadsheet.values_batch_update.assert_not_called()
+
+        with patch.object(self.snapshots, "save") as save:
+            self._write()
+        self.assertEqual(self.spreadsheet.values_batch_get.call_count, 2)
+        save.assert_not_called()
+
+        self._write(stay_marker="changed")
+        self.assertEqual(self.spreadsheet.values_batch_get.call_count, 2)
+        body = self.spreadsheet.values_batch_update.call_args.args[0]
+        self.assertEqual([item["range"] for item in body["data"]], ["'StayPermit'!A2"])
+
+    def test_edit_after_our_write_is_not_absorbed_into_snapshot(self) -> None:
+        self._write()
+        self._serve_written_rows()
+        self.spreadsheet.get_lastUpdateTime.return_value = "2026-01-01T00:05:00.000Z"
+
+        self._write()
+
+        self.assertEqual(self.spreadsheet.values_batch_get.call_count, 2)
+
+    def _last_revision_by(self, email: str) -> None:
+        self.manager.gc.http_client.auth.service_account_email = "bot@project.iam.gserviceaccount.com"
+        self.manager.gc.http_client.request.return_value.json.return_value = {
+            "modifiedTime": "2026-01-01T00:10:00.000Z",
+            "lastModifyingUser": {"emailAddress": email},
+        }
+
+    def test_snapshot_after_own_write_is_reused(self) -> None:
+        self._last_revision_by("bot@project.iam.gserviceaccount.com")
+        self._write()
+        self.spreadsheet.get_lastUpdateTime.return_value = "2026-01-01T00:10:00.000Z"
+
+        self._write(stay_marker="changed")
+
+        self.spreadsheet.values_batch_get.assert_called_once()
+        body = self.spreadsheet.values_batch_update.call_args.args[0]
+        self.assertEqual([item["range"] for item in body["data"]], ["'StayPermit'!A2"])
+
+    def test_snapshot_after_foreign_revision_is_not_reused(self) -> None:
+        self._last_revision_by("manager@example.com")
+        self._write()
+        self._serve_written_rows()
+        self.spreadsheet.get_lastUpdateTime.return_value = "2026-01-01T00:10:00.000Z"
+
+        self._write()
+
+        self.assertEqual(self.spreadsheet.values_batch_get.call_count, 2)
+
+    def test_failed_batch_falls_back_to_isolated_per_sheet_writes(self) -> None:
+        headers = {
+            "'Batch Application'": {"values": [BATCH_APPLICATION_HEADERS]},
+            "'Batch Application(Manager)'": {"values": [BATCH_MANAGER_HEADERS]},
+            "'StayPermit'": {},
+        }
+        self.spreadsheet.values_batch_get.side_effect = lambda ranges: {
+            "valueRanges": [headers[name] for name in ranges]
+        }
+        written: list[str] = []
+
+        def values_batch_update(body: dict) -> None:
+            ranges = [item["range"] for item in body["data"]]
+            if any(name.startswith("'StayPermit'") for name in ranges):
+                raise RuntimeError("StayPermit is protected")
+            written.extend(ranges)
+
+        self.spreadsheet.values_batch_update.side_effect = values_batch_update
+
+        with patch("visascraper.services.sheets.time.sleep") as sleep:
+            with self.assertRaisesRegex(RuntimeError, "protected"):
+                self._write()
+
+        self.assertEqual(sorted(written), ["'Batch Application'!A2", "'Batch Application(Manager)'!A2"])
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_failed_refresh_after_batch_error_still_retries_per_sheet(self) -> None:
+        self.spreadsheet.values_batch_update.side_effect = [RuntimeError("batch failed"), None, None, None]
+
+        def resolve(gc, refresh: bool = False) -> ActiveSpreadsheet:
+            if refresh:
+                raise ExistingSpreadsheetRequiredError("index unavailable")
+            return self.active
+
+        with patch("visascraper.services.sheets.resolve_active_spreadsheet", side_effect=resolve), self.assertLogs(
+            "visascraper", level="ERROR"
+        ) as logs:
+            self.manager.write_to_sheet(
+                [self._row(len(BATCH_APPLICATION_HEADERS), 10, "acc-1", "")],
+                [self._row(len(BATCH_MANAGER_HEADERS), 5, "acc-1", "")],
+                [self._row(len(STAY_PERMIT_HEADERS), 9, "acc-1", "stay")],
+            )
+
+        self.assertEqual(self.spreadsheet.values_batch_update.call_count, 4)
+        self.assertIn("batch failed", logs.output[0])
+        self.assertIn("index unavailable", logs.output[0])
+
+
+class SheetsStreamWriterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.manager = Mock()
+        self.writer = SheetsStreamWriter(self.manager, min_interval=60, max_pending_rows=3, clock=lambda: self.now)
+
+    def test_accounts_finished_within_interval_are_coalesced(self) -> None:
+        self.writer.add("acc-1", [["b1", "acc-1"]], [], [])
+        self.manager.write_to_sheet.assert_called_once_with([["b1", "acc-1"]], [], [])
+
+        self.now = 10
+        self.writer.add("acc-2", [["b2", "acc-2"]], [], [])
+        self.now = 20
+        self.writer.add("acc-3", [], [], [["s3", "acc-3"]])
+        self.assertEqual(self.manager.write_to_sheet.call_count, 1)
+
+        self.now = 61
+        self.writer.add("acc-4", [], [["m4", "acc-4"]], [])
+        self.manager.write_to_sheet.assert_called_with([["b2", "acc-2"]], [["m4", "acc-4"]], [["s3", "acc-3"]])
+        self.assertEqual(self.writer.pending_rows, 0)
+
+    def test_pending_rows_limit_forces_flush(self) -> None:
+        self.writer.add("acc-1", [], [], [])
+        self.writer.add("acc-2", [["b"]] * 3, [], [])
+
+        self.assertEqual(self.manager.write_to_sheet.call_count, 1)
+        self.assertEqual(self.writer.pending_rows, 0)
+
+    def test_failed_flush_keeps_rows_until_close(self) -> None:
+        self.manager.write_to_sheet.side_effect = [RuntimeError("quota"), None]
+
+        self.writer.add("acc-1", [["b1", "acc-1"]], [], [])
+        self.assertEqual(self.writer.pending_rows, 1)
+
+        self.writer.close()
+        self.manager.write_to_sheet.assert_called_with([["b1", "acc-1"]], [], [])
+        self.assertEqual(self.writer.pending_rows, 0)
+
+    def test_failed_flush_suspends_intermediate_writes_until_close(self) -> None:
+        self.manager.write_to_sheet.side_effect = [RuntimeError("503"), None]
+
+        self.writer.add("acc-1", [["b1", "acc-1"]], [], [])
+        self.now = 61
+        self.writer.add("acc-2", [["b2", "acc-2"]] * 2, [], [])
+        self.assertEqual(self.manager.write_to_sheet.call_count, 1)
+        self.assertEqual(self.writer.pending_rows, 3)
+
+        self.writer.close()
+        self.manager.write_to_sheet.assert_called_with([["b1", "acc-1"]] + [["b2", "acc-2"]] * 2, [], [])
+
+    def test_suspended_writer_retries_once_limit_is_reached_again(self) -> None:
+        self.manager.write_to_sheet.side_effect = [RuntimeError("503"), None, None]
+
+        self.writer.add("acc-1", [["b1", "acc-1"]], [], [])
+        self.writer.add("acc-2", [["b2", "acc-2"]] * 2, [], [])
+        self.assertEqual(self.manager.write_to_sheet.call_count, 1)
+
+        self.writer.add("acc-3", [["b3", "acc-3"]], [], [])
+        self.assertEqual(self.manager.write_to_sheet.call_count, 2)
+        self.assertEqual(self.writer.pending_rows, 0)
+
+        self.now = 61
+        self.writer.add("acc-4", [["b4", "acc-4"]], [], [])
+        self.assertEqual(self.manager.write_to_sheet.call_count, 3)
 
 if __name__ == "__main__":
     unittest.main()
@@ -9,13 +9,18 @@ SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
 if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
-from visascraper.utils.sheets_rotator import ExistingSpreadsheetRequiredError, ensure_valid_spreadsheet
+from visascraper.utils.sheets_rotator import (
+    ExistingSpreadsheetRequiredError,
+    invalidate_active_spreadsheet,
+    resolve_active_spreadsheet,
+)
 
 
 class _Worksheet:
-    def __init__(self, row_count: int, col_count: int) -> None:
+    def __init__(self, row_count: int, col_count: int, title: str = "Sheet1") -> None:
         self.row_count = row_count
         self.col_count = col_count
+        self.title = title
 
 
 class _Spreadsheet:
@@ -27,26 +32,53 @@ class _Spreadsheet:
 
 
 class SheetsRotatorTests(unittest.TestCase):
+    def setUp(self) -> None:
+        invalidate_active_spreadsheet()
+
+    def tearDown(self) -> None:
+        invalidate_active_spreadsheet()
+
     @patch("visascraper.utils.sheets_rotator.get_current_data_sheet_id", return_value="")
-    def test_ensure_valid_spreadsheet_requires_existing_active_sheet(self, _mock_get_sheet_id: Mock) -> None:
+    def test_resolve_active_spreadsheet_requires_existing_active_sheet(self, _mock_get_sheet_id: Mock) -> None:
         with self.assertRaises(ExistingSpreadsheetRequiredError):
-            ensure_valid_spreadsheet(Mock())
+            resolve_active_spreadsheet(Mock())
 
     @patch("visascraper.utils.sheets_rotator.get_current_data_sheet_id", return_value="sheet-123")
-    def test_ensure_valid_spreadsheet_requires_accessible_sheet(self, _mock_get_sheet_id: Mock) -> None:
+    def test_resolve_active_spreadsheet_requires_accessible_sheet(self, _mock_get_sheet_id: Mock) -> None:
         client = Mock()
         client.open_by_key.side_effect = RuntimeError("403")
 
         with self.assertRaises(ExistingSpreadsheetRequiredError):
-            ensure_valid_spreadsheet(client)
+            resolve_active_spreadsheet(client)
 
     @patch("visascraper.utils.sheets_rotator.get_current_data_sheet_id", return_value="sheet-123")
-    def test_ensure_valid_spreadsheet_rejects_oversized_sheet(self, _mock_get_sheet_id: Mock) -> None:
+    def test_resolve_active_spreadsheet_rejects_oversized_sheet(self, _mock_get_sheet_id: Mock) -> None:
         client = Mock()
         client.open_by_key.return_value = _Spreadsheet([_Worksheet(100_000, 100)])
 
         with self.assertRaises(ExistingSpreadsheetRequiredError):
-            ensure_valid_spreadsheet(client)
+            resolve_active_spreadsheet(client)
+
+    @patch("visascraper.utils.sheets_rotator.get_current_data_sheet_id", return_value="sheet-123")
+    def test_resolved_spreadsheet_is_cached_and_tracks_own_writes(self, mock_get_sheet_id: Mock) -> None:
+        client = Mock()
+        client.open_by_key.return_value = _Spreadsheet([_Worksheet(1000, 100, "StayPermit")])
+
+        first = resolve_active_spreadsheet(client)
+        second = resolve_active_spreadsheet(client)
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_get_sheet_id.call_count, 1)
+        self.assertEqual(client.open_by_key.call_count, 1)
+
+        first.set_row_count("StayPermit", 90_000)
+        self.assertEqual(first.total_cells, 9_000_000)
+        with self.assertRaises(ExistingSpreadsheetRequiredError):
+            resolve_active_spreadsheet(client)
+
+        refreshed = resolve_active_spreadsheet(client)
+        self.assertIsNot(refreshed, first)
+        self.assertEqual(refreshed.total_cells, 100_000)
 
 
 if __name__ == "__main__":
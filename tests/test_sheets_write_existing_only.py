@@ -16,12 +16,12 @@ from visascraper.utils.sheets_rotator import ExistingSpreadsheetRequiredError
 class GoogleSheetsExistingOnlyTests(unittest.TestCase):
     @patch.object(GoogleSheetsManager, "_init_client")
     @patch(
-        "visascraper.services.sheets.ensure_valid_spreadsheet",
+        "visascraper.services.sheets.resolve_active_spreadsheet",
         side_effect=ExistingSpreadsheetRequiredError("manual action required"),
     )
     def test_write_to_sheet_skips_when_existing_sheet_is_required(
         self,
-        _mock_ensure_valid_spreadsheet: Mock,
+        _mock_resolve_active_spreadsheet: Mock,
         mock_init_client: Mock,
     ) -> None:
         client = Mock()
@@ -1,21 +1,27 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta
 from pathlib import Path
 import sys
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
+from cryptography.fernet import Fernet
+
 SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
 if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
 from visascraper.config import settings
-from visascraper.jobs import JobScheduler
+from visascraper.dto import IDX_SP_ACCOUNT
+from visascraper.jobs import AccountsReadError, JobScheduler
+from visascraper.services.accounts_cache import AccountCredentialsCache
 from visascraper.services.scraper import DataParser, STAY_PERMIT_DATA_URL
 
 
 class FakePdfManager:
-    def upload_stay_pdf(self, session, session_id, pdf_relative_url, reg_number) -> str:
+    def upload_stay_pdf(self, session, session_id, pdf_relative_url, reg_number, status="") -> str:
         return f"https://files.local/{reg_number}.pdf"
 
 
@@ -94,8 +100,8 @@ class StayRetryTests(unittest.TestCase):
         self.assertEqual(len(parsed_items), 2)
         self.assertEqual([item.reg_number for item in parsed_items], ["REG-001", "REG-002"])
         self.assertEqual(len(rows), 2)
-        self.assertEqual(rows[0][-1], "ALPHA VISA")
-        self.assertEqual(rows[1][-1], "ALPHA VISA")
+        self.assertEqual(rows[0][IDX_SP_ACCOUNT], "ALPHA VISA")
+        self.assertEqual(rows[1][IDX_SP_ACCOUNT], "ALPHA VISA")
 
 
 class JobSchedulerTests(unittest.TestCase):
@@ -118,6 +124,99 @@ class JobSchedulerTests(unittest.TestCase):
         self.assertIsNotNone(kwargs["next_run_time"])
         self.assertEqual(getattr(kwargs["next_run_time"].tzinfo, "key", None), settings.app_timezone)
 
+    def test_run_accounts_flushes_finished_accounts_when_parsing_fails(self) -> None:
+        gs_manager = MagicMock()
+        data_parser = MagicMock()
+
+        def parse_accounts(names, passwords, progress_callback=None, account_callback=None):
+            account_callback("acc-1", [["batch", "acc-1"]], [], [["stay", "acc-1"]])
+            raise RuntimeError("portal is down")
+
+        data_parser.parse_accounts.side_effect = parse_accounts
+        scheduler = JobScheduler(gs_manager=gs_manager, data_parser=data_parser)
+
+        with self.assertRaises(RuntimeError):
+            scheduler._run_accounts([("acc-1", "pwd-1"), ("acc-2", "pwd-2")], "test")
+
+        gs_manager.write_to_sheet.assert_called_once_with([["batch", "acc-1"]], [], [["stay", "acc-1"]])
+
+    def test_close_error_does_not_replace_parsing_error(self) -> None:
+        gs_manager = MagicMock()
+        gs_manager.write_to_sheet.side_effect = ConnectionError("sheets unavailable")
+        data_parser = MagicMock()
+
+        def parse_accounts(names, passwords, progress_callback=None, account_callback=None):
+            account_callback("acc-1", [["batch", "acc-1"]], [], [])
+            raise RuntimeError("portal is down")
+
+        data_parser.parse_accounts.side_effect = parse_accounts
+        scheduler = JobScheduler(gs_manager=gs_manager, data_parser=data_parser)
+
+        with self.assertRaisesRegex(RuntimeError, "portal is down"):
+            scheduler._run_accounts([("acc-1", "pwd-1")], "test")
+
+
+class AccountsCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.now = datetime(2026, 10, 18, 12, 0)
+        self.key = Fernet.generate_key().decode()
+        self.cache = AccountCredentialsCache(
+            path=Path(self._tmp.name) / "accounts.bin",
+            key=self.key,
+            refresh_interval=timedelta(minutes=30),
+            clock=lambda: self.now,
+        )
+        self.gs_manager = MagicMock()
+        self.scheduler = JobScheduler(gs_manager=self.gs_manager, data_parser=MagicMock(), accounts_cache=self.cache)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_accounts_are_read_once_per_refresh_interval(self) -> None:
+        self.gs_manager.get_account_credentials.return_value = [("acc-1", "pwd-1")]
+
+        self.assertEqual(self.scheduler._get_accounts(), [("acc-1", "pwd-1")])
+        self.now += timedelta(minutes=10)
+        self.assertEqual(self.scheduler._get_accounts(), [("acc-1", "pwd-1")])
+        self.assertEqual(self.gs_manager.get_account_credentials.call_count, 1)
+
+        self.now += timedelta(minutes=30)
+        self.gs_manager.get_account_credentials.return_value = [("acc-1", "pwd-2")]
+        self.assertEqual(self.scheduler._get_accounts(), [("acc-1", "pwd-2")])
+        self.assertEqual(self.gs_manager.get_account_credentials.call_count, 2)
+
+    def test_last_good_snapshot_is_used_without_retries_when_sheets_fail(self) -> None:
+        self.cache.update([("acc-1", "pwd-1")])
+        self.now += timedelta(hours=1)
+        self.gs_manager.get_account_credentials.side_effect = RuntimeError("503 unavailable")
+
+        self.assertNotIn(b"pwd-1", self.cache.path.read_bytes())
+        reloaded = AccountCredentialsCache(path=self.cache.path, key=self.key, clock=lambda: self.now)
+        self.scheduler.accounts_cache = reloaded
+        with patch("visascraper.jobs.time.sleep") as mock_sleep:
+            accounts = self.scheduler._get_accounts()
+
+        self.assertEqual(accounts, [("acc-1", "pwd-1")])
+        self.assertEqual(self.gs_manager.get_account_credentials.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    def test_without_key_accounts_are_not_written_to_disk(self) -> None:
+        cache = AccountCredentialsCache(path=self.cache.path, key=None, clock=lambda: self.now)
+
+        cache.update([("acc-1", "pwd-1")])
+
+        self.assertEqual(cache.last_good(), [("acc-1", "pwd-1")])
+        self.assertFalse(self.cache.path.exists())
+
+    def test_without_snapshot_failure_is_retried_then_raised(self) -> None:
+        self.gs_manager.get_account_credentials.side_effect = RuntimeError("503 unavailable")
+
+        with patch("visascraper.jobs.time.sleep"), self.assertRaises(AccountsReadError):
+            self.scheduler._get_accounts()
+
+        self.assertEqual(self.gs_manager.get_account_credentials.call_count, 4)
+
 
 if __name__ == "__main__":
     unittest.main()
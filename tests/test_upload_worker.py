@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import yadisk
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from visascraper.database.models import Base
+from visascraper.database.writer import DatabaseWriter
+from visascraper.services.pdf_store import PDF_KIND_BATCH, PDFStore
+from visascraper.services.upload_worker import UploadJob, YandexUploadWorker
+
+
+class _Meta:
+    def __init__(self, public_url: str | None) -> None:
+        self.public_url = public_url
+
+
+class FakeAsyncClient:
+    def __init__(self, *args, **kwargs) -> None:
+        self.uploaded: dict[str, str] = {}
+        self.active = 0
+        self.max_active = 0
+
+    async def get_meta(self, path: str, fields=None) -> _Meta:
+        if path not in self.uploaded:
+            raise yadisk.exceptions.PathNotFoundError(None)
+        return _Meta(self.uploaded[path])
+
+    async def mkdir(self, path: str) -> None:
+        return None
+
+    async def upload(self, src: str, path: str, overwrite: bool = False) -> None:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.uploaded[path] = f"https://disk.local{path}"
+
+    async def publish(self, path: str) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+
+class YandexUploadWorkerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        engine = create_engine(f"sqlite:///{(root / 'index.db').as_posix()}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        self.writer = DatabaseWriter(session_factory)
+        self.store = PDFStore(root / "pdf", session_factory=session_factory, writer=self.writer)
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        self._tmp.cleanup()
+
+    def test_jobs_run_concurrently_and_record_links(self) -> None:
+        stored = [self.store.put(PDF_KIND_BATCH, f"REG-{index}", f"pdf-{index}".encode()) for index in range(4)]
+        worker = YandexUploadWorker(concurrency=2, store=self.store)
+        client = FakeAsyncClient()
+
+        async def scenario() -> list[str]:
+            with patch("visascraper.services.upload_worker.yadisk.AsyncClient", return_value=client):
+                await worker.start("token")
+            futures = [
+                worker.submit(
+                    UploadJob(
+                        kind=item.kind,
+                        register_number=item.register_number,
+                        file_path=item.path,
+                        remote_path=f"/Visa/{item.filename}",
+                    )
+                )
+                for item in stored
+            ]
+            results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+            await worker.stop()
+            return results
+
+        with patch("visascraper.services.upload_worker.update_action_link") as mock_update:
+            links = asyncio.run(scenario())
+
+        self.assertEqual(links, [f"https://disk.local/Visa/REG-{index}_batch_application.pdf" for index in range(4)])
+        self.assertEqual(client.max_active, 2)
+        self.assertEqual(mock_update.call_count, 4)
+        self.assertEqual(self.store.get_remote_url(PDF_KIND_BATCH, "REG-3"), links[3])
+
+    def test_link_for_outdated_content_is_not_applied(self) -> None:
+        old = self.store.put(PDF_KIND_BATCH, "REG-1", b"pdf-v1")
+        self.store.put(PDF_KIND_BATCH, "REG-1", b"pdf-v2")
+        worker = YandexUploadWorker(store=self.store)
+        job = UploadJob(PDF_KIND_BATCH, "REG-1", old.path, "/Visa/REG-1.pdf", content_hash=old.content_hash)
+
+        with patch("visascraper.services.upload_worker.update_action_link") as mock_update:
+            worker._apply_result(job, "https://disk.local/Visa/REG-1.pdf")
+
+        mock_update.assert_not_called()
+        self.assertIsNone(self.store.get_remote_url(PDF_KIND_BATCH, "REG-1"))
+        self.assertTrue(self.store.lookup(PDF_KIND_BATCH, "REG-1").needs_overwrite)
+
+    def test_submit_without_running_worker_resolves_empty_link(self) -> None:
+        worker = YandexUploadWorker(store=self.store)
+        future = worker.submit(UploadJob(PDF_KIND_BATCH, "REG-1", Path("missing.pdf"), "/Visa/missing.pdf"))
+        self.assertEqual(future.result(timeout=1), "")
+
+
+if __name__ == "__main__":
+    unittest.main()